@@ -25,13 +25,35 @@ from patternlang import (
     SemanticAnalyzer,
     IRGenerator,
     Optimizer,
-    Interpreter,
 )
 from patternlang.assembler import generate_assembly, assemble_to_object, link_executable
-from patternlang.utils.errors import CompilerError
-
-
-def compile_and_run(source_code, verbose=False, output_path=None, compile_only=False):
+from patternlang.cli import (
+    add_options,
+    check_options,
+    compile_options,
+    execute,
+    read_source,
+)
+from patternlang.numeric import numeric_mode
+from patternlang.utils.errors import CodeGenError, CompilerError
+
+
+def compile_and_run(
+    source_code,
+    verbose=False,
+    output_path=None,
+    compile_only=False,
+    fast_math=False,
+    opt_level=2,
+    time_passes=False,
+    fuel=None,
+    memoize=None,
+    exact=False,
+    division=None,
+    profile=False,
+    profile_json=None,
+    flamegraph=None,
+):
     """
     Compile and execute PatternLang source code.
 
@@ -40,6 +62,20 @@ def compile_and_run(source_code, verbose=False, output_path=None, compile_only=F
         verbose: If True, print intermediate results from each phase
         output_path: If provided, generate assembly/object files at this path
         compile_only: If True, generate assembly without executing
+        fast_math: If True, allow optimizations that can change float rounding
+        opt_level: Optimization level, 0 (none) to 3
+        time_passes: If True, print each pass's run time and size change
+        fuel: Instructions the program may run at compile time to be replaced
+            by its output (None: the optimization level's default, 0: never)
+        memoize: If given, cache up to this many results per pure function at
+            run time and report the cache statistics
+        exact: If True, keep integers exact (as '#pragma exact' does)
+        division: Exact-mode division policy, "rational" or "float" (None:
+            the pragma's, else rational)
+        profile: If True, count what the program executes and report it
+        profile_json: If given, also write the profile as JSON to this path
+        flamegraph: If given, sample the time per source line, report it and
+            write the sampled call stacks in collapsed form to this path
 
     Returns:
         Tuple of (asm_path, obj_path, exe_path) if compiling, None if interpreting
@@ -53,6 +89,11 @@ def compile_and_run(source_code, verbose=False, output_path=None, compile_only=F
 
         lexer = Lexer(source_code)
         tokens = lexer.tokenize()
+        numeric = numeric_mode(lexer.pragmas, exact, division)
+        if numeric.exact:
+            sys.set_int_max_str_digits(0)  # Print big integers in full
+            if output_path or compile_only:
+                raise CodeGenError("Exact numeric mode cannot be compiled to assembly")
 
         if verbose:
             print(f"Generated {len(tokens)} tokens:")
@@ -60,6 +101,7 @@ def compile_and_run(source_code, verbose=False, output_path=None, compile_only=F
                 print(f"  {token}")
             if len(tokens) > 20:
                 print(f"  ... and {len(tokens) - 20} more")
+            print(f"Numbers: {numeric}")
             print()
 
         # Phase 2: Syntax Analysis
@@ -68,7 +110,7 @@ def compile_and_run(source_code, verbose=False, output_path=None, compile_only=F
             print("PHASE 2: SYNTAX ANALYSIS")
             print("=" * 60)
 
-        parser = Parser(tokens)
+        parser = Parser(tokens, numeric)
         ast = parser.parse()
 
         if verbose:
@@ -88,6 +130,9 @@ def compile_and_run(source_code, verbose=False, output_path=None, compile_only=F
         if verbose:
             print("Symbol Table:")
             print(f"  {symbol_table}")
+            print("Call Graph:")
+            for line in semantic_analyzer.call_graph.summary():
+                print(f"  {line}")
             print()
 
         # Phase 4: IR Generation
@@ -111,15 +156,25 @@ def compile_and_run(source_code, verbose=False, output_path=None, compile_only=F
             print("PHASE 5: OPTIMIZATION")
             print("=" * 60)
 
-        optimizer = Optimizer()
+        optimizer = Optimizer(
+            fast_math=fast_math, level=opt_level, fuel=fuel, numeric=numeric
+        )
         optimized_ir = optimizer.optimize(ir_code)
 
         if verbose:
             print("Optimized IR:")
             for instr in optimized_ir:
                 print(f"  {instr}")
+            print(f"Pass statistics ({optimizer.rounds} rounds):")
+            for line in optimizer.summary():
+                print(f"  {line}")
             print()
 
+        if verbose or time_passes:
+            print("Pass timings:", file=sys.stderr)
+            for line in optimizer.timing_summary():
+                print(f"  {line}", file=sys.stderr)
+
         # Phase 6: Code Generation (if requested)
         if output_path or compile_only:
             if verbose:
@@ -132,7 +187,7 @@ def compile_and_run(source_code, verbose=False, output_path=None, compile_only=F
             if not asm_path.endswith(".asm"):
                 asm_path = asm_path.replace(".pl", ".asm")
 
-            generate_assembly(optimized_ir, asm_path)
+            generate_assembly(optimized_ir, asm_path, optimizer.ranges)
 
             if verbose:
                 print(f"Assembly file generated: {asm_path}")
@@ -167,8 +222,16 @@ def compile_and_run(source_code, verbose=False, output_path=None, compile_only=F
                 print("=" * 60)
                 print("Output:")
 
-            interpreter = Interpreter()
-            interpreter.execute(optimized_ir)
+            execute(
+                optimized_ir,
+                optimizer,
+                numeric,
+                source_code,
+                memoize=memoize,
+                profile=profile,
+                profile_json=profile_json,
+                flamegraph=flamegraph,
+            )
 
             if verbose:
                 print()
@@ -200,18 +263,12 @@ Examples:
   python main.py program.pl --verbose            # Show all compilation phases
   python main.py program.pl --compile            # Generate assembly and compile
   python main.py program.pl -c -o outputs/prog   # Compile to specific output
+  python main.py program.pl -O3 --time-passes    # Optimize harder, time each pass
   python main.py --help                          # Show this help message
         """,
     )
 
-    parser.add_argument("file", type=str, help="PatternLang source file (.pl)")
-
-    parser.add_argument(
-        "-v",
-        "--verbose",
-        action="store_true",
-        help="Show detailed output from each compiler phase",
-    )
+    add_options(parser)
 
     parser.add_argument(
         "-c",
@@ -228,22 +285,9 @@ Examples:
     )
 
     args = parser.parse_args()
+    check_options(parser, args)
 
-    # Read source file
-    source_path = Path(args.file)
-
-    if not source_path.exists():
-        print(f"Error: File '{args.file}' not found", file=sys.stderr)
-        sys.exit(1)
-
-    if not source_path.suffix == ".pl":
-        print(f"Warning: File extension is not .pl", file=sys.stderr)
-
-    try:
-        source_code = source_path.read_text(encoding="utf-8")
-    except Exception as e:
-        print(f"Error reading file: {e}", file=sys.stderr)
-        sys.exit(1)
+    source_path, source_code = read_source(args.file)
 
     # Determine output path if compiling
     output_path = None
@@ -259,9 +303,9 @@ Examples:
     # Compile and run
     result = compile_and_run(
         source_code,
-        verbose=args.verbose,
         output_path=output_path,
         compile_only=args.compile,
+        **compile_options(args),
     )
 
     if result and not args.verbose:
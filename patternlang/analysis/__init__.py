@@ -0,0 +1,22 @@
+"""Program analyses shared by the semantic checker and the optimizer."""
+
+from .assigned import DefiniteAssignment
+from .callgraph import CallGraph
+from .cfg import CFG, BasicBlock, Loop, build_cfg
+from .liveness import Liveness
+from .ranges import Range, ValueRanges
+from .ssa import to_ssa, from_ssa
+
+__all__ = [
+    "CallGraph",
+    "DefiniteAssignment",
+    "CFG",
+    "BasicBlock",
+    "Loop",
+    "Liveness",
+    "Range",
+    "ValueRanges",
+    "build_cfg",
+    "to_ssa",
+    "from_ssa",
+]
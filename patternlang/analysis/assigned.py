@@ -0,0 +1,98 @@
+"""
+Definite assignment for PatternLang IR.
+A name is definitely assigned at a point if every path from the start of
+its function (or of the program) to that point writes it. Reading a name
+that is not fails at run time with 'Undefined variable', so a pass that
+moves or deletes a read checks here first. Every call gets a frame of
+its own, so calls neither assign nor clear the caller's names, and the
+arguments (_args[i]) are assigned on entry.
+"""
+
+from ..ir import instruction_def, instruction_uses
+
+
+def is_argument(name):
+    """True for an argument slot, which is assigned before a function starts."""
+    return name.startswith("_args[")
+
+
+class DefiniteAssignment:
+    """Forward must-dataflow over a (non-SSA) CFG: assigned-in and assigned-out name sets per block."""
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.assigned_in = {}
+        self.assigned_out = {}
+        self._solve()
+
+    def _solve(self):
+        """Intersect the predecessors' exit sets until nothing changes."""
+        blocks = self.cfg.blocks
+        entries = set(self.cfg.entries)
+        writes = {}
+        everything = set()
+        for block in blocks:
+            written = set()
+            for instr in block.instructions:
+                defined = instruction_def(instr)
+                if defined is not None:
+                    written.add(defined)
+            writes[block.id] = written
+            everything |= written
+
+        # A block nothing has reached yet assigns everything, the identity
+        # of the intersection, so loops converge to the largest solution
+        for block in blocks:
+            start = set() if block.id in entries else set(everything)
+            self.assigned_in[block.id] = start
+            self.assigned_out[block.id] = start | writes[block.id]
+
+        work = [block.id for block in reversed(blocks)]
+        queued = set(work)
+        while work:
+            b = work.pop()
+            queued.discard(b)
+            if b in entries:
+                new_in = set()
+            elif blocks[b].preds:
+                new_in = set.intersection(
+                    *(self.assigned_out[p] for p in blocks[b].preds)
+                )
+            else:
+                continue  # Unreachable
+            self.assigned_in[b] = new_in
+            new_out = new_in | writes[b]
+            if new_out != self.assigned_out[b]:
+                self.assigned_out[b] = new_out
+                for s in blocks[b].succs:
+                    if s not in queued:
+                        queued.add(s)
+                        work.append(s)
+
+    def assigned_before(self, block_id):
+        """
+        Walk a block forwards, yielding (instruction, names assigned right
+        before it). The set is reused between steps, so copy it to keep it.
+        """
+        assigned = set(self.assigned_in[block_id])
+        for instr in self.cfg.blocks[block_id].instructions:
+            yield instr, assigned
+            defined = instruction_def(instr)
+            if defined is not None:
+                assigned.add(defined)
+
+    def on_entry_to(self, loop):
+        """Names assigned on every way into a loop from outside it."""
+        outside = [
+            p for p in self.cfg.blocks[loop.header].preds if p not in loop.blocks
+        ]
+        if not outside:
+            return set()
+        return set.intersection(*(self.assigned_out[p] for p in outside))
+
+
+def reads_assigned(instr, assigned):
+    """True if every name instr reads is an argument or in assigned."""
+    return all(
+        name in assigned or is_argument(name) for name in instruction_uses(instr)
+    )
@@ -0,0 +1,62 @@
+"""
+Analysis cache for the optimizer's pass manager.
+Most passes start by building a CFG, and several compute liveness,
+dominators or value ranges on it. When a pass leaves the IR unchanged, the next pass
+can start from the same graph; the cache keeps it (dominators are cached
+inside the CFG itself) until the pass manager sees the IR change.
+"""
+
+from .cfg import build_cfg
+from .liveness import Liveness
+from .ranges import ValueRanges
+
+
+class AnalysisCache:
+    """CFG, liveness, dominators and value ranges of one instruction list, built on demand."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidate()
+
+    def invalidate(self):
+        """Forget everything (the IR has changed)."""
+        self.instructions = None
+        self._cfg = None
+        self._liveness = None
+        self._ranges = None
+
+    def adopt(self, instructions):
+        """Keep the analyses for a new list holding the same IR as the old one."""
+        if self.instructions is not None:
+            self.instructions = instructions
+
+    def cfg(self, instructions):
+        """The control-flow graph of instructions."""
+        if instructions is not self.instructions:
+            self.invalidate()
+            self.instructions = instructions
+        if self._cfg is None:
+            self.misses += 1
+            self._cfg = build_cfg(instructions)
+        else:
+            self.hits += 1
+        return self._cfg
+
+    def liveness(self, instructions):
+        """Live variables over cfg(instructions)."""
+        cfg = self.cfg(instructions)
+        if self._liveness is None or self._liveness.cfg is not cfg:
+            self._liveness = Liveness(cfg)
+        return self._liveness
+
+    def dominators(self, instructions):
+        """Immediate dominators over cfg(instructions)."""
+        return self.cfg(instructions).dominators()
+
+    def ranges(self, instructions):
+        """Value ranges over cfg(instructions)."""
+        cfg = self.cfg(instructions)
+        if self._ranges is None or self._ranges.cfg is not cfg:
+            self._ranges = ValueRanges(cfg)
+        return self._ranges
@@ -0,0 +1,203 @@
+"""
+Whole-program call graph for PatternLang.
+Built from the AST after all function definitions are known, so calls to
+functions declared later in the file are resolved like any other call.
+The optimizer builds the same graph from the IR's control-flow graph.
+"""
+
+from ..ast_nodes import *
+
+
+class CallGraph:
+    """
+    Records which functions call which, and summarizes each function.
+
+    Facts computed:
+    - call edges with the number of static call sites per edge
+    - strongly connected components (recursion detection)
+    - side-effect summary: a function is pure if neither it nor any
+      function it can reach executes a print
+    """
+
+    MAIN = "<main>"  # Pseudo-function for top-level statements
+
+    def __init__(self, functions):
+        self.functions = functions  # name -> FunctionDef (entry block id from IR)
+        self.edges = {name: {} for name in functions}  # caller -> {callee: count}
+        self.edges[self.MAIN] = {}
+        self.call_sites = {name: 0 for name in functions}  # callee -> count
+        self.prints = {name: False for name in functions}
+        self.prints[self.MAIN] = False
+        self.sccs = []  # list of lists of names, callees before callers
+        self.scc_of = {}  # name -> index into self.sccs
+        self.pure = {}  # name -> bool
+
+    def build(self, program):
+        """Walk the program, then derive SCCs and purity."""
+        for stmt in program.statements:
+            self._walk(stmt, self.MAIN)
+        self._find_sccs()
+        self._summarize_effects()
+        return self
+
+    @classmethod
+    def from_cfg(cls, cfg):
+        """
+        Build the graph from IR: 'call func_<name>' and 'print' instructions
+        are attributed to the function whose blocks contain them.
+        """
+        functions = {
+            name: cfg.label_block[f"func_{name}"]
+            for name in cfg.function_of.values()
+            if name is not None
+        }
+        graph = cls(functions)
+        for b, owner in cfg.function_of.items():
+            owner = cls.MAIN if owner is None else owner
+            for instr in cfg.blocks[b].instructions:
+                if instr.op == "call":
+                    graph._add_call(owner, instr.arg1[len("func_") :])
+                elif instr.op == "print":
+                    graph.prints[owner] = True
+        graph._find_sccs()
+        graph._summarize_effects()
+        return graph
+
+    def _add_call(self, owner, callee):
+        """Count one call from owner to callee."""
+        callees = self.edges[owner]
+        callees[callee] = callees.get(callee, 0) + 1
+        if callee in self.call_sites:
+            self.call_sites[callee] += 1
+
+    def _walk(self, node, owner):
+        """Record calls and prints found under node, attributed to owner."""
+        stack = [(node, owner)]
+        while stack:
+            node, owner = stack.pop()
+            if isinstance(node, FunctionDef):
+                # Nested definitions are separate functions in the IR
+                stack.extend((stmt, node.name) for stmt in node.body)
+            elif isinstance(node, Call):
+                self._add_call(owner, node.name)
+                stack.extend((arg, owner) for arg in node.args)
+            elif isinstance(node, Print):
+                self.prints[owner] = True
+                stack.append((node.expression, owner))
+            elif isinstance(node, Repeat):
+                stack.append((node.start_expr, owner))
+                stack.append((node.end_expr, owner))
+                stack.extend((stmt, owner) for stmt in node.body)
+            elif isinstance(node, BinaryOp):
+                stack.append((node.left, owner))
+                stack.append((node.right, owner))
+            elif isinstance(node, If):
+                stack.append((node.condition, owner))
+            elif isinstance(node, (VarDecl, Assign, Return)):
+                stack.append((node.expression, owner))
+
+    def _find_sccs(self):
+        """
+        Tarjan's algorithm, written iteratively so deep call chains cannot
+        hit Python's recursion limit. SCCs come out callees-first.
+        """
+        index = {}
+        lowlink = {}
+        on_stack = set()
+        scc_stack = []
+        counter = 0
+
+        for root in self.edges:
+            if root in index:
+                continue
+            work = [(root, iter(self.edges[root]))]
+            index[root] = lowlink[root] = counter
+            counter += 1
+            scc_stack.append(root)
+            on_stack.add(root)
+
+            while work:
+                node, children = work[-1]
+                advanced = False
+                for child in children:
+                    if child not in self.edges:
+                        continue  # Undefined function, reported by semantic pass
+                    if child not in index:
+                        index[child] = lowlink[child] = counter
+                        counter += 1
+                        scc_stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(self.edges[child])))
+                        advanced = True
+                        break
+                    if child in on_stack:
+                        lowlink[node] = min(lowlink[node], index[child])
+                if advanced:
+                    continue
+
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = scc_stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    for member in component:
+                        self.scc_of[member] = len(self.sccs)
+                    self.sccs.append(component)
+
+    def _summarize_effects(self):
+        """Propagate 'prints' bottom-up over the SCC condensation."""
+        for component in self.sccs:
+            pure = not any(self.prints[name] for name in component)
+            if pure:
+                for name in component:
+                    for callee in self.edges[name]:
+                        if callee not in self.edges:
+                            pure = False  # Unknown callee: assume the worst
+                        elif self.scc_of[callee] != self.scc_of[name]:
+                            pure = pure and self.pure[callee]
+            for name in component:
+                self.pure[name] = pure
+
+    def callees(self, name):
+        """Return the set of functions called directly by name."""
+        return set(self.edges.get(name, {}))
+
+    def is_recursive(self, name):
+        """True if name can reach itself through the call graph."""
+        if name not in self.scc_of:
+            return False
+        component = self.sccs[self.scc_of[name]]
+        return len(component) > 1 or name in self.edges[name]
+
+    def is_pure(self, name):
+        """True if calling name can never produce output."""
+        return self.pure.get(name, False)
+
+    def call_count(self, name):
+        """Number of static call sites that target name."""
+        return self.call_sites.get(name, 0)
+
+    def summary(self):
+        """Return one readable line per function (used by verbose mode)."""
+        lines = []
+        for name in self.functions:
+            flags = []
+            if self.is_recursive(name):
+                flags.append("recursive")
+            flags.append("pure" if self.is_pure(name) else "impure")
+            callees = ", ".join(sorted(self.callees(name))) or "-"
+            lines.append(
+                f"{name}: calls [{callees}], {self.call_count(name)} call site(s), "
+                f"{', '.join(flags)}"
+            )
+        return lines
+
+    def __repr__(self):
+        return f"CallGraph(functions={len(self.functions)}, sccs={len(self.sccs)})"
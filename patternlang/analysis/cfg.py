@@ -0,0 +1,499 @@
+"""
+Control-flow graph for PatternLang IR.
+Splits three-address code into basic blocks, links them with predecessor
+and successor edges, and computes dominators, post-dominators, dominance
+frontiers and natural loops.
+
+Blocks keep the order of the original instruction list and a block that
+does not end in a jump falls through to the next block in that order, so
+linearize() is a plain concatenation.
+"""
+
+from ..ir import IRInstruction
+from ..utils.errors import IRError
+
+# Instructions that end a basic block
+BLOCK_ENDERS = {"goto", "if_false", "call", "ret"}
+
+
+class BasicBlock:
+    """A straight-line run of IR instructions with one entry and one exit."""
+
+    __slots__ = ("id", "label", "instructions", "preds", "succs")
+
+    def __init__(self, block_id, instructions):
+        self.id = block_id
+        self.instructions = instructions
+        first = instructions[0] if instructions else None
+        self.label = first.result if first is not None and first.op == "label" else None
+        self.preds = []
+        self.succs = []
+
+    @property
+    def terminator(self):
+        """The last instruction if it transfers control, else None."""
+        if self.instructions and self.instructions[-1].op in BLOCK_ENDERS:
+            return self.instructions[-1]
+        return None
+
+    def __repr__(self):
+        name = self.label or f"B{self.id}"
+        return f"BasicBlock({name}, {len(self.instructions)} instr, succs={self.succs})"
+
+
+class Loop:
+    """A natural loop: a header plus every block that reaches a latch without passing the header."""
+
+    __slots__ = ("header", "blocks", "latches", "parent", "depth")
+
+    def __init__(self, header):
+        self.header = header
+        self.blocks = {header}
+        self.latches = []  # Blocks with a back edge to the header
+        self.parent = None  # Innermost enclosing loop
+        self.depth = 1
+
+    def exits(self, cfg):
+        """Edges (inside, outside) that leave the loop."""
+        return [
+            (b, s)
+            for b in self.blocks
+            for s in cfg.blocks[b].succs
+            if s not in self.blocks
+        ]
+
+    def __repr__(self):
+        return f"Loop(header=B{self.header}, blocks={sorted(self.blocks)}, depth={self.depth})"
+
+
+class CFG:
+    """
+    Control-flow graph over a list of IR instructions.
+    Entries are the program start and every func_<name> label; calls
+    return to the next block, so they add no edge into the callee.
+    """
+
+    def __init__(self, instructions):
+        self.blocks = []
+        self.entries = []
+        self.label_block = {}  # label -> block id
+        self.function_of = {}  # block id -> function name (None = top level)
+        self._next_label = None
+        self._split(instructions)
+        self.rebuild_edges()
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    def _split(self, instructions):
+        """Cut the instruction list at labels and after block-ending jumps."""
+        current = []
+        for instr in instructions:
+            if instr.op == "label" and current:
+                self.blocks.append(BasicBlock(len(self.blocks), current))
+                current = []
+            current.append(instr)
+            if instr.op in BLOCK_ENDERS:
+                self.blocks.append(BasicBlock(len(self.blocks), current))
+                current = []
+        if current or not self.blocks:
+            self.blocks.append(BasicBlock(len(self.blocks), current))
+
+    def rebuild_edges(self):
+        """
+        Recompute block ids, labels, edges, entries and function regions
+        from the block contents. Call after changing terminators or
+        adding/removing blocks; it also drops cached analyses.
+        """
+        self.label_block = {}
+        for i, block in enumerate(self.blocks):
+            block.id = i
+            block.preds = []
+            block.succs = []
+            first = block.instructions[0] if block.instructions else None
+            if first is not None and first.op == "label":
+                block.label = first.result
+            else:
+                block.label = None
+            if block.label is not None:
+                self.label_block[block.label] = i
+
+        count = len(self.blocks)
+        for i, block in enumerate(self.blocks):
+            term = block.terminator
+            fall = i + 1 if i + 1 < count else None
+            if term is None or term.op == "call":
+                targets = [fall]
+            elif term.op == "goto":
+                targets = [self._target(term.arg1)]
+            elif term.op == "if_false":
+                targets = [fall, self._target(term.arg2)]
+            else:  # ret
+                targets = []
+            for t in targets:
+                if t is not None and t not in block.succs:
+                    block.succs.append(t)
+                    self.blocks[t].preds.append(i)
+
+        self.entries = [0] + [
+            i
+            for i, block in enumerate(self.blocks)
+            if block.label is not None and block.label.startswith("func_") and i != 0
+        ]
+        self._assign_regions()
+        self.invalidate()
+
+    def _target(self, label):
+        """Block id of the block a label starts (IRError if there is none)."""
+        if label not in self.label_block:
+            raise IRError(f"Undefined label: {label}")
+        return self.label_block[label]
+
+    def _assign_regions(self):
+        """Tag each block with the function whose entry reaches it."""
+        self.function_of = {}
+        for entry in self.entries:
+            label = self.blocks[entry].label
+            name = label[5:] if entry != 0 and label else None
+            stack = [entry]
+            while stack:
+                b = stack.pop()
+                if b in self.function_of:
+                    continue
+                self.function_of[b] = name
+                stack.extend(self.blocks[b].succs)
+
+    def invalidate(self):
+        """Forget cached analyses (after instructions or edges change)."""
+        self._rpo = None
+        self._idom = None
+        self._ipdom = None
+        self._frontiers = None
+        self._loops = None
+        self._dom_order = None
+
+    def linearize(self):
+        """Turn the graph back into a flat instruction list."""
+        return [instr for block in self.blocks for instr in block.instructions]
+
+    def new_label(self):
+        """Return a fresh 'L<n>' label not used anywhere in the graph."""
+        if self._next_label is None:
+            highest = -1
+            for label in self.label_block:
+                if label[:1] == "L" and label[1:].isdigit():
+                    highest = max(highest, int(label[1:]))
+            self._next_label = highest + 1
+        label = f"L{self._next_label}"
+        self._next_label += 1
+        return label
+
+    def ensure_label(self, block_id):
+        """Give a block a leading label (so it can be jumped to) and return it."""
+        block = self.blocks[block_id]
+        if block.label is None:
+            label = self.new_label()
+            block.instructions.insert(0, IRInstruction("label", None, None, label))
+            block.label = label
+            self.label_block[label] = block_id
+        return block.label
+
+    def detached_position(self):
+        """
+        Index where a block can be inserted without anything falling into
+        it: right after the last block that ends in goto or ret. If there is
+        none, the program's end is first made explicit with a jump.
+        """
+        for i in range(len(self.blocks) - 1, -1, -1):
+            term = self.blocks[i].terminator
+            if term is not None and term.op in ("goto", "ret"):
+                return i + 1
+        end_label = self.new_label()
+        self.blocks.append(BasicBlock(len(self.blocks), [IRInstruction("goto", end_label)]))
+        self.blocks.append(
+            BasicBlock(len(self.blocks), [IRInstruction("label", None, None, end_label)])
+        )
+        self.rebuild_edges()
+        return len(self.blocks) - 1
+
+    def split_edges(self, edges):
+        """
+        Put a new empty block on each edge (pred, succ) and return a dict
+        edge -> new BasicBlock. A fall-through edge gets its block placed
+        in between; a jump edge gets a detached block that jumps on to succ.
+        Edges are rebuilt once at the end, so splitting is linear overall.
+        """
+        position = self.detached_position()
+        after = {}  # block id -> new block placed right after it
+        detached = []
+        created = {}
+
+        for pred, succ in edges:
+            block = self.blocks[pred]
+            term = block.terminator
+            jumps_to_succ = term is not None and (
+                (term.op == "goto" and self.label_block.get(term.arg1) == succ)
+                or (term.op == "if_false" and self.label_block.get(term.arg2) == succ)
+            )
+            if succ == pred + 1 and self._falls_through(pred):
+                if jumps_to_succ:
+                    block.instructions.pop()  # Branch to the next block is a no-op
+                new_block = BasicBlock(-1, [])
+                after[pred] = new_block
+            else:
+                target_label = self.ensure_label(succ)
+                label = self.new_label()
+                new_block = BasicBlock(
+                    -1,
+                    [
+                        IRInstruction("label", None, None, label),
+                        IRInstruction("goto", target_label),
+                    ],
+                )
+                if term.op == "goto":
+                    term.arg1 = label
+                else:
+                    term.arg2 = label
+                detached.append(new_block)
+            created[(pred, succ)] = new_block
+
+        blocks = []
+        for i, block in enumerate(self.blocks):
+            if i == position:
+                blocks.extend(detached)
+            blocks.append(block)
+            if i in after:
+                blocks.append(after[i])
+        if position == len(self.blocks):
+            blocks.extend(detached)
+        self.blocks = blocks
+        self.rebuild_edges()
+        return created
+
+    def _falls_through(self, block_id):
+        """True if control can run off the end of the block into the next one."""
+        term = self.blocks[block_id].terminator
+        return term is None or term.op in ("if_false", "call")
+
+    # ------------------------------------------------------------------
+    # Traversal orders
+    # ------------------------------------------------------------------
+
+    def reachable(self):
+        """Set of block ids reachable from any entry."""
+        return set(self.function_of)
+
+    def reverse_postorder(self):
+        """Reachable blocks in reverse postorder (entries first)."""
+        if self._rpo is None:
+            self._rpo = self._postorder(self.entries, lambda b: self.blocks[b].succs)
+            self._rpo.reverse()
+        return self._rpo
+
+    @staticmethod
+    def _postorder(roots, successors):
+        """Iterative depth-first postorder from several roots."""
+        order = []
+        seen = set()
+        for root in roots:
+            if root in seen:
+                continue
+            seen.add(root)
+            stack = [(root, iter(successors(root)))]
+            while stack:
+                node, children = stack[-1]
+                for child in children:
+                    if child not in seen:
+                        seen.add(child)
+                        stack.append((child, iter(successors(child))))
+                        break
+                else:
+                    stack.pop()
+                    order.append(node)
+        return order
+
+    # ------------------------------------------------------------------
+    # Dominators
+    # ------------------------------------------------------------------
+
+    def dominators(self):
+        """
+        Immediate dominator of every reachable block (None for entries).
+        Cooper-Harvey-Kennedy iterative algorithm with a virtual root
+        above all entries.
+        """
+        if self._idom is None:
+            self._idom = self._dominator_tree(
+                self.entries,
+                lambda b: self.blocks[b].succs,
+                lambda b: self.blocks[b].preds,
+            )
+        return self._idom
+
+    def post_dominators(self):
+        """
+        Immediate post-dominator of every block that reaches an exit
+        (None for exits). Exits are blocks without successors.
+        """
+        if self._ipdom is None:
+            exits = [b.id for b in self.blocks if not b.succs]
+            self._ipdom = self._dominator_tree(
+                exits,
+                lambda b: self.blocks[b].preds,
+                lambda b: self.blocks[b].succs,
+            )
+        return self._ipdom
+
+    def _dominator_tree(self, roots, successors, predecessors):
+        """Shared dominator computation over an arbitrary edge direction."""
+        virtual = -1
+        order = self._postorder(roots, successors)
+        post_number = {node: i for i, node in enumerate(order)}
+        post_number[virtual] = len(order)
+        root_set = set(roots)
+
+        idom = {virtual: virtual}
+        for root in roots:
+            idom[root] = virtual
+
+        def intersect(a, b):
+            """Nearest common dominator of a and b in the tree built so far."""
+            while a != b:
+                while post_number[a] < post_number[b]:
+                    a = idom[a]
+                while post_number[b] < post_number[a]:
+                    b = idom[b]
+            return a
+
+        changed = True
+        rpo = order[::-1]
+        while changed:
+            changed = False
+            for node in rpo:
+                if node in root_set:
+                    continue
+                new_idom = None
+                for pred in predecessors(node):
+                    if pred in idom:
+                        new_idom = pred if new_idom is None else intersect(pred, new_idom)
+                if new_idom is not None and idom.get(node) != new_idom:
+                    idom[node] = new_idom
+                    changed = True
+
+        del idom[virtual]
+        return {node: (None if d == virtual else d) for node, d in idom.items()}
+
+    def _dominator_numbering(self):
+        """Pre/post numbers on the dominator tree for O(1) dominance tests."""
+        if self._dom_order is None:
+            children = {}
+            roots = []
+            for node, parent in self.dominators().items():
+                if parent is None:
+                    roots.append(node)
+                else:
+                    children.setdefault(parent, []).append(node)
+            pre, post = {}, {}
+            counter = 0
+            for root in roots:
+                stack = [(root, False)]
+                while stack:
+                    node, done = stack.pop()
+                    if done:
+                        post[node] = counter
+                        counter += 1
+                        continue
+                    pre[node] = counter
+                    counter += 1
+                    stack.append((node, True))
+                    stack.extend((c, False) for c in children.get(node, ()))
+            self._dom_order = (pre, post, children)
+        return self._dom_order
+
+    def dominates(self, a, b):
+        """True if block a dominates block b (every block dominates itself)."""
+        pre, post, _ = self._dominator_numbering()
+        if a not in pre or b not in pre:
+            return False
+        return pre[a] <= pre[b] and post[b] <= post[a]
+
+    def dominator_children(self):
+        """Dominator tree as a dict: block -> list of immediately dominated blocks."""
+        return self._dominator_numbering()[2]
+
+    def dominance_frontiers(self):
+        """Dominance frontier of every reachable block."""
+        if self._frontiers is None:
+            idom = self.dominators()
+            frontiers = {b: set() for b in idom}
+            for b in idom:
+                preds = [p for p in self.blocks[b].preds if p in idom]
+                if len(preds) < 2:
+                    continue
+                for p in preds:
+                    runner = p
+                    while runner is not None and runner != idom[b]:
+                        frontiers[runner].add(b)
+                        runner = idom[runner]
+            self._frontiers = frontiers
+        return self._frontiers
+
+    # ------------------------------------------------------------------
+    # Loops
+    # ------------------------------------------------------------------
+
+    def loops(self):
+        """
+        Natural loops, outermost first. A back edge is an edge t -> h
+        where h dominates t; loops sharing a header are merged.
+        """
+        if self._loops is None:
+            by_header = {}
+            for b in self.reverse_postorder():
+                for s in self.blocks[b].succs:
+                    if self.dominates(s, b):
+                        loop = by_header.get(s)
+                        if loop is None:
+                            loop = by_header[s] = Loop(s)
+                        loop.latches.append(b)
+                        self._collect_loop_body(loop, b)
+
+            # Nesting: visit loops largest first; the innermost loop seen so
+            # far that contains a header is that loop's parent
+            loops = sorted(by_header.values(), key=lambda l: -len(l.blocks))
+            innermost = {}
+            for loop in loops:
+                loop.parent = innermost.get(loop.header)
+                loop.depth = loop.parent.depth + 1 if loop.parent else 1
+                for b in loop.blocks:
+                    innermost[b] = loop
+            self._loops = sorted(loops, key=lambda l: l.depth)
+        return self._loops
+
+    def _collect_loop_body(self, loop, latch):
+        """Add every block that reaches latch without passing the header."""
+        reachable = self.dominators()
+        stack = [latch]
+        while stack:
+            b = stack.pop()
+            if b in loop.blocks or b not in reachable:
+                continue
+            loop.blocks.add(b)
+            stack.extend(self.blocks[b].preds)
+
+    def loop_depth(self):
+        """Nesting depth of every block (0 outside loops)."""
+        depth = {}
+        for loop in self.loops():
+            for b in loop.blocks:
+                depth[b] = max(depth.get(b, 0), loop.depth)
+        return depth
+
+    def __repr__(self):
+        return f"CFG(blocks={len(self.blocks)}, entries={self.entries})"
+
+
+def build_cfg(instructions):
+    """Build a CFG from a flat instruction list."""
+    return CFG(instructions)
@@ -0,0 +1,69 @@
+"""
+Live-variable analysis for PatternLang IR.
+A name is live at a point if some path from there reads it before
+writing it. Calls keep the caller's frame, so liveness simply flows
+across them; a ret ends the function and nothing is live after it.
+"""
+
+from ..ir import instruction_def, instruction_uses
+
+
+class Liveness:
+    """Backward dataflow over a (non-SSA) CFG: live-in and live-out name sets per block."""
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.live_in = {}
+        self.live_out = {}
+        self._solve()
+
+    def _solve(self):
+        """Union the successors' entry sets until nothing changes."""
+        blocks = self.cfg.blocks
+        uses = {}  # Names read before any local write
+        defs = {}
+        for block in blocks:
+            read, written = set(), set()
+            for instr in block.instructions:
+                for name in instruction_uses(instr):
+                    if name not in written:
+                        read.add(name)
+                defined = instruction_def(instr)
+                if defined is not None:
+                    written.add(defined)
+            uses[block.id] = read
+            defs[block.id] = written
+            self.live_in[block.id] = set(read)
+            self.live_out[block.id] = set()
+
+        # Blocks are mostly laid out forwards, so visiting them in reverse
+        # converges in few passes; only changed blocks requeue their preds
+        work = [block.id for block in blocks]
+        queued = set(work)
+        while work:
+            b = work.pop()
+            queued.discard(b)
+            out = set()
+            for s in blocks[b].succs:
+                out |= self.live_in[s]
+            self.live_out[b] = out
+            new_in = uses[b] | (out - defs[b])
+            if new_in != self.live_in[b]:
+                self.live_in[b] = new_in
+                for p in blocks[b].preds:
+                    if p not in queued:
+                        queued.add(p)
+                        work.append(p)
+
+    def live_after(self, block_id):
+        """
+        Walk a block backwards, yielding (instruction, names live right
+        after it). The set is reused between steps, so copy it to keep it.
+        """
+        live = set(self.live_out[block_id])
+        for instr in reversed(self.cfg.blocks[block_id].instructions):
+            yield instr, live
+            defined = instruction_def(instr)
+            if defined is not None:
+                live.discard(defined)
+            live.update(instruction_uses(instr))
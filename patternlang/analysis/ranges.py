@@ -0,0 +1,423 @@
+"""
+Value-range analysis for PatternLang IR.
+Every value is a float, but most programs only ever hold small integers.
+Abstract interpretation over the CFG finds, for every variable at every
+point, an interval containing its value, whether the value is always an
+integer, and whether it can be -0.0. Branches narrow the intervals on
+their two edges ('t = i <= 10; if_false t goto L' bounds i by 10 on the
+fall-through edge), and a block visited too often has its growing bounds
+widened (to 2**53, then to infinity) so loops converge.
+
+The facts prove divisors non-zero, and name the variables that can live
+in integer registers without changing a single result.
+"""
+
+from math import ceil, copysign, floor, inf, isfinite, nextafter
+
+from ..ir import BINARY_OPS, COMPARISON_OPS, instruction_def, is_constant
+
+# Integers of at most this magnitude are exact floats (and fit 64-bit registers)
+EXACT = 2**53
+
+# Visits to a block before its growing bounds are widened
+WIDEN_AFTER = 3
+
+# Passes that recompute the solution from itself to win back what widening lost
+NARROW_ROUNDS = 2
+
+# Operations that keep exact integers exact (besides comparisons)
+INTEGER_OPS = {"assign", "+", "-", "*", "%"}
+
+# A comparison on the edge where it is false, as the opposite comparison
+NEGATED = {"<": ">=", "<=": ">", ">": "<=", ">=": "<", "==": "!=", "!=": "=="}
+
+# x op y as y op' x
+SWAPPED = {"<": ">", "<=": ">=", ">": "<", ">=": "<=", "==": "==", "!=": "!="}
+
+
+class Range:
+    """
+    The values a variable may hold: NaN, or a float in [lo, hi]. With
+    integer set every value is a finite integer (so never NaN), and
+    negzero says whether a zero may be -0.0.
+    """
+
+    __slots__ = ("lo", "hi", "integer", "negzero")
+
+    def __init__(self, lo, hi, integer=False, negzero=True):
+        self.lo = lo
+        self.hi = hi
+        self.integer = integer
+        self.negzero = negzero
+
+    @classmethod
+    def constant(cls, value):
+        """The Range of a single value (TOP for inf and NaN)."""
+        if not isfinite(value):
+            return TOP
+        negzero = value == 0 and copysign(1, value) < 0
+        return cls(value, value, value == int(value), negzero)
+
+    def join(self, other):
+        """The smallest Range holding both self and other."""
+        return Range(
+            min(self.lo, other.lo),
+            max(self.hi, other.hi),
+            self.integer and other.integer,
+            self.negzero or other.negzero,
+        )
+
+    def widen(self, newer):
+        """
+        newer (which contains self) with every bound that moved pushed out
+        to 2**53, or to infinity once past it. Stopping at 2**53 first keeps
+        an integer that only grows while a test bounds it an integer.
+        """
+        lo, hi = newer.lo, newer.hi
+        if lo < self.lo:
+            lo = -EXACT if lo >= -EXACT else -inf
+        if hi > self.hi:
+            hi = EXACT if hi <= EXACT else inf
+        integer = newer.integer and isfinite(lo) and isfinite(hi)
+        return Range(float(lo), float(hi), integer, newer.negzero)
+
+    def excludes_zero(self):
+        """True if zero is not in the range."""
+        return self.lo > 0 or self.hi < 0
+
+    def exact_integer(self):
+        """True if every value is an integer float below 2**53 and never -0.0."""
+        return self.integer and not self.negzero and -EXACT < self.lo and self.hi < EXACT
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, Range)
+            and (self.lo, self.hi, self.integer, self.negzero)
+            == (other.lo, other.hi, other.integer, other.negzero)
+        )
+
+    def __repr__(self):
+        kind = "int" if self.integer else "float"
+        return f"Range({kind} [{self.lo}, {self.hi}]{' -0' if self.negzero else ''})"
+
+
+TOP = Range(-inf, inf)
+BOOLEAN = Range(0.0, 1.0, True, False)
+
+
+def _bound(value, fallback):
+    """A computed bound, or fallback when inf - inf made it NaN."""
+    return fallback if value != value else value
+
+
+def _product(x, y):
+    """x * y for bounds, taking 0 * inf as 0 (the NaN it really gives is not bounded)."""
+    return 0.0 if x == 0 or y == 0 else x * y
+
+
+def transfer(op, a, b):
+    """Range of 'a op b' for operand ranges a and b."""
+    if op in COMPARISON_OPS:
+        return BOOLEAN
+    bounded = isfinite(a.lo) and isfinite(a.hi) and isfinite(b.lo) and isfinite(b.hi)
+    if op == "+":
+        lo = _bound(a.lo + b.lo, -inf)
+        hi = _bound(a.hi + b.hi, inf)
+        negzero = a.negzero and b.negzero
+    elif op == "-":
+        lo = _bound(a.lo - b.hi, -inf)
+        hi = _bound(a.hi - b.lo, inf)
+        negzero = a.negzero and b.lo <= 0 <= b.hi
+    elif op == "*":
+        corners = [_product(x, y) for x in (a.lo, a.hi) for y in (b.lo, b.hi)]
+        lo, hi = min(corners), max(corners)
+        # A zero (or an underflow) is negative when the factors' signs differ
+        negative = a.lo < 0 or a.negzero, b.lo < 0 or b.negzero
+        negzero = lo <= 0 <= hi and (
+            (negative[0] and b.hi >= 0) or (negative[1] and a.hi >= 0)
+        )
+    elif op == "/":
+        if not bounded or not b.excludes_zero():
+            return TOP
+        corners = [x / y for x in (a.lo, a.hi) for y in (b.lo, b.hi)]
+        positive = a.lo >= 0 and not a.negzero and b.lo > 0
+        return Range(min(corners), max(corners), False, not positive)
+    elif op == "%":
+        # Python's float modulo takes the sign of the divisor (a zero too)
+        if not (isfinite(b.lo) and isfinite(b.hi)):
+            return TOP
+        integer = a.integer and b.integer
+        if b.lo > 0:
+            if a.lo >= 0 and a.hi < b.lo:
+                return Range(a.lo, a.hi, a.integer, False)
+            return Range(0.0, b.hi, integer, False)
+        reach = max(abs(b.lo), abs(b.hi))
+        return Range(-reach, 0.0 if b.hi < 0 else reach, integer, True)
+    else:
+        return TOP
+    finite = isfinite(lo) and isfinite(hi)
+    return Range(lo, hi, a.integer and b.integer and finite, negzero)
+
+
+def _narrow(r, op, other):
+    """r restricted to values v with 'v op x' true for some x in other; None if empty."""
+    lo, hi = r.lo, r.hi
+    if op in ("<", "<="):
+        limit = other.hi
+        if op == "<" and isfinite(limit):
+            limit = ceil(limit) - 1 if r.integer else nextafter(limit, -inf)
+        elif r.integer and isfinite(limit):
+            limit = floor(limit)
+        hi = min(hi, limit)
+    elif op in (">", ">="):
+        limit = other.lo
+        if op == ">" and isfinite(limit):
+            limit = floor(limit) + 1 if r.integer else nextafter(limit, inf)
+        elif r.integer and isfinite(limit):
+            limit = ceil(limit)
+        lo = max(lo, limit)
+    elif op == "==":
+        lo, hi = max(lo, other.lo), min(hi, other.hi)
+    elif op == "!=" and other.lo == other.hi:
+        # Only a constant at one end of the interval can be cut off
+        if lo == other.lo:
+            lo = lo + 1 if r.integer else nextafter(lo, inf)
+        elif hi == other.hi:
+            hi = hi - 1 if r.integer else nextafter(hi, -inf)
+    if lo > hi:
+        return None
+    negzero = r.negzero and lo <= 0 <= hi
+    return Range(float(lo), float(hi), r.integer, negzero)
+
+
+class ValueRanges:
+    """
+    Forward dataflow of Range facts over a CFG. After solving, operands
+    maps each reachable instruction to the ranges of arg1 and arg2 just
+    before it runs, and results to the range of what it writes.
+    """
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.entry = {}  # block id -> {name: Range} on entry (absent: unreachable)
+        self.operands = {}  # instruction -> (Range of arg1, Range of arg2)
+        self.results = {}  # instruction -> Range of its result
+        self._solve()
+        for _ in range(NARROW_ROUNDS):
+            self._narrow_solution()
+        self._record()
+
+    # ------------------------------------------------------------------
+    # Solver
+    # ------------------------------------------------------------------
+
+    def _solve(self):
+        """Propagate entry states over the CFG, widening blocks visited too often, until stable."""
+        blocks = self.cfg.blocks
+        visits = {}
+        work = []
+        for entry in self.cfg.entries:
+            self.entry[entry] = {}
+            work.append(entry)
+        queued = set(work)
+        while work:
+            b = work.pop()
+            queued.discard(b)
+            env = dict(self.entry[b])
+            for instr in blocks[b].instructions:
+                self._step(instr, env)
+            for s, state in self._successors(b, env):
+                old = self.entry.get(s)
+                new = state if old is None else self._join(old, state)
+                if old is not None:
+                    visits[s] = visits.get(s, 0) + 1
+                    if visits[s] > WIDEN_AFTER:
+                        new = {
+                            name: old[name].widen(r) if name in old else r
+                            for name, r in new.items()
+                        }
+                if new != old:
+                    self.entry[s] = new
+                    if s not in queued:
+                        queued.add(s)
+                        work.append(s)
+
+    def _narrow_solution(self):
+        """
+        Entry states recomputed, in reverse postorder, from the states
+        their predecessors pass on. The widened solution covers every run,
+        so the transfer functions applied to it still do, and are usually
+        tighter.
+        """
+        entries = set(self.cfg.entries)
+        for b in self.cfg.reverse_postorder():
+            states = [{}] if b in entries else []
+            for p in self.cfg.blocks[b].preds:
+                if p not in self.entry:
+                    continue
+                env = dict(self.entry[p])
+                for instr in self.cfg.blocks[p].instructions:
+                    self._step(instr, env)
+                states += [state for s, state in self._successors(p, env) if s == b]
+            if not states:
+                self.entry.pop(b, None)
+                continue
+            env = states[0]
+            for state in states[1:]:
+                env = self._join(env, state)
+            self.entry[b] = env
+
+    @staticmethod
+    def _join(a, b):
+        """Names missing on one side are undefined there, so the other side decides."""
+        result = dict(a)
+        for name, r in b.items():
+            result[name] = result[name].join(r) if name in result else r
+        return result
+
+    @staticmethod
+    def value(env, operand):
+        """The Range of an operand in env (TOP when unknown)."""
+        if operand is None:
+            return TOP
+        if is_constant(operand):
+            return Range.constant(float(operand))
+        return env.get(operand, TOP)
+
+    def _step(self, instr, env):
+        """Apply instr's transfer function to env in place."""
+        defined = instruction_def(instr)
+        if defined is None:
+            return
+        if instr.op == "assign":
+            env[defined] = self.value(env, instr.arg1)
+        elif instr.op in BINARY_OPS:
+            a = self.value(env, instr.arg1)
+            b = self.value(env, instr.arg2)
+            env[defined] = transfer(instr.op, a, b)
+        else:
+            env[defined] = TOP  # getret: whatever the callee returned
+
+    def _successors(self, b, env):
+        """(successor, state on that edge), narrowed by the branch when there is one."""
+        block = self.cfg.blocks[b]
+        term = block.terminator
+        if term is None or term.op != "if_false" or len(block.succs) < 2:
+            return [(s, env) for s in block.succs]
+        fall, target = block.succs
+        edges = []
+        for s, truth in ((fall, True), (target, False)):
+            state = self._narrowed(block, env, truth)
+            if state is not None:
+                edges.append((s, state))
+        return edges
+
+    def _narrowed(self, block, env, truth):
+        """env where the branch condition is truth; None if that cannot happen."""
+        condition = block.terminator.arg1
+        if is_constant(condition):
+            return env if bool(float(condition)) == truth else None
+        compare, at = None, 0
+        for at in range(len(block.instructions) - 2, -1, -1):
+            if instruction_def(block.instructions[at]) == condition:
+                compare = block.instructions[at]
+                break
+        state = dict(env)
+        if compare is None or compare.op not in COMPARISON_OPS:
+            # The condition itself: non-zero (or NaN) when true, zero when false
+            # (NaN is true, so only an integer has no value left when true)
+            r = self.value(env, condition)
+            narrowed = _narrow(r, "!=" if truth else "==", Range(0.0, 0.0, True, False))
+            if narrowed is None:
+                return None if r.integer or not truth else env
+            state[condition] = narrowed
+            return state
+        after = block.instructions[at:-1]
+        if any(instruction_def(instr) in (compare.arg1, compare.arg2) for instr in after):
+            return env  # The operands are not the ones compared
+        left = self.value(env, compare.arg1)
+        right = self.value(env, compare.arg2)
+        if (not truth or compare.op == "!=") and not (left.integer and right.integer):
+            return env  # NaN makes the comparison false without the opposite holding
+        op = compare.op if truth else NEGATED[compare.op]
+        for name, mine, other, relation in (
+            (compare.arg1, left, right, op),
+            (compare.arg2, right, left, SWAPPED[op]),
+        ):
+            if is_constant(name):
+                continue
+            narrowed = _narrow(mine, relation, other)
+            if narrowed is None:
+                return None
+            state[name] = narrowed
+        return state
+
+    def _record(self):
+        """Store the Ranges of every operand and result, walking each block from its entry state."""
+        for b, env in self.entry.items():
+            env = dict(env)
+            for instr in self.cfg.blocks[b].instructions:
+                if instr.op in BINARY_OPS or instr.op == "assign":
+                    self.operands[instr] = (
+                        self.value(env, instr.arg1),
+                        self.value(env, instr.arg2) if instr.op != "assign" else None,
+                    )
+                self._step(instr, env)
+                defined = instruction_def(instr)
+                if defined is not None:
+                    self.results[instr] = env[defined]
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def nonzero_divisor(self, instr):
+        """True if instr divides and its divisor can never be zero."""
+        ranges = self.operands.get(instr)
+        return instr.op in ("/", "%") and ranges is not None and ranges[1].excludes_zero()
+
+    def integer_variables(self):
+        """
+        Names that can be kept as 64-bit integers with the same results:
+        every write stores an exact integer (never -0.0), computed by
+        +, -, *, % (by a positive divisor) or a comparison from integer
+        constants and other such names, or copied from one of them.
+        """
+        defs = {}
+        for block in self.cfg.blocks:
+            for instr in block.instructions:
+                defined = instruction_def(instr)
+                if defined is not None:
+                    defs.setdefault(defined, []).append(instr)
+
+        def operands(instr):
+            """The operands instr reads as values."""
+            return (instr.arg1,) if instr.op == "assign" else (instr.arg1, instr.arg2)
+
+        def suitable(instr):
+            """True if instr is an integer operation on and to exact integers."""
+            if instr.op not in INTEGER_OPS and instr.op not in COMPARISON_OPS:
+                return False
+            if instr not in self.results:
+                # Never runs, but its constants must still be integers
+                return all(
+                    not is_constant(a) or Range.constant(float(a)).exact_integer()
+                    for a in operands(instr)
+                )
+            if not self.results[instr].exact_integer():
+                return False
+            if instr.op == "%" and not self.operands[instr][1].lo > 0:
+                return False
+            return all(r is None or r.exact_integer() for r in self.operands[instr])
+
+        names = {name for name, writes in defs.items() if all(suitable(i) for i in writes)}
+        changed = True
+        while changed:
+            changed = False
+            for name in list(names):
+                for instr in defs[name]:
+                    if any(not is_constant(a) and a not in names for a in operands(instr)):
+                        names.discard(name)
+                        changed = True
+                        break
+        return names
@@ -0,0 +1,248 @@
+"""
+Static single assignment (SSA) form for PatternLang IR.
+
+to_ssa() places phi instructions at dominance frontiers (semi-pruned: only
+for names that are live across blocks) and renames every definition to a
+unique version such as sum.2. from_ssa() removes the phis again by
+inserting parallel copies on the incoming edges, splitting critical edges
+and sequentializing each copy group so swaps stay correct.
+
+A phi is an IRInstruction with op "phi" whose arg1 maps each predecessor
+block id to the incoming name; None marks a value undefined on that path.
+"""
+
+import re
+
+from ..ir import IRInstruction, instruction_def, instruction_uses, replace_uses
+from .cfg import build_cfg
+
+TEMP_NAME = re.compile(r"^t(\d+)")
+
+
+def to_ssa(instructions_or_cfg):
+    """
+    Convert IR (a list or a CFG) to SSA form in place and return the CFG.
+    Unreachable blocks are left untouched.
+    """
+    cfg = instructions_or_cfg
+    if isinstance(cfg, list):
+        cfg = build_cfg(cfg)
+
+    idom = cfg.dominators()
+    reachable = set(idom)
+
+    # Names defined in each block, and names read before any local definition
+    def_blocks = {}
+    global_names = set()
+    for b in reachable:
+        killed = set()
+        for instr in cfg.blocks[b].instructions:
+            for name in instruction_uses(instr):
+                if name not in killed:
+                    global_names.add(name)
+            defined = instruction_def(instr)
+            if defined is not None:
+                killed.add(defined)
+                def_blocks.setdefault(defined, set()).add(b)
+
+    _place_phis(cfg, def_blocks, global_names)
+    _rename(cfg, idom)
+    return cfg
+
+
+def _place_phis(cfg, def_blocks, global_names):
+    """Insert empty phis for each global name on its iterated dominance frontier."""
+    frontiers = cfg.dominance_frontiers()
+    for name in sorted(global_names):
+        if name not in def_blocks:
+            continue
+        has_phi = set()
+        work = list(def_blocks[name])
+        queued = set(work)
+        while work:
+            b = work.pop()
+            for f in frontiers[b]:
+                if f in has_phi:
+                    continue
+                has_phi.add(f)
+                block = cfg.blocks[f]
+                phi = IRInstruction(
+                    "phi", {p: name for p in block.preds if p in frontiers}, None, name
+                )
+                position = 1 if block.label is not None else 0
+                block.instructions.insert(position, phi)
+                if f not in queued:
+                    queued.add(f)
+                    work.append(f)
+
+
+def _rename(cfg, idom):
+    """Rename definitions and uses with a walk over the dominator tree."""
+    taken = set()  # Every name already in use, so versions never collide
+    for block in cfg.blocks:
+        for instr in block.instructions:
+            defined = instruction_def(instr)
+            if defined is not None:
+                taken.add(defined)
+            taken.update(instruction_uses(instr))
+
+    counters = {}
+    stacks = {}
+    children = cfg.dominator_children()
+
+    def new_version(name):
+        """Push a fresh, unused version of name and return it."""
+        while True:
+            counters[name] = counters.get(name, 0) + 1
+            version = f"{name}.{counters[name]}"
+            if version not in taken:
+                break
+        taken.add(version)
+        stacks.setdefault(name, []).append(version)
+        return version
+
+    def current(name):
+        """The version of name in scope (the name itself before any)."""
+        stack = stacks.get(name)
+        return stack[-1] if stack else name
+
+    roots = [b for b, d in idom.items() if d is None]
+    for root in roots:
+        work = [(root, False)]
+        pushed = {}
+        while work:
+            b, leaving = work.pop()
+            if leaving:
+                for name in pushed.pop(b):
+                    stacks[name].pop()
+                continue
+
+            block = cfg.blocks[b]
+            defined_here = []
+            for instr in block.instructions:
+                if instr.op != "phi":
+                    replace_uses(instr, {n: current(n) for n in instruction_uses(instr)})
+                defined = instruction_def(instr)
+                if defined is not None:
+                    instr.result = new_version(defined)
+                    defined_here.append(defined)
+
+            # Fill this block's slot in successor phis; each slot still holds
+            # the original name because only this block ever writes it
+            for s in block.succs:
+                for instr in cfg.blocks[s].instructions:
+                    if instr.op == "label":
+                        continue
+                    if instr.op != "phi":
+                        break
+                    if b in instr.arg1:
+                        stack = stacks.get(instr.arg1[b])
+                        instr.arg1[b] = stack[-1] if stack else None
+
+            pushed[b] = defined_here
+            work.append((b, True))
+            work.extend((c, False) for c in children.get(b, ()))
+
+    cfg.invalidate()
+
+
+def from_ssa(cfg):
+    """
+    Leave SSA form: replace phis with copies on incoming edges and
+    return the linear instruction list. Edges out of a conditional branch
+    or a call are split first, so copies never run before a branch reads
+    its condition and never sit after a call.
+    """
+    copies = {}  # (pred, block) -> list of (dest, source)
+    for block in cfg.blocks:
+        for instr in block.instructions:
+            if instr.op == "phi":
+                for pred, source in instr.arg1.items():
+                    if source is not None:
+                        copies.setdefault((pred, block.id), []).append(
+                            (instr.result, source)
+                        )
+        block.instructions = [i for i in block.instructions if i.op != "phi"]
+
+    pred_blocks = {edge: cfg.blocks[edge[0]] for edge in copies}
+    to_split = [
+        edge
+        for edge, pred in pred_blocks.items()
+        if pred.terminator is not None and pred.terminator.op in ("if_false", "call")
+    ]
+    created = cfg.split_edges(to_split) if to_split else {}
+
+    new_temp = temp_factory(cfg)
+    for edge, group in copies.items():
+        block = created.get(edge) or pred_blocks[edge]
+        insert_at = len(block.instructions)
+        if block.terminator is not None:
+            insert_at -= 1  # Before the goto
+        block.instructions[insert_at:insert_at] = sequentialize(group, new_temp)
+
+    cfg.rebuild_edges()
+    return cfg.linearize()
+
+
+def temp_factory(cfg):
+    """Return a function producing temporaries not used anywhere in the graph."""
+    highest = -1
+    for block in cfg.blocks:
+        for instr in block.instructions:
+            for name in (instr.result, instr.arg1, instr.arg2):
+                if isinstance(name, str):
+                    match = TEMP_NAME.match(name)
+                    if match:
+                        highest = max(highest, int(match.group(1)))
+    counter = [highest]
+
+    def new_temp():
+        """The next unused temporary name."""
+        counter[0] += 1
+        return f"t{counter[0]}"
+
+    return new_temp
+
+
+def sequentialize(group, new_temp):
+    """
+    Turn a parallel copy group [(dest, source), ...] into ordered assigns.
+    A copy is emitted once its destination is no longer needed as a source;
+    cycles are broken by saving one value in a fresh temporary.
+    """
+    pending = {dest: source for dest, source in group if dest != source}
+    emitted = []
+
+    uses = {}
+    for source in pending.values():
+        uses[source] = uses.get(source, 0) + 1
+    ready = [d for d in pending if uses.get(d, 0) == 0]
+
+    while pending:
+        while ready:
+            dest = ready.pop()
+            if dest not in pending:
+                continue
+            source = pending.pop(dest)
+            emitted.append(IRInstruction("assign", source, None, dest))
+            if source in uses:
+                uses[source] -= 1
+                if uses[source] == 0 and source in pending:
+                    ready.append(source)
+        if pending:
+            # Only cycles remain: save one destination, then redirect its readers
+            dest = next(iter(pending))
+            temp = new_temp()
+            emitted.append(IRInstruction("assign", dest, None, temp))
+            for d, s in pending.items():
+                if s == dest:
+                    pending[d] = temp
+            uses[temp] = uses.pop(dest, 0)
+            ready.append(dest)
+
+    return emitted
+
+
+def ssa_round_trip(instructions):
+    """Convert to SSA and straight back (used to check the conversion)."""
+    return from_ssa(to_ssa(instructions))
@@ -2,20 +2,70 @@
 Assembly Code Generator for PatternLang.
 Converts three-address code (3AC) to x86-64 NASM assembly.
 Phase 7: Code Generation (Assembly)
+
+Values are doubles in SSE registers, except for the variables value-range
+analysis proves always hold integers below 2**53: those live in 64-bit
+integer registers and use add/sub/imul/idiv, which give exactly the
+doubles' results. They are converted with cvtsi2sd where a float is needed.
 """
 
 import os
 from .ir import IRInstruction
+from .bytecode import decode, is_compact
 from .utils.errors import CodeGenError
 
 
+# Integer condition codes (signed) for the comparison operators, and their
+# negations
+INT_CONDITIONS = {"==": "e", "!=": "ne", "<": "l", ">": "g", "<=": "le", ">=": "ge"}
+NEGATED_CONDITIONS = {"e": "ne", "ne": "e", "l": "ge", "ge": "l", "g": "le", "le": "g"}
+
+
+def _skips_to(sequence):
+    """Whether sequence is 'if_false c goto L; goto T; L:'."""
+    return (
+        len(sequence) == 3
+        and sequence[0].op == "if_false"
+        and sequence[1].op == "goto"
+        and sequence[2].op == "label"
+        and sequence[2].result == sequence[0].arg2
+    )
+
+
+def _increment(instr, target=None):
+    """
+    The constant an addition adds to its own target (its result unless
+    given), or None when it is not such an increment.
+    """
+    target = instr.result if target is None else target
+    if instr.op != "+":
+        return None
+    for var, step in ((instr.arg1, instr.arg2), (instr.arg2, instr.arg1)):
+        if var == target and _is_constant(step):
+            return step
+    return None
+
+
+def _is_constant(operand):
+    """True if operand is a numeric constant."""
+    try:
+        float(operand)
+    except (ValueError, TypeError):
+        return False
+    return True
+
+
 class AssemblyGenerator:
     """
     Generates x86-64 NASM assembly code from three-address code.
     Handles register allocation, stack management, and system calls.
+    With the ValueRanges of the instructions, integer variables get
+    integer code.
     """
 
-    def __init__(self):
+    def __init__(self, ranges=None):
+        self.integers = ranges.integer_variables() if ranges is not None else set()
+        self.local_labels = 0  # Labels made up for the generated code
         self.assembly = []
         self.data_section = []
         self.variables = {}  # Maps variable names to stack offsets
@@ -27,8 +77,11 @@ class AssemblyGenerator:
     def generate(self, instructions):
         """
         Generate complete x86-64 NASM assembly from IR instructions.
+        Compact (bytecode) input is decoded first.
         Returns assembly code as a string.
         """
+        if is_compact(instructions):
+            instructions = decode(instructions)
         self._analyze_instructions(instructions)
         self._emit_header()
         self._emit_data_section()
@@ -55,6 +108,11 @@ class AssemblyGenerator:
                             self.stack_offset += 8
                             self.variables[arg] = self.stack_offset
 
+        # Integer variables are always written, so they need a slot whatever their name
+        for name in sorted(self.integers - set(self.variables)):
+            self.stack_offset += 8
+            self.variables[name] = self.stack_offset
+
     def _emit_header(self):
         """Emit assembly file header and external declarations."""
         self.assembly.append("; PatternLang Compiler Output")
@@ -96,15 +154,76 @@ class AssemblyGenerator:
         self.assembly.append("    syscall")
 
     def _generate_instructions(self, instructions):
-        """Generate assembly for each IR instruction."""
+        """
+        Generate assembly for each IR instruction.
+        The sequences the interpreter fuses into superinstructions are
+        lowered together: a comparison read only by the branch after it
+        sets the flags the branch jumps on, 'x = x + c' adds in place, and
+        'if_false c goto L; goto T; L:' is a single jump to T.
+        A '; line N' comment precedes the code of each new source line.
+        """
+        uses = {}
         for instr in instructions:
-            self._generate_instruction(instr)
+            for arg in (instr.arg1, instr.arg2):
+                if isinstance(arg, str):
+                    uses[arg] = uses.get(arg, 0) + 1
+
+        def private(name):
+            """True if name is read exactly once."""
+            return uses.get(name) == 1
+
+        line = None
+        i = 0
+        while i < len(instructions):
+            instr = instructions[i]
+            after = instructions[i + 1 : i + 4]
+            if instr.line is not None and instr.line != line:
+                line = instr.line
+                self.assembly.append(f"    ; line {line}")
+            if (
+                instr.op in INT_CONDITIONS
+                and after
+                and after[0].op == "if_false"
+                and after[0].arg1 == instr.result
+                and private(instr.result)
+            ):
+                if _skips_to(after):
+                    # visit_If's 'if_false t goto L; goto T; L:'
+                    self._compare_and_branch(instr, after[1].arg1, True)
+                    self._generate_instruction(after[2])
+                    i += 4
+                else:
+                    self._compare_and_branch(instr, after[0].arg2, False)
+                    i += 2
+            elif instr.op == "if_false" and _skips_to([instr] + after[:2]):
+                self._branch_if_true(instr.arg1, after[0].arg1)
+                self._generate_instruction(after[1])
+                i += 3
+            elif _increment(instr) is not None:
+                self._increment(instr.result, _increment(instr))
+                i += 1
+            elif (
+                instr.op == "+"
+                and after
+                and after[0].op == "assign"
+                and after[0].arg1 == instr.result
+                and private(instr.result)
+                and _increment(instr, after[0].result) is not None
+            ):
+                self._increment(after[0].result, _increment(instr, after[0].result))
+                i += 2
+            else:
+                self._generate_instruction(instr)
+                i += 1
 
     def _generate_instruction(self, instr):
         """Generate assembly for a single IR instruction."""
         op = instr.op
 
-        if op == "label":
+        if instr.result in self.integers and op != "label":
+            self._generate_integer(instr)
+
+        elif op == "label":
             self.assembly.append(f"{instr.result}:")
 
         elif op == "assign":
@@ -145,6 +264,10 @@ class AssemblyGenerator:
         elif op == "goto":
             self.assembly.append(f"    jmp {instr.arg1}")
 
+        elif op == "if_false" and instr.arg1 in self.integers:
+            self.assembly.append(f"    cmp qword [rbp - {self.variables[instr.arg1]}], 0")
+            self.assembly.append(f"    je {instr.arg2}")
+
         elif op == "if_false":
             # For floats, a zero comparison result is false
             self._load_operand_float(instr.arg1, "xmm0")
@@ -172,6 +295,111 @@ class AssemblyGenerator:
         else:
             self.assembly.append(f"    ; Unknown operation: {op}")
 
+    def _generate_integer(self, instr):
+        """Generate assembly for an instruction writing an integer variable."""
+        op = instr.op
+        self._load_operand_int(instr.arg1, "rax")
+        if op == "assign":
+            pass
+        elif op in ("+", "-", "*"):
+            asm_op = {"+": "add", "-": "sub", "*": "imul"}[op]
+            self._load_operand_int(instr.arg2, "rcx")
+            self.assembly.append(f"    {asm_op} rax, rcx")
+        elif op == "%":
+            # idiv leaves the dividend's sign; the divisor is positive, so
+            # a negative remainder is moved up by it (Python's modulo)
+            done = self._local_label("mod")
+            self._load_operand_int(instr.arg2, "rcx")
+            self.assembly.append(f"    cqo")
+            self.assembly.append(f"    idiv rcx")
+            self.assembly.append(f"    test rdx, rdx")
+            self.assembly.append(f"    jns {done}")
+            self.assembly.append(f"    add rdx, rcx")
+            self.assembly.append(f"{done}:")
+            self.assembly.append(f"    mov rax, rdx")
+        else:
+            # Comparison of two integers: 1 or 0
+            self._load_operand_int(instr.arg2, "rcx")
+            self.assembly.append(f"    cmp rax, rcx")
+            self.assembly.append(f"    set{INT_CONDITIONS[op]} al")
+            self.assembly.append(f"    movzx rax, al")
+        self._store_variable_int(instr.result, "rax")
+
+    def _compare_and_branch(self, instr, target, sense):
+        """Jump to target when the comparison's result is the given sense."""
+        op = instr.op
+        if self._is_integer(instr.arg1) and self._is_integer(instr.arg2):
+            condition = INT_CONDITIONS[op]
+            if not sense:
+                condition = NEGATED_CONDITIONS[condition]
+            self._load_operand_int(instr.arg1, "rax")
+            self._load_operand_int(instr.arg2, "rcx")
+            self.assembly.append(f"    cmp rax, rcx")
+            self.assembly.append(f"    j{condition} {target}")
+            return
+
+        # comisd sets ZF, PF and CF on an unordered (NaN) comparison, so
+        # a NaN operand makes every comparison but != false
+        first, second = (instr.arg2, instr.arg1) if op in ("<", "<=") else (instr.arg1, instr.arg2)
+        self._load_operand_float(first, "xmm0")
+        self._load_operand_float(second, "xmm1")
+        self.assembly.append(f"    comisd xmm0, xmm1")
+        if (op == "==") == sense and op in ("==", "!="):
+            # Equal and ordered
+            skip = self._local_label("unordered")
+            self.assembly.append(f"    jp {skip}")
+            self.assembly.append(f"    je {target}")
+            self.assembly.append(f"{skip}:")
+        elif op in ("==", "!="):
+            # Not equal or unordered
+            self.assembly.append(f"    jne {target}")
+            self.assembly.append(f"    jp {target}")
+        else:
+            strict = op in ("<", ">")
+            if sense:
+                self.assembly.append(f"    {'ja' if strict else 'jae'} {target}")
+            else:
+                self.assembly.append(f"    {'jbe' if strict else 'jb'} {target}")
+
+    def _branch_if_true(self, condition, target):
+        """Jump to target when condition is non-zero (NaN counts as true)."""
+        if condition in self.integers:
+            self.assembly.append(f"    cmp qword [rbp - {self.variables[condition]}], 0")
+            self.assembly.append(f"    jne {target}")
+            return
+        self._load_operand_float(condition, "xmm0")
+        self.assembly.append(f"    xorpd xmm1, xmm1")
+        self.assembly.append(f"    comisd xmm0, xmm1")
+        self.assembly.append(f"    jne {target}")
+        self.assembly.append(f"    jp {target}")
+
+    def _increment(self, var_name, step):
+        """Add step to a variable in place."""
+        if var_name in self.integers:
+            self.assembly.append(
+                f"    add qword [rbp - {self.variables[var_name]}], {int(float(step))}"
+            )
+            return
+        self._load_operand_float(var_name, "xmm0")
+        self._load_operand_float(step, "xmm1")
+        self.assembly.append(f"    addsd xmm0, xmm1")
+        self._store_variable_float(var_name, "xmm0")
+
+    def _is_integer(self, operand):
+        """Whether an operand is an integer variable or an integer constant."""
+        if operand in self.integers:
+            return True
+        try:
+            value = float(operand)
+        except (ValueError, TypeError):
+            return False
+        return value.is_integer() and abs(value) < 2**53
+
+    def _local_label(self, prefix):
+        """A new assembler-local label starting with prefix."""
+        self.local_labels += 1
+        return f"_{prefix}_{self.local_labels}"
+
     def _binary_op_float(self, instr, asm_op):
         """Generate assembly for binary floating-point operations."""
         # Load first operand into xmm0
@@ -243,7 +471,11 @@ class AssemblyGenerator:
             self.assembly.append(f"    cvtsi2sd {register}, rax")
         except (ValueError, TypeError):
             # Variable lookup
-            if operand in self.variables:
+            if operand in self.integers:
+                offset = self.variables[operand]
+                self.assembly.append(f"    mov rax, [rbp - {offset}]")
+                self.assembly.append(f"    cvtsi2sd {register}, rax")
+            elif operand in self.variables:
                 offset = self.variables[operand]
                 self.assembly.append(f"    movsd {register}, [rbp - {offset}]")
             else:
@@ -251,6 +483,17 @@ class AssemblyGenerator:
                 self.assembly.append(f"    mov rax, {operand}")
                 self.assembly.append(f"    cvtsi2sd {register}, rax")
 
+    def _load_operand_int(self, operand, register):
+        """Load an integer constant or integer variable into a 64-bit register."""
+        if operand in self.integers:
+            self.assembly.append(f"    mov {register}, [rbp - {self.variables[operand]}]")
+        else:
+            self.assembly.append(f"    mov {register}, {int(float(operand))}")
+
+    def _store_variable_int(self, var_name, register):
+        """Store a 64-bit register to an integer variable on the stack."""
+        self.assembly.append(f"    mov [rbp - {self.variables[var_name]}], {register}")
+
     def _store_variable_float(self, var_name, register):
         """Store an XMM register value to a float variable on the stack."""
         if var_name in self.variables:
@@ -258,18 +501,19 @@ class AssemblyGenerator:
             self.assembly.append(f"    movsd [rbp - {offset}], {register}")
 
 
-def generate_assembly(ir_instructions, output_path):
+def generate_assembly(ir_instructions, output_path, ranges=None):
     """
     Generate assembly file from IR instructions.
 
     Args:
         ir_instructions: List of IRInstruction objects
         output_path: Path to write .asm file
+        ranges: ValueRanges of the instructions, to use integer code where exact
 
     Returns:
         Path to generated assembly file
     """
-    generator = AssemblyGenerator()
+    generator = AssemblyGenerator(ranges)
     asm_code = generator.generate(ir_instructions)
 
     # Write assembly to file
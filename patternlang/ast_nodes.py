@@ -5,9 +5,14 @@ Each node represents a construct in the language.
 
 
 class ASTNode:
-    """Base class for all AST nodes."""
-
-    pass
+    """
+    Base class for all AST nodes.
+    line and column locate the token a node starts at (the operator of a
+    BinaryOp); the parser sets them, nodes built elsewhere have None.
+    """
+
+    line = None
+    column = None
 
 
 class Program(ASTNode):
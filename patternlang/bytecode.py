@@ -0,0 +1,476 @@
+"""
+Compact IR (bytecode) for PatternLang.
+Encodes three-address code with integer opcodes, slotted instructions and
+typed operands, so consumers never re-parse strings like "1.0" or "_args[0]".
+
+For the interpreter, fuse() also merges common instruction sequences into
+superinstructions (a comparison and the branch on it, a loop increment, a
+call with its pushes and getret) and drops labels, so loops dispatch
+about half as many instructions. Fused code is only meant to be run: it
+cannot be decoded back into IR, and neither can code that meter()
+prepared for a run under a budget of instructions.
+"""
+
+import operator
+import re
+from enum import IntEnum
+
+from .ir import (
+    BINARY_OPS,
+    COMPARISON_OPS,
+    IRInstruction,
+    JUMP_OPERAND,
+    build_jump_table,
+    instruction_uses,
+    is_constant,
+)
+from .numeric import FLOAT
+
+
+class Opcode(IntEnum):
+    """Integer opcodes, one per IR operation."""
+
+    ASSIGN = 0
+    ADD = 1
+    SUB = 2
+    MUL = 3
+    DIV = 4
+    MOD = 5
+    EQ = 6
+    NE = 7
+    LT = 8
+    GT = 9
+    LE = 10
+    GE = 11
+    PRINT = 12
+    GOTO = 13
+    IF_FALSE = 14
+    LABEL = 15
+    PUSH = 16
+    CALL = 17
+    RET = 18
+    GETRET = 19
+    DIV_NONZERO = 20  # '/' whose divisor is known not to be zero
+    METER = 21  # charge arg1 (a constant) against the fuel, see meter()
+
+    # Superinstructions, only found in fused code
+    INC = 22  # result += arg2 (a constant)
+    CALL_ARGS = 23  # call arg1 with the argument operands arg2, result = getret
+    IF_TRUE = 24  # jump to arg2 if arg1 is true
+    # Jump to result unless 'arg1 <op> arg2' holds
+    BRANCH_UNLESS_EQ = 25
+    BRANCH_UNLESS_NE = 26
+    BRANCH_UNLESS_LT = 27
+    BRANCH_UNLESS_GT = 28
+    BRANCH_UNLESS_LE = 29
+    BRANCH_UNLESS_GE = 30
+    # Jump to result if 'arg1 <op> arg2' holds
+    BRANCH_IF_EQ = 31
+    BRANCH_IF_NE = 32
+    BRANCH_IF_LT = 33
+    BRANCH_IF_GT = 34
+    BRANCH_IF_LE = 35
+    BRANCH_IF_GE = 36
+
+
+# IR operation string -> opcode, and back
+OPCODES = {
+    "assign": Opcode.ASSIGN,
+    "+": Opcode.ADD,
+    "-": Opcode.SUB,
+    "*": Opcode.MUL,
+    "/": Opcode.DIV,
+    "%": Opcode.MOD,
+    "==": Opcode.EQ,
+    "!=": Opcode.NE,
+    "<": Opcode.LT,
+    ">": Opcode.GT,
+    "<=": Opcode.LE,
+    ">=": Opcode.GE,
+    "print": Opcode.PRINT,
+    "goto": Opcode.GOTO,
+    "if_false": Opcode.IF_FALSE,
+    "label": Opcode.LABEL,
+    "push": Opcode.PUSH,
+    "call": Opcode.CALL,
+    "ret": Opcode.RET,
+    "getret": Opcode.GETRET,
+}
+OP_NAMES = {code: name for name, code in OPCODES.items()}
+OP_NAMES[Opcode.DIV_NONZERO] = "/"
+
+# Comparison of each compare-and-branch opcode, indexed by opcode
+_COMPARISONS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    ">": operator.gt,
+    "<=": operator.le,
+    ">=": operator.ge,
+}
+BRANCH_UNLESS = {op: Opcode.BRANCH_UNLESS_EQ + OPCODES[op] - Opcode.EQ for op in _COMPARISONS}
+BRANCH_IF = {op: Opcode.BRANCH_IF_EQ + OPCODES[op] - Opcode.EQ for op in _COMPARISONS}
+BRANCH_TESTS = [None] * (max(Opcode) + 1)
+for _op, _test in _COMPARISONS.items():
+    BRANCH_TESTS[BRANCH_UNLESS[_op]] = BRANCH_TESTS[BRANCH_IF[_op]] = _test
+
+
+class OperandKind(IntEnum):
+    """What an operand refers to."""
+
+    CONST = 0  # value is a float
+    VAR = 1  # value is a variable name
+    TEMP = 2  # value is a compiler temporary name (t0, t1, ...)
+    LABEL = 3  # value is the resolved instruction index of the label
+    ARG = 4  # value is an index into the current call's arguments
+
+
+class Operand:
+    """A typed operand. name keeps the original IR text for decoding."""
+
+    __slots__ = ("kind", "value", "name")
+
+    def __init__(self, kind, value, name):
+        self.kind = kind
+        self.value = value
+        self.name = name
+
+    def __repr__(self):
+        return f"{self.kind.name}({self.value!r})"
+
+
+class Instruction:
+    """
+    A single compact instruction. arg2 of CALL is the plain argument count.
+    line is the source line of the IR it was encoded from (of the first
+    one, for a superinstruction).
+    """
+
+    __slots__ = ("opcode", "arg1", "arg2", "result", "line")
+
+    def __init__(self, opcode, arg1=None, arg2=None, result=None, line=None):
+        self.opcode = opcode
+        self.arg1 = arg1
+        self.arg2 = arg2
+        self.result = result
+        self.line = line
+
+    def __repr__(self):
+        if self.opcode not in OP_NAMES:
+            fields = ", ".join(repr(x) for x in (self.arg1, self.arg2, self.result))
+            return f"Instruction({Opcode(self.opcode).name}, {fields})"
+        return repr(decode_instruction(self))
+
+
+TEMP_NAME = re.compile(r"^t\d+$")
+ARG_NAME = re.compile(r"^_args\[(\d+)\]$")
+
+
+def classify(operand, numeric=FLOAT):
+    """
+    Turn an IR operand string into a typed Operand (None stays None);
+    constants take their value in the NumericMode numeric.
+    """
+    if operand is None:
+        return None
+    try:
+        return Operand(OperandKind.CONST, numeric.constant(operand), operand)
+    except (ValueError, TypeError):
+        pass
+    match = ARG_NAME.match(operand)
+    if match:
+        return Operand(OperandKind.ARG, int(match.group(1)), operand)
+    if TEMP_NAME.match(operand):
+        return Operand(OperandKind.TEMP, operand, operand)
+    return Operand(OperandKind.VAR, operand, operand)
+
+
+def encode(instructions, jump_table=None, ranges=None, numeric=FLOAT):
+    """
+    Encode IRInstructions into compact Instructions, with constants read in
+    the NumericMode numeric.
+    Label operands of jumps and calls are resolved to instruction indices.
+    A division by a non-zero constant, or by a divisor ranges (ValueRanges
+    of the instructions) proves non-zero, becomes DIV_NONZERO (except in
+    exact mode, where division follows the mode's policy).
+    """
+    if jump_table is None:
+        jump_table = build_jump_table(instructions)
+
+    def label(name):
+        """A label operand resolved through the jump table."""
+        return Operand(OperandKind.LABEL, jump_table[name], name)
+
+    return [_encode_one(instr, label, ranges, numeric) for instr in instructions]
+
+
+def _nonzero_divisor(instr, divisor, ranges):
+    """True if a division by divisor can skip its zero check."""
+    if divisor.kind == OperandKind.CONST:
+        return divisor.value != 0
+    return ranges is not None and ranges.nonzero_divisor(instr)
+
+
+def fuse(instructions, ranges=None, numeric=FLOAT):
+    """
+    Encode IRInstructions into compact code with superinstructions:
+    - 't = a <op> b; if_false t goto L' becomes BRANCH_UNLESS_<op> a, b, L,
+      and with 'goto T; L:' following, BRANCH_IF_<op> a, b, T
+    - 'if_false t goto L; goto T; L:' becomes IF_TRUE t, T
+    - 'x = x + c' and 't = x + c; x = t' become INC x, c
+    - 't = a <op> b; x = t' becomes 'x = a <op> b'
+    - the last n pushes before 'call f, n', and a getret right after it,
+      become CALL_ARGS f, (arguments), result
+    - 'goto L' to a loop test 'L: BRANCH_UNLESS_<op> a, b, X' with X just
+      after the goto becomes BRANCH_IF_<op> a, b to the loop body
+    A temporary a fused sequence writes is dropped, so sequences are only
+    fused when nothing else reads it. Labels are dropped too: a jump goes
+    to the instruction before the label's position, since the interpreter
+    advances past the instruction it jumps to. Constants are read in the
+    NumericMode numeric.
+    """
+    uses = {}
+    for instr in instructions:
+        for name in instruction_uses(instr):
+            uses[name] = uses.get(name, 0) + 1
+
+    def private(name):
+        """True if name is read exactly once."""
+        return uses.get(name, 0) == 1
+
+    def operand(text):
+        """An IR operand as a typed Operand in the numeric mode."""
+        return classify(text, numeric)
+
+    def op_at(k):
+        """The IR op at index k, or None past the end."""
+        return instructions[k].op if k < len(instructions) else None
+
+    code = []
+    positions = {}  # label -> index its jumps land before
+    targets = []  # label Operands resolved once every position is known
+
+    def label(name):
+        """A label operand, resolved once every label's position is known."""
+        operand = Operand(OperandKind.LABEL, None, name)
+        targets.append(operand)
+        return operand
+
+    pushes = 0  # Plain PUSH instructions just emitted
+    i = 0
+    while i < len(instructions):
+        instr = instructions[i]
+        op = instr.op
+        after = instructions[i + 1] if i + 1 < len(instructions) else None
+        if op == "label":
+            positions[instr.result] = len(code)
+            pushes = 0  # A jump may land between the pushes and the call
+            i += 1
+            continue
+        increment = _increment(instr, after, private) if op == "+" else None
+
+        if (
+            op in COMPARISON_OPS
+            and after is not None
+            and after.op == "if_false"
+            and after.arg1 == instr.result
+            and private(instr.result)
+        ):
+            # With 'goto T; L:' after the branch, jump to T when the test holds
+            if (
+                op_at(i + 2) == "goto"
+                and op_at(i + 3) == "label"
+                and instructions[i + 3].result == after.arg2
+            ):
+                opcode, target, size = BRANCH_IF[op], instructions[i + 2].arg1, 3
+            else:
+                opcode, target, size = BRANCH_UNLESS[op], after.arg2, 2
+            code.append(
+                Instruction(opcode, operand(instr.arg1), operand(instr.arg2), label(target))
+            )
+            i += size
+        elif (
+            op == "if_false"
+            and op_at(i + 1) == "goto"
+            and op_at(i + 2) == "label"
+            and instructions[i + 2].result == instr.arg2
+        ):
+            code.append(Instruction(Opcode.IF_TRUE, operand(instr.arg1), label(after.arg1)))
+            i += 2
+        elif increment is not None:
+            name, step, size = increment
+            code.append(Instruction(Opcode.INC, operand(name), operand(step), operand(name)))
+            i += size
+        elif (
+            op in BINARY_OPS
+            and after is not None
+            and after.op == "assign"
+            and after.arg1 == instr.result
+            and after.result != instr.result
+            and private(instr.result)
+        ):
+            fused = _encode_one(instr, label, ranges, numeric)
+            fused.result = operand(after.result)
+            code.append(fused)
+            i += 2
+        elif op == "call" and pushes >= (instr.arg2 or 0):
+            argc = instr.arg2 or 0
+            args = [] if not argc else [pushed.arg1 for pushed in code[-argc:]]
+            del code[len(code) - argc :]
+            result = None
+            size = 1
+            if after is not None and after.op == "getret":
+                result, size = operand(after.result), 2
+            arguments = tuple((f"_args[{k}]", operand) for k, operand in enumerate(args))
+            code.append(Instruction(Opcode.CALL_ARGS, label(instr.arg1), arguments, result))
+            i += size
+        else:
+            code.append(_encode_one(instr, label, ranges, numeric))
+            i += 1
+        code[-1].line = instr.line
+        pushes = pushes + 1 if op == "push" else 0
+
+    for operand in targets:
+        operand.value = positions[operand.name] - 1
+
+    # A goto back to a loop's test, with the test's exit right after the
+    # goto, becomes the test with the opposite sense: the loop then runs
+    # one branch per iteration instead of a branch and a jump
+    for k, instr in enumerate(code):
+        if instr.opcode != Opcode.GOTO:
+            continue
+        landing = instr.arg1.value + 1
+        test = code[landing] if landing < len(code) else None
+        if (
+            test is not None
+            and test.opcode >= Opcode.BRANCH_UNLESS_EQ
+            and test.result.value == k
+        ):
+            if test.opcode >= Opcode.BRANCH_IF_EQ:
+                opcode = test.opcode - Opcode.BRANCH_IF_EQ + Opcode.BRANCH_UNLESS_EQ
+            else:
+                opcode = test.opcode - Opcode.BRANCH_UNLESS_EQ + Opcode.BRANCH_IF_EQ
+            body = Operand(OperandKind.LABEL, landing, instr.arg1.name)
+            code[k] = Instruction(Opcode(opcode), test.arg1, test.arg2, body, instr.line)
+    return code
+
+
+def _increment(instr, after, private):
+    """(x, c, instructions covered) if instr starts an increment of x by a constant c."""
+    if is_constant(instr.arg2) and not is_constant(instr.arg1):
+        name, step = instr.arg1, instr.arg2
+    elif is_constant(instr.arg1) and not is_constant(instr.arg2):
+        name, step = instr.arg2, instr.arg1  # c + x is x + c
+    else:
+        return None
+    if instr.result == name:
+        return name, step, 1
+    if (
+        after is not None
+        and after.op == "assign"
+        and after.arg1 == instr.result
+        and after.result == name
+        and private(instr.result)
+    ):
+        return name, step, 2
+    return None
+
+
+def _encode_one(instr, label, ranges, numeric):
+    """One plain compact instruction, with label operands made by label."""
+    opcode = OPCODES[instr.op]
+    if opcode == Opcode.LABEL:
+        return Instruction(opcode, result=label(instr.result), line=instr.line)
+    field = JUMP_OPERAND.get(instr.op)
+    operands = {}
+    for name in ("arg1", "arg2", "result"):
+        value = getattr(instr, name)
+        if name == field:
+            operands[name] = label(value)
+        elif opcode == Opcode.CALL and name == "arg2":
+            operands[name] = value or 0
+        else:
+            operands[name] = classify(value, numeric)
+    if (
+        opcode == Opcode.DIV
+        and not numeric.exact
+        and _nonzero_divisor(instr, operands["arg2"], ranges)
+    ):
+        opcode = Opcode.DIV_NONZERO
+    return Instruction(opcode, **operands, line=instr.line)
+
+
+def meter(code):
+    """
+    Put a METER before every backward jump and every call of compact code
+    (fused or not), charging a backward jump the instructions from its
+    target to itself and a call the length of the function it calls. That
+    is at least what runs until the next METER, apart from straight-line
+    code at most as long as the program, so a run that stops once the
+    charges exceed a budget has run about that many instructions at most.
+    """
+    calls = (Opcode.CALL, Opcode.CALL_ARGS)
+    starts = sorted({instr.arg1.value + 1 for instr in code if instr.opcode in calls})
+    lengths = {start: stop - start for start, stop in zip(starts, starts[1:] + [len(code)])}
+    charges = {}
+    for k, instr in enumerate(code):
+        field = _jump_field(instr.opcode)
+        if field is None:
+            continue
+        target = getattr(instr, field).value
+        if instr.opcode in calls:
+            charges[k] = lengths[target + 1]
+        elif target < k:
+            charges[k] = k - target
+
+    metered = []
+    landing = []  # Old index -> new index a jump to it lands on
+    for k, instr in enumerate(code):
+        landing.append(len(metered))
+        if k in charges:
+            charge = Operand(OperandKind.CONST, charges[k], str(charges[k]))
+            metered.append(Instruction(Opcode.METER, charge, line=instr.line))
+        metered.append(instr)
+    landing.append(len(metered))
+
+    for k, instr in enumerate(metered):
+        field = _jump_field(instr.opcode)
+        if field is None:
+            continue
+        # A copy, so the code passed in keeps its targets
+        target = getattr(instr, field)
+        moved = Instruction(instr.opcode, instr.arg1, instr.arg2, instr.result, instr.line)
+        index = landing[target.value + 1] - 1
+        setattr(moved, field, Operand(OperandKind.LABEL, index, target.name))
+        metered[k] = moved
+    return metered
+
+
+def _jump_field(opcode):
+    """The field holding the label of a jump or call opcode, else None."""
+    if opcode in (Opcode.GOTO, Opcode.CALL, Opcode.CALL_ARGS):
+        return "arg1"
+    if opcode in (Opcode.IF_FALSE, Opcode.IF_TRUE):
+        return "arg2"
+    if opcode >= Opcode.BRANCH_UNLESS_EQ:
+        return "result"
+    return None
+
+
+def decode_instruction(instr):
+    """Turn one compact Instruction back into an IRInstruction."""
+    fields = {}
+    for name in ("arg1", "arg2", "result"):
+        value = getattr(instr, name)
+        fields[name] = value.name if isinstance(value, Operand) else value
+    return IRInstruction(OP_NAMES[instr.opcode], **fields, line=instr.line)
+
+
+def decode(code):
+    """Turn compact Instructions back into IRInstructions."""
+    return [decode_instruction(instr) for instr in code]
+
+
+def is_compact(code):
+    """True if code is a list of compact Instructions."""
+    return bool(code) and isinstance(code[0], Instruction)
@@ -0,0 +1,220 @@
+"""
+Command-line handling shared by the PatternLang entry points.
+
+main.py at the top of the tree (which can also compile to assembly) and
+patternlang/main.py take the same optimization, numeric and run-time
+flags: add_options defines them, check_options rejects combinations
+that cannot work, compile_options maps them onto compile_and_run's
+keyword arguments, and execute runs the optimized IR with the
+interpreter they select and reports what it measured.
+"""
+
+import sys
+import json
+import signal
+from pathlib import Path
+
+from .interpreter import (
+    MEMO_CAPACITY,
+    Interpreter,
+    MemoizingInterpreter,
+    ProfilingInterpreter,
+    SamplingInterpreter,
+)
+from .numeric import DIVISIONS
+from .optimizer import Optimizer
+
+
+def add_options(parser):
+    """Add the source file argument and the flags both entry points take."""
+    parser.add_argument("file", type=str, help="PatternLang source file (.pl)")
+
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="Show detailed output from each compiler phase",
+    )
+
+    parser.add_argument(
+        "--fast-math",
+        action="store_true",
+        help="Allow optimizations that can change float results in the last bits",
+    )
+
+    parser.add_argument(
+        "-O",
+        dest="opt_level",
+        type=int,
+        choices=Optimizer.LEVELS,
+        default=2,
+        help="Optimization level: -O0 (none) to -O3 (default: -O2)",
+    )
+
+    parser.add_argument(
+        "--time-passes",
+        action="store_true",
+        help="Report the run time and instruction-count change of every optimizer pass",
+    )
+
+    parser.add_argument(
+        "--fuel",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Run the program at compile time for up to N instructions and keep "
+        "only its output if it finishes (default: 1000000 at -O3, 0 otherwise)",
+    )
+
+    parser.add_argument(
+        "--memoize",
+        action="store_true",
+        help="Cache the results of pure functions at run time and report hits, "
+        "misses and evictions",
+    )
+
+    parser.add_argument(
+        "--memo-size",
+        type=int,
+        default=MEMO_CAPACITY,
+        metavar="N",
+        help=f"Results --memoize keeps per function (default: {MEMO_CAPACITY})",
+    )
+
+    parser.add_argument(
+        "--exact",
+        action="store_true",
+        help="Keep integers exact at any size instead of using floats "
+        "(also '#pragma exact' in the source)",
+    )
+
+    parser.add_argument(
+        "--division",
+        choices=DIVISIONS,
+        default=None,
+        help="What dividing integers gives in exact mode: an exact rational "
+        "(default) or a float",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Count executions per instruction, operation, call and loop, sample "
+        "the time per basic block, and report them",
+    )
+
+    parser.add_argument(
+        "--profile-json",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="Write the --profile counters as JSON to PATH (implies --profile)",
+    )
+
+    parser.add_argument(
+        "--flamegraph",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="Sample the running source line with a profiling timer, report the "
+        "time per line and write the call stacks in collapsed form to PATH "
+        "(for flamegraph.pl or speedscope)",
+    )
+
+
+def check_options(parser, args):
+    """Exit with a usage error if the parsed flags cannot be combined."""
+    if args.memo_size < 1:
+        parser.error("--memo-size must be at least 1")
+    if args.memoize and (args.profile or args.profile_json):
+        parser.error("--profile cannot be combined with --memoize")
+    if args.flamegraph is not None:
+        if args.memoize or args.profile or args.profile_json:
+            parser.error("--flamegraph cannot be combined with --profile or --memoize")
+        if not hasattr(signal, "setitimer"):
+            parser.error("--flamegraph needs a profiling timer (signal.setitimer)")
+
+
+def compile_options(args):
+    """compile_and_run's keyword arguments for the flags add_options defines."""
+    return {
+        "verbose": args.verbose,
+        "fast_math": args.fast_math,
+        "opt_level": args.opt_level,
+        "time_passes": args.time_passes,
+        "fuel": args.fuel,
+        "memoize": args.memo_size if args.memoize else None,
+        "exact": args.exact,
+        "division": args.division,
+        "profile": args.profile,
+        "profile_json": args.profile_json,
+        "flamegraph": args.flamegraph,
+    }
+
+
+def read_source(file_name):
+    """The path and text of a source file; exits with a message if it cannot be read."""
+    source_path = Path(file_name)
+
+    if not source_path.exists():
+        print(f"Error: File '{file_name}' not found", file=sys.stderr)
+        sys.exit(1)
+
+    if not source_path.suffix == ".pl":
+        print(f"Warning: File extension is not .pl", file=sys.stderr)
+
+    try:
+        source_code = source_path.read_text(encoding="utf-8")
+    except Exception as e:
+        print(f"Error reading file: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    return source_path, source_code
+
+
+def execute(
+    optimized_ir,
+    optimizer,
+    numeric,
+    source_code,
+    memoize=None,
+    profile=False,
+    profile_json=None,
+    flamegraph=None,
+):
+    """
+    Run optimized IR with the interpreter the options ask for (profiling,
+    sampling, memoizing or plain) and print its report to stderr.
+    """
+    profile = profile or profile_json is not None
+    if profile:
+        interpreter = ProfilingInterpreter(numeric)
+    elif flamegraph is not None:
+        interpreter = SamplingInterpreter(numeric)
+    elif memoize is not None:
+        interpreter = MemoizingInterpreter(memoize, numeric)
+    else:
+        interpreter = Interpreter(numeric)
+    interpreter.execute(optimized_ir, optimizer.jump_table, optimizer.ranges)
+
+    if profile:
+        report = interpreter.profile()
+        print("Profile:", file=sys.stderr)
+        for line in report.report():
+            print(f"  {line}", file=sys.stderr)
+        if profile_json is not None:
+            with open(profile_json, "w", encoding="utf-8") as f:
+                json.dump(report.to_json(), f, indent=2)
+
+    if flamegraph is not None:
+        samples = interpreter.samples()
+        print("Samples:", file=sys.stderr)
+        for line in samples.report(source_code):
+            print(f"  {line}", file=sys.stderr)
+        with open(flamegraph, "w", encoding="utf-8") as f:
+            f.writelines(line + "\n" for line in samples.collapsed())
+
+    if memoize is not None:
+        print("Memoized calls:", file=sys.stderr)
+        for line in interpreter.summary():
+            print(f"  {line}", file=sys.stderr)
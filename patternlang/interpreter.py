@@ -3,182 +3,615 @@ Interpreter for PatternLang IR.
 Executes three-address code instructions.
 """
 
+import signal
+from collections import OrderedDict
+from math import copysign
+from time import perf_counter
+
+from .analysis.callgraph import CallGraph
+from .analysis.cfg import build_cfg
+from .bytecode import (
+    BRANCH_TESTS,
+    OP_NAMES,
+    Opcode,
+    OperandKind,
+    decode,
+    encode,
+    fuse,
+    is_compact,
+    meter,
+)
+from .ir import BINARY_OPS
+from .numeric import EXACT_OPERATORS, FLOAT
+from .profiler import SAMPLE_INTERVAL, Profile, SampleProfile
+
+# Plain ints for the dispatch loop
+ASSIGN = int(Opcode.ASSIGN)
+ADD = int(Opcode.ADD)
+SUB = int(Opcode.SUB)
+MUL = int(Opcode.MUL)
+DIV = int(Opcode.DIV)
+MOD = int(Opcode.MOD)
+EQ = int(Opcode.EQ)
+NE = int(Opcode.NE)
+LT = int(Opcode.LT)
+GT = int(Opcode.GT)
+LE = int(Opcode.LE)
+GE = int(Opcode.GE)
+PRINT = int(Opcode.PRINT)
+GOTO = int(Opcode.GOTO)
+IF_FALSE = int(Opcode.IF_FALSE)
+LABEL = int(Opcode.LABEL)
+PUSH = int(Opcode.PUSH)
+CALL = int(Opcode.CALL)
+RET = int(Opcode.RET)
+GETRET = int(Opcode.GETRET)
+DIV_NONZERO = int(Opcode.DIV_NONZERO)
+METER = int(Opcode.METER)
+INC = int(Opcode.INC)
+CALL_ARGS = int(Opcode.CALL_ARGS)
+IF_TRUE = int(Opcode.IF_TRUE)
+BRANCH_UNLESS = int(Opcode.BRANCH_UNLESS_EQ)  # First of the compare-and-branch opcodes
+BRANCH_IF = int(Opcode.BRANCH_IF_EQ)
+CONST = int(OperandKind.CONST)
+
+# Results a memoizing interpreter keeps per function by default
+MEMO_CAPACITY = 1024
+
+# Dispatches between two clock samples of a profiling interpreter
+SAMPLE_PERIOD = 256
+
 
 class Interpreter:
     """
     Executes three-address code on a simple virtual machine.
     Maintains runtime state including variables and instruction pointer.
+    Numbers follow the given NumericMode; in exact mode the binary
+    operators go through it instead of compute_op, so the float dispatch
+    loop is the same in both modes.
     """
 
-    def __init__(self):
+    # Run IR as fused code (superinstructions, no labels); subclasses with
+    # a dispatch loop of their own run plain code
+    superinstructions = True
+
+    # Route calls and returns through enter() and leave()
+    call_hooks = False
+
+    def __init__(self, numeric=FLOAT):
+        self.numeric = numeric
+        if numeric.exact:
+            self.compute_op = self.compute_exact
+            self.operators = {
+                int(code): numeric.divide if name == "/" else EXACT_OPERATORS[name]
+                for code, name in OP_NAMES.items()
+                if name in BINARY_OPS
+            }
         self.variables = {}
-        self.instructions = []
+        self.code = []  # Compact instructions being executed
         self.ip = 0  # Instruction pointer
-        self.labels = {}  # Map label names to instruction indices
-        self.call_stack = []  # stack of frames: {return_ip, locals}
+        self.call_stack = []  # stack of frames: {return_ip, locals, result}
         self.arg_stack = []  # argument stack for calls
         self.return_value = 0
 
-    def execute(self, instructions):
+    def execute(self, instructions, jump_table=None, ranges=None):
         """
         Main execution entry point.
-        Runs all instructions sequentially.
+        Accepts IRInstructions (encoded here, using jump_table if given,
+        and ValueRanges of the instructions to drop division checks they
+        prove unnecessary) or already-encoded compact code, then runs it.
         """
-        self.instructions = instructions
+        if is_compact(instructions):
+            self.code = instructions
+        elif self.superinstructions:
+            self.code = fuse(instructions, ranges, self.numeric)
+        else:
+            self.code = encode(instructions, jump_table, ranges, self.numeric)
         self.ip = 0
         self.variables = {}
+        try:
+            self.run()
+        except OverflowError as e:
+            # An exact-mode int too large to mix with a float
+            raise RuntimeError(f"Number too large: {e}")
+
+    def run(self):
+        """
+        Dispatch loop over compact instructions.
+        Operands are typed, so constants are used directly and names are
+        looked up by their IR text (arguments live in the frame as _args[i]).
+        """
+        code = self.code
+        end = len(code)
+        variables = self.variables
+        ip = self.ip
+        tests = BRANCH_TESTS
+        hooks = self.call_hooks
+        emit = self.emit
+
+        try:
+            while ip < end:
+                instr = code[ip]
+                op = instr.opcode
+
+                if op == ASSIGN:
+                    a = instr.arg1
+                    variables[instr.result.name] = (
+                        a.value if a.kind == CONST else variables[a.name]
+                    )
+
+                elif op <= GE:
+                    # Binary operation: result = arg1 op arg2
+                    a = instr.arg1
+                    b = instr.arg2
+                    val1 = a.value if a.kind == CONST else variables[a.name]
+                    val2 = b.value if b.kind == CONST else variables[b.name]
+                    variables[instr.result.name] = self.compute_op(op, val1, val2)
+
+                elif op >= BRANCH_UNLESS:
+                    # Compare and branch: no 1.0/0.0 result, no separate if_false
+                    a = instr.arg1
+                    b = instr.arg2
+                    holds = tests[op](
+                        a.value if a.kind == CONST else variables[a.name],
+                        b.value if b.kind == CONST else variables[b.name],
+                    )
+                    if holds if op >= BRANCH_IF else not holds:
+                        ip = instr.result.value
+
+                elif op == INC:
+                    name = instr.result.name
+                    variables[name] = variables[name] + instr.arg2.value
+
+                elif op == DIV_NONZERO:
+                    # The divisor cannot be zero, so no check (and no call)
+                    a = instr.arg1
+                    b = instr.arg2
+                    variables[instr.result.name] = (
+                        a.value if a.kind == CONST else variables[a.name]
+                    ) / (b.value if b.kind == CONST else variables[b.name])
+
+                elif op == IF_FALSE:
+                    a = instr.arg1
+                    if not (a.value if a.kind == CONST else variables[a.name]):
+                        ip = instr.arg2.value
+
+                elif op == GOTO:
+                    # Jump to label (the label itself is a no-op, so land on it)
+                    ip = instr.arg1.value
+
+                elif op == IF_TRUE:
+                    a = instr.arg1
+                    if a.value if a.kind == CONST else variables[a.name]:
+                        ip = instr.arg2.value
+
+                elif op == LABEL:
+                    pass
+
+                elif op == PRINT:
+                    a = instr.arg1
+                    emit(a.value if a.kind == CONST else variables[a.name], instr.line)
+
+                elif op == PUSH:
+                    a = instr.arg1
+                    self.arg_stack.append(
+                        a.value if a.kind == CONST else variables[a.name]
+                    )
+
+                elif op == CALL_ARGS:
+                    # Arguments straight from their operands into the new frame
+                    frame = {"return_ip": ip, "locals": variables, "result": instr.result}
+                    args = {
+                        name: a.value if a.kind == CONST else variables[a.name]
+                        for name, a in instr.arg2
+                    }
+                    if hooks and self.enter(instr.arg1.name, args, frame):
+                        if instr.result is not None:
+                            variables[instr.result.name] = self.return_value
+                    else:
+                        self.call_stack.append(frame)
+                        variables = args
+                        ip = instr.arg1.value
+
+                elif op == CALL:
+                    # arg1: target label, arg2: arg count
+                    argc = instr.arg2
+                    frame = {"return_ip": ip, "locals": variables, "result": None}
+                    # Bind arguments into the new frame as _args[i]
+                    values = self.arg_stack[len(self.arg_stack) - argc :]
+                    del self.arg_stack[len(self.arg_stack) - argc :]
+                    args = {f"_args[{i}]": value for i, value in enumerate(values)}
+                    if not (hooks and self.enter(instr.arg1.name, args, frame)):
+                        self.call_stack.append(frame)
+                        variables = args
+                        ip = instr.arg1.value
+
+                elif op == RET:
+                    a = instr.arg1
+                    self.return_value = (
+                        a.value if a.kind == CONST else variables[a.name]
+                    )
+                    if self.call_stack:
+                        # Restore caller frame; ip then advances past the call
+                        frame = self.call_stack.pop()
+                        variables = frame["locals"]
+                        ip = frame["return_ip"]
+                        if hooks:
+                            self.leave(frame)
+                        if frame["result"] is not None:
+                            # A fused call takes its getret along
+                            variables[frame["result"].name] = self.return_value
+                    # A return at top level is ignored
+
+                elif op == GETRET:
+                    variables[instr.result.name] = self.return_value
+
+                elif op == METER:
+                    # Metered code only (BoundedInterpreter): stop on the
+                    # loop iteration or call the fuel no longer covers
+                    self.steps += instr.arg1.value
+                    if self.steps > self.fuel:
+                        break
 
-        # Build label map
-        self.build_label_map()
-
-        # Execute instructions
-        while self.ip < len(self.instructions):
-            instr = self.instructions[self.ip]
-            self.execute_instruction(instr)
-            self.ip += 1
-
-    def build_label_map(self):
-        """Build a mapping of label names to instruction indices."""
-        self.labels = {}
-        for i, instr in enumerate(self.instructions):
-            if instr.op == "label":
-                self.labels[instr.result] = i
-
-    def execute_instruction(self, instr):
-        """Execute a single instruction."""
-        if instr.op == "assign":
-            # result = arg1
-            value = self.get_value(instr.arg1)
-            self.variables[instr.result] = value
-
-        elif instr.op in ["+", "-", "*", "/", "%", "==", "!=", "<", ">", "<=", ">="]:
-            # result = arg1 op arg2
-            val1 = self.get_value(instr.arg1)
-            val2 = self.get_value(instr.arg2)
-            result = self.compute_op(instr.op, val1, val2)
-            self.variables[instr.result] = result
-
-        elif instr.op == "print":
-            # Print arg1
-            value = self.get_value(instr.arg1)
-            print(value)
-
-        elif instr.op == "goto":
-            # Jump to label
-            label = instr.arg1
-            if label in self.labels:
-                self.ip = self.labels[label] - 1  # -1 because ip will be incremented
-            else:
-                raise RuntimeError(f"Undefined label: {label}")
-
-        elif instr.op == "if_false":
-            # if_false condition goto label
-            condition = self.get_value(instr.arg1)
-            if not condition:
-                label = instr.arg2
-                if label in self.labels:
-                    self.ip = self.labels[label] - 1
                 else:
-                    raise RuntimeError(f"Undefined label: {label}")
-
-        elif instr.op == "label":
-            # Label marker - no operation
-            pass
-        elif instr.op == "push":
-            # Push argument value onto arg stack
-            value = self.get_value(instr.arg1)
-            self.arg_stack.append(value)
-        elif instr.op == "call":
-            # arg1: target label, arg2: arg count
-            target = instr.arg1
-            argc = instr.arg2 or 0
-            # Save current frame
-            self.call_stack.append(
-                {"return_ip": self.ip, "locals": self.variables.copy()}
-            )
-            # Bind parameters: interpreter will map by reading parameter names from function label context
-            # Since IR doesn't carry parameter names, we'll set special array _args
-            self.variables = {"_args": list(self.arg_stack[-argc:])}
-            # Consume args
-            for _ in range(argc):
-                self.arg_stack.pop()
-            # Jump to function label
-            if target in self.labels:
-                self.ip = self.labels[target]
-            else:
-                raise RuntimeError(f"Undefined function label: {target}")
-        elif instr.op == "ret":
-            # Set return value and restore previous frame
-            self.return_value = self.get_value(instr.arg1)
-            if not self.call_stack:
-                # return from top-level: ignore
-                return
-            frame = self.call_stack.pop()
-            self.variables = frame["locals"]
-            # Set ip to return_ip (will increment to next instruction)
-            self.ip = frame["return_ip"]
-        elif instr.op == "getret":
-            # Move return_value into a variable
-            self.variables[instr.result] = self.return_value
+                    raise RuntimeError(f"Unknown instruction: {instr}")
 
-        else:
-            raise RuntimeError(f"Unknown instruction: {instr.op}")
+                ip += 1
+        except KeyError as e:
+            raise RuntimeError(f"Undefined variable: {e.args[0]}")
+        finally:
+            self.ip = ip
+            self.variables = variables
+
+    def emit(self, value, line):
+        """Output a printed value (line is the source line of the print)."""
+        print(value)
 
-    def get_value(self, operand):
+    def enter(self, label, args, frame):
         """
-        Get the value of an operand.
-        Returns float value for constants or variables.
+        Call hook (with call_hooks set): runs before the call of label with
+        the new frame's variables args. Returning True answers the call
+        without running it, with self.return_value as its result.
         """
-        # Try to parse as constant
-        try:
-            return float(operand)
-        except (ValueError, TypeError):
-            pass
-
-        # Look up variable
-        if operand in self.variables:
-            return self.variables[operand]
-
-        # Undefined variable
-        # Special case: arguments array lookup _args[i]
-        if (
-            isinstance(operand, str)
-            and operand.startswith("_args[")
-            and operand.endswith("]")
-        ):
-            idx = int(operand[6:-1])
-            args = self.variables.get("_args", [])
-            if 0 <= idx < len(args):
-                return args[idx]
-            return 0.0
-        # Undefined variable
-        raise RuntimeError(f"Undefined variable: {operand}")
+        return False
+
+    def leave(self, frame):
+        """Return hook (with call_hooks set): runs once frame has returned self.return_value."""
 
     def compute_op(self, op, val1, val2):
-        """Compute the result of an operation."""
-        if op == "+":
+        """Compute the result of a binary opcode."""
+        if op == ADD:
             return val1 + val2
-        elif op == "-":
+        elif op == SUB:
             return val1 - val2
-        elif op == "*":
+        elif op == MUL:
             return val1 * val2
-        elif op == "/":
+        elif op == DIV:
             if val2 == 0:
                 raise RuntimeError("Division by zero")
             return val1 / val2  # Float division
-        elif op == "%":
+        elif op == MOD:
             return val1 % val2
-        elif op == "==":
+        elif op == EQ:
             return 1.0 if val1 == val2 else 0.0
-        elif op == "!=":
+        elif op == NE:
             return 1.0 if val1 != val2 else 0.0
-        elif op == "<":
+        elif op == LT:
             return 1.0 if val1 < val2 else 0.0
-        elif op == ">":
+        elif op == GT:
             return 1.0 if val1 > val2 else 0.0
-        elif op == "<=":
+        elif op == LE:
             return 1.0 if val1 <= val2 else 0.0
-        elif op == ">=":
+        elif op == GE:
             return 1.0 if val1 >= val2 else 0.0
         else:
             raise RuntimeError(f"Unknown operator: {op}")
+
+    def compute_exact(self, op, val1, val2):
+        """Compute the result of a binary opcode in exact mode."""
+        return self.operators[op](val1, val2)
+
+
+class BoundedInterpreter(Interpreter):
+    """
+    Runs at most about `fuel` instructions and collects what the program
+    prints instead of printing it, so a program can be run at compile
+    time. It runs in Interpreter.run on metered code: meter() charges each
+    loop iteration and call up front, at its backward jump or call, so
+    only those check the fuel, not every instruction.
+    """
+
+    def __init__(self, fuel):
+        super().__init__()
+        self.fuel = fuel
+        self.steps = 0  # Instructions charged
+        self.output = []  # Values printed, in order
+        self.output_lines = []  # Source line of the print of each value
+        self.finished = False  # True once the program ran to its end
+
+    def execute(self, instructions, jump_table=None, ranges=None):
+        """Fuse and meter the program, then run it."""
+        if not is_compact(instructions):
+            instructions = fuse(instructions, ranges, self.numeric)
+        super().execute(meter(instructions))
+
+    def run(self):
+        """Run until the program ends or the fuel runs out."""
+        super().run()
+        self.finished = self.ip >= len(self.code)
+
+    def emit(self, value, line):
+        """Collect a printed value and the line of its print."""
+        self.output.append(value)
+        self.output_lines.append(line)
+
+
+class MemoizingInterpreter(Interpreter):
+    """
+    Caches the results of pure functions (ones that can never print,
+    directly or through a callee; frames are separate, so they cannot
+    touch the caller's variables either). A call whose arguments were
+    seen before returns the cached value instead of running the body.
+    Each function keeps its `capacity` most recently used results.
+
+    Arguments are keyed by value, except that 0.0 and -0.0 are kept apart
+    (they compare equal, but can give different results), and so are
+    values of different types in exact mode (1 and 1.0).
+    The cache sits in the call hooks, so the program runs in
+    Interpreter.run.
+    """
+
+    call_hooks = True
+
+    def __init__(self, capacity=MEMO_CAPACITY, numeric=FLOAT):
+        super().__init__(numeric)
+        self.capacity = capacity
+        self.pure = set()  # Labels of the functions that are memoized
+        self.caches = {}  # label -> OrderedDict of argument key -> result
+        self.stats = {}  # function name -> {"hits", "misses", "evictions"}
+
+    def execute(self, instructions, jump_table=None, ranges=None):
+        """Find the pure functions, then run the program."""
+        ir = decode(instructions) if is_compact(instructions) else instructions
+        graph = CallGraph.from_cfg(build_cfg(ir))
+        self.pure = {f"func_{name}" for name in graph.functions if graph.is_pure(name)}
+        super().execute(instructions, jump_table, ranges)
+
+    def summary(self):
+        """One line per memoized function that was called."""
+        return [
+            f"{name}: " + ", ".join(f"{value} {key}" for key, value in stats.items())
+            for name, stats in self.stats.items()
+        ]
+
+    def enter(self, label, args, frame):
+        """Answer a pure function's call from its cache, or note the miss in frame."""
+        if label not in self.pure:
+            return False
+        key = tuple(args.values())
+        if self.numeric.exact:
+            key = tuple(map(_typed_key, key))
+        elif 0.0 in key:
+            key = tuple((value, copysign(1.0, value)) for value in key)
+        cache = self.caches.get(label)
+        if cache is None:
+            cache = self.caches[label] = OrderedDict()
+        stats = self._stats(label)
+        if key in cache:
+            stats["hits"] += 1
+            cache.move_to_end(key)
+            self.return_value = cache[key]
+            return True
+        stats["misses"] += 1
+        frame["memo"] = (cache, key, stats)
+        return False
+
+    def leave(self, frame):
+        """Cache the result of a call that missed, evicting the least recently used."""
+        if "memo" not in frame:
+            return
+        cache, key, stats = frame["memo"]
+        cache[key] = self.return_value
+        if len(cache) > self.capacity:
+            cache.popitem(last=False)
+            stats["evictions"] += 1
+
+    def _stats(self, label):
+        """The hit, miss and eviction counters of the function at label."""
+        name = label[len("func_") :]
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = {"hits": 0, "misses": 0, "evictions": 0}
+        return stats
+
+
+class ProfilingInterpreter(Interpreter):
+    """
+    Counts the executions of every instruction and the jumps of every
+    if_false, and reads the clock every `sample_period` dispatches,
+    crediting the time since the last reading to the basic block running
+    then (reading it every dispatch would cost more than most
+    instructions). The counters live in a dispatch loop of their own, so
+    Interpreter.run pays nothing for them; profile() summarizes them.
+    Code is run unfused, so counts line up with the IR instructions.
+    """
+
+    superinstructions = False
+
+    def __init__(self, numeric=FLOAT, sample_period=SAMPLE_PERIOD):
+        super().__init__(numeric)
+        self.sample_period = sample_period
+        self.ir = []  # IR instructions being profiled
+        self.cfg = None
+        self.block_of = []  # Instruction index -> basic block id
+        self.counts = []  # Instruction index -> executions
+        self.taken = []  # Instruction index -> jumps taken by an if_false
+        self.block_time = []  # Block id -> sampled seconds
+        self.seconds = 0.0
+
+    def execute(self, instructions, jump_table=None, ranges=None):
+        """Set up the counters for the program, then run and time it."""
+        self.ir = decode(instructions) if is_compact(instructions) else instructions
+        self.cfg = build_cfg(self.ir)
+        self.block_of = [b.id for b in self.cfg.blocks for _ in b.instructions]
+        self.counts = [0] * len(self.ir)
+        self.taken = [0] * len(self.ir)
+        self.block_time = [0.0] * len(self.cfg.blocks)
+        start = perf_counter()
+        try:
+            super().execute(instructions, jump_table, ranges)
+        finally:
+            self.seconds = perf_counter() - start
+
+    def profile(self):
+        """The Profile of the last run."""
+        return Profile(
+            self.ir, self.cfg, self.counts, self.taken, self.block_time, self.seconds
+        )
+
+    def run(self):
+        """Dispatch loop with instruction counts, taken jumps and block times."""
+        code = self.code
+        end = len(code)
+        variables = self.variables
+        ip = self.ip
+        counts = self.counts
+        taken = self.taken
+        block_of = self.block_of
+        block_time = self.block_time
+        period = self.sample_period
+        tick = period
+        last = perf_counter()
+
+        try:
+            while ip < end:
+                counts[ip] += 1
+                tick -= 1
+                if not tick:
+                    tick = period
+                    now = perf_counter()
+                    block_time[block_of[ip]] += now - last
+                    last = now
+                instr = code[ip]
+                op = instr.opcode
+                if op == ASSIGN:
+                    a = instr.arg1
+                    variables[instr.result.name] = (
+                        a.value if a.kind == CONST else variables[a.name]
+                    )
+                elif op <= GE:
+                    a = instr.arg1
+                    b = instr.arg2
+                    val1 = a.value if a.kind == CONST else variables[a.name]
+                    val2 = b.value if b.kind == CONST else variables[b.name]
+                    variables[instr.result.name] = self.compute_op(op, val1, val2)
+                elif op == DIV_NONZERO:
+                    a = instr.arg1
+                    b = instr.arg2
+                    variables[instr.result.name] = (
+                        a.value if a.kind == CONST else variables[a.name]
+                    ) / (b.value if b.kind == CONST else variables[b.name])
+                elif op == IF_FALSE:
+                    a = instr.arg1
+                    if not (a.value if a.kind == CONST else variables[a.name]):
+                        taken[ip] += 1
+                        ip = instr.arg2.value
+                        counts[ip] += 1  # The label jumped to
+                elif op == GOTO:
+                    ip = instr.arg1.value
+                    counts[ip] += 1
+                elif op == PRINT:
+                    a = instr.arg1
+                    print(a.value if a.kind == CONST else variables[a.name])
+                elif op == PUSH:
+                    a = instr.arg1
+                    self.arg_stack.append(a.value if a.kind == CONST else variables[a.name])
+                elif op == CALL:
+                    argc = instr.arg2
+                    self.call_stack.append({"return_ip": ip, "locals": variables})
+                    args = self.arg_stack[len(self.arg_stack) - argc :]
+                    del self.arg_stack[len(self.arg_stack) - argc :]
+                    variables = {f"_args[{i}]": value for i, value in enumerate(args)}
+                    ip = instr.arg1.value
+                    counts[ip] += 1
+                elif op == RET:
+                    a = instr.arg1
+                    self.return_value = a.value if a.kind == CONST else variables[a.name]
+                    if self.call_stack:
+                        frame = self.call_stack.pop()
+                        variables = frame["locals"]
+                        ip = frame["return_ip"]
+                elif op == GETRET:
+                    variables[instr.result.name] = self.return_value
+                elif op != LABEL:
+                    raise RuntimeError(f"Unknown instruction: {instr}")
+                ip += 1
+        except KeyError as e:
+            raise RuntimeError(f"Undefined variable: {e.args[0]}")
+        finally:
+            if 0 < ip <= end:
+                # The last interval, up to the instruction that ran last
+                block_time[block_of[ip - 1]] += perf_counter() - last
+            self.ip = ip
+            self.variables = variables
+
+
+class SamplingInterpreter(Interpreter):
+    """
+    Samples what runs every `interval` seconds of CPU time, with a
+    profiling timer (SIGPROF, so Unix only) whose handler walks from the
+    interrupted frame up to Interpreter.run and reads its ip and the call
+    stack. The program runs in Interpreter.run itself, fused code and all,
+    so it costs nothing between samples. Each sample is a call stack of
+    (function, source line) frames; samples() summarizes them.
+    """
+
+    def __init__(self, numeric=FLOAT, interval=SAMPLE_INTERVAL):
+        super().__init__(numeric)
+        self.interval = interval
+        self.stacks = {}  # (function, line) frames -> samples
+        self.seconds = 0.0
+
+    def execute(self, instructions, jump_table=None, ranges=None):
+        """Run the program with the profiling timer sampling it."""
+        self.stacks = {}
+        previous = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        start = perf_counter()
+        try:
+            super().execute(instructions, jump_table, ranges)
+        finally:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, previous)
+            self.seconds = perf_counter() - start
+
+    def samples(self):
+        """The SampleProfile of the last run."""
+        return SampleProfile(self.stacks, self.interval, self.seconds)
+
+    def _sample(self, signum, frame):
+        """SIGPROF handler: count the stack running in Interpreter.run."""
+        while frame is not None and frame.f_code is not Interpreter.run.__code__:
+            frame = frame.f_back
+        if frame is None:
+            return  # Still encoding, or already done
+        ip = frame.f_locals.get("ip", -1)
+        code = self.code
+        if not 0 <= ip < len(code):
+            return
+        stack = []
+        function = "main"
+        for caller in self.call_stack:
+            call = code[caller["return_ip"]]
+            stack.append((function, call.line))
+            function = call.arg1.name[len("func_") :]
+        stack.append((function, code[ip].line))
+        stack = tuple(stack)
+        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+
+def _typed_key(value):
+    """An exact-mode memo key for a value: its type, its value and a float's sign."""
+    if isinstance(value, float):
+        return float, value, copysign(1.0, value)
+    return type(value), value
@@ -8,13 +8,24 @@ from .utils.errors import IRError
 
 
 class IRInstruction:
-    """Represents a single three-address code instruction."""
+    """
+    Represents a single three-address code instruction.
+    line is the source line it was generated from (None if unknown); it
+    is debug information, so it takes no part in comparing IR.
+    """
 
-    def __init__(self, op, arg1=None, arg2=None, result=None):
+    __slots__ = ("op", "arg1", "arg2", "result", "line")
+
+    def __init__(self, op, arg1=None, arg2=None, result=None, line=None):
         self.op = op
         self.arg1 = arg1
         self.arg2 = arg2
         self.result = result
+        self.line = line
+
+    def copy(self):
+        """Return an independent copy (passes rewrite instructions in place)."""
+        return IRInstruction(self.op, self.arg1, self.arg2, self.result, self.line)
 
     def __repr__(self):
         if self.op == "label":
@@ -25,6 +36,17 @@ class IRInstruction:
             return f"if_false {self.arg1} goto {self.arg2}"
         elif self.op == "print":
             return f"print {self.arg1}"
+        elif self.op == "push":
+            return f"push {self.arg1}"
+        elif self.op == "call":
+            return f"call {self.arg1}, {self.arg2}"
+        elif self.op == "ret":
+            return f"ret {self.arg1}"
+        elif self.op == "getret":
+            return f"{self.result} = getret"
+        elif self.op == "phi":
+            sources = ", ".join(f"B{b}: {v}" for b, v in self.arg1.items())
+            return f"{self.result} = phi({sources})"
         elif self.op == "assign":
             return f"{self.result} = {self.arg1}"
         elif self.arg2 is None:
@@ -33,16 +55,149 @@ class IRInstruction:
             return f"{self.result} = {self.arg1} {self.op} {self.arg2}"
 
 
+# Instructions whose operand names a label, and which operand it is
+JUMP_OPERAND = {"goto": "arg1", "if_false": "arg2", "call": "arg1"}
+
+BINARY_OPS = {"+", "-", "*", "/", "%", "==", "!=", "<", ">", "<=", ">="}
+COMPARISON_OPS = {"==", "!=", "<", ">", "<=", ">="}
+
+# Instructions that read arg1 as a value (binary ops also read arg2)
+READS_ARG1 = {"assign", "print", "push", "if_false", "ret"}
+
+
+def is_constant(operand):
+    """Check if an operand is a numeric constant."""
+    try:
+        float(operand)
+        return True
+    except (ValueError, TypeError):
+        return False
+
+
+def fold_binary(op, val1, val2):
+    """
+    Evaluate a binary operator on two constants at compile time.
+    Returns None when the result must be left to run time (division or
+    modulo by zero, or a non-finite result).
+    """
+    if op in ("/", "%") and val2 == 0:
+        return None
+    if op == "+":
+        result = val1 + val2
+    elif op == "-":
+        result = val1 - val2
+    elif op == "*":
+        result = val1 * val2
+    elif op == "/":
+        result = val1 / val2
+    elif op == "%":
+        result = val1 % val2
+    elif op == "==":
+        result = 1.0 if val1 == val2 else 0.0
+    elif op == "!=":
+        result = 1.0 if val1 != val2 else 0.0
+    elif op == "<":
+        result = 1.0 if val1 < val2 else 0.0
+    elif op == ">":
+        result = 1.0 if val1 > val2 else 0.0
+    elif op == "<=":
+        result = 1.0 if val1 <= val2 else 0.0
+    elif op == ">=":
+        result = 1.0 if val1 >= val2 else 0.0
+    else:
+        return None
+    if result != result or result in (float("inf"), float("-inf")):
+        return None
+    return result
+
+
+def is_variable(operand):
+    """Check if an operand names a variable (or temporary) rather than a constant."""
+    return isinstance(operand, str) and not is_constant(operand)
+
+
+def instruction_uses(instr):
+    """Names of the variables an instruction reads."""
+    if instr.op in BINARY_OPS:
+        return [a for a in (instr.arg1, instr.arg2) if is_variable(a)]
+    if instr.op in READS_ARG1 and is_variable(instr.arg1):
+        return [instr.arg1]
+    if instr.op == "phi":
+        return [v for v in instr.arg1.values() if is_variable(v)]
+    return []
+
+
+def instruction_def(instr):
+    """Name of the variable an instruction writes, or None."""
+    if instr.op in BINARY_OPS or instr.op in ("assign", "getret", "phi"):
+        return instr.result
+    return None
+
+
+def replace_uses(instr, mapping):
+    """Rewrite the operands an instruction reads through mapping (in place)."""
+    if instr.op in BINARY_OPS:
+        instr.arg1 = mapping.get(instr.arg1, instr.arg1)
+        instr.arg2 = mapping.get(instr.arg2, instr.arg2)
+    elif instr.op in READS_ARG1:
+        instr.arg1 = mapping.get(instr.arg1, instr.arg1)
+    elif instr.op == "phi":
+        instr.arg1 = {b: mapping.get(v, v) for b, v in instr.arg1.items()}
+
+
+def fill_lines(instructions):
+    """
+    Give every instruction without a source line the line of the nearest
+    one before it that has one (in place). Passes that insert labels,
+    jumps or copies without a line thus attribute them to the code they
+    were inserted into.
+    """
+    line = None
+    for instr in instructions:
+        if instr.line is None:
+            instr.line = line
+        else:
+            line = instr.line
+    return instructions
+
+
+def build_jump_table(instructions):
+    """
+    Map every label to the index of its 'label' instruction.
+    Checks that labels are unique and every jump target exists, so
+    later phases can index the table without further validation.
+    """
+    jump_table = {}
+    for i, instr in enumerate(instructions):
+        if instr.op == "label":
+            if instr.result in jump_table:
+                raise IRError(f"Duplicate label: {instr.result}")
+            jump_table[instr.result] = i
+
+    for instr in instructions:
+        field = JUMP_OPERAND.get(instr.op)
+        if field is not None and getattr(instr, field) not in jump_table:
+            raise IRError(f"Undefined label: {getattr(instr, field)}")
+
+    return jump_table
+
+
 class IRGenerator:
     """
     Generates three-address code from AST.
     Uses temporary variables and labels.
+    Every instruction takes the source line of the innermost node being
+    visited that has one.
     """
 
     def __init__(self):
         self.instructions = []
+        self.line = None  # Source line of the node being visited
+        self.jump_table = {}  # label -> instruction index, set by generate()
         self.temp_counter = 0
         self.label_counter = 0
+        self.pending_functions = []  # FunctionDefs waiting to be emitted
+        self.in_function = False
 
     def new_temp(self):
         """Generate a new temporary variable name."""
@@ -58,30 +213,47 @@ class IRGenerator:
 
     def emit(self, op, arg1=None, arg2=None, result=None):
         """Emit a new IR instruction."""
-        instruction = IRInstruction(op, arg1, arg2, result)
+        instruction = IRInstruction(op, arg1, arg2, result, self.line)
         self.instructions.append(instruction)
         return instruction
 
     def generate(self, ast):
         """Main entry point for IR generation."""
         self.visit(ast)
+        self.jump_table = build_jump_table(self.instructions)
         return self.instructions
 
     def visit(self, node):
         """Dispatch to appropriate visitor method."""
         method_name = f"visit_{type(node).__name__}"
         visitor = getattr(self, method_name, self.generic_visit)
-        return visitor(node)
+        outer = self.line
+        if node.line is not None:
+            self.line = node.line
+        try:
+            return visitor(node)
+        finally:
+            self.line = outer
 
     def generic_visit(self, node):
         """Fallback visitor."""
         raise IRError(f"No visit method for {type(node).__name__}")
 
     def visit_Program(self, node):
-        """Visit program node."""
+        """
+        Visit program node.
+        Function bodies are emitted after the top-level code, behind a
+        jump to the program end, so execution never falls into them.
+        """
         for stmt in node.statements:
             self.visit(stmt)
-        # Ensure a program-end label for potential main flow
+
+        if self.pending_functions:
+            end_label = self.new_label()
+            self.emit("goto", end_label, None, None)
+            while self.pending_functions:
+                self.emit_function(self.pending_functions.pop(0))
+            self.emit("label", None, None, end_label)
 
     def visit_VarDecl(self, node):
         """
@@ -161,6 +333,10 @@ class IRGenerator:
         self.emit("print", expr_result, None, None)
 
     def visit_FunctionDef(self, node):
+        """Defer the function; its body is emitted after the top-level code."""
+        self.pending_functions.append(node)
+
+    def emit_function(self, node):
         """
         Emit function label and its body.
         Conventions:
@@ -169,6 +345,8 @@ class IRGenerator:
         - Function should end with implicit return 0 if no explicit return
         """
         func_label = f"func_{node.name}"
+        outer, self.line = self.line, node.line
+        self.in_function = True
         self.emit("label", None, None, func_label)
         # Bind parameters from argument stack: a = _args[0], etc.
         for idx, name in enumerate(node.params):
@@ -177,10 +355,18 @@ class IRGenerator:
             self.visit(stmt)
         # Implicit return 0
         self.emit("ret", "0", None, None)
+        self.in_function = False
+        self.line = outer
 
     def visit_Return(self, node):
+        """
+        Visit return statement.
+        A return at top level does not stop the program (the VM ignores
+        it), so only its expression is evaluated there.
+        """
         val = self.visit(node.expression)
-        self.emit("ret", val, None, None)
+        if self.in_function:
+            self.emit("ret", val, None, None)
 
     def visit_Call(self, node):
         """
@@ -7,6 +7,10 @@ import re
 from .tokens import Token, TokenType, KEYWORDS
 from .utils.errors import LexerError
 
+# Pragmas a '#pragma name [arguments]' line may name (see numeric.py);
+# any other '#pragma' line is a comment, as it was before pragmas existed
+PRAGMAS = ("exact",)
+
 
 class Lexer:
     """
@@ -20,11 +24,14 @@ class Lexer:
         self.line = 1
         self.column = 1
         self.tokens = []
+        self.pragmas = {}  # Pragma name -> its arguments
 
         # Token patterns (order matters!)
         self.token_patterns = [
             # Whitespace (ignored)
             (r"[ \t]+", None),
+            # Pragmas (recorded, not tokens)
+            (r"#pragma\b[^\n]*", "PRAGMA"),
             # Comments (ignored)
             (r"#[^\n]*", None),
             # Newlines
@@ -35,7 +42,8 @@ class Lexer:
             (r"!=", "NOT_EQUAL"),
             (r"<=", "LESS_EQUAL"),
             (r">=", "GREATER_EQUAL"),
-            # Numbers (floats before integers to match 3.14 correctly)
+            # Numbers (floats before integers to match 3.14 correctly);
+            # integers stay ints, the parser decides how they are used
             (r"\d+\.\d+", "NUMBER"),  # Floating point: 3.14, 0.5
             (r"\d+", "NUMBER"),  # Integer: 123
             # Identifiers and keywords
@@ -91,10 +99,11 @@ class Lexer:
                         self.column = 1
                         self.position = match.end()
                         continue
+                    elif token_name == "PRAGMA":
+                        self._pragma(value)
                     elif token_name == "NUMBER":
-                        token = Token(
-                            TokenType.NUMBER, float(value), self.line, self.column
-                        )
+                        number = float(value) if "." in value else int(value)
+                        token = Token(TokenType.NUMBER, number, self.line, self.column)
                         self.tokens.append(token)
                     elif token_name == "IDENTIFIER":
                         # Check if it's a keyword
@@ -121,5 +130,11 @@ class Lexer:
         self.tokens.append(Token(TokenType.EOF, None, self.line, self.column))
         return self.tokens
 
+    def _pragma(self, text):
+        """Record a '#pragma name [arguments]' line; unknown names are comments."""
+        words = text.split()[1:]
+        if words and words[0] in PRAGMAS:
+            self.pragmas[words[0]] = words[1:]
+
     def __repr__(self):
         return f"Lexer(tokens={len(self.tokens)})"
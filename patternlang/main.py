@@ -13,7 +13,6 @@ Orchestrates all six phases of compilation:
 
 import sys
 import argparse
-from pathlib import Path
 
 from patternlang import (
     Lexer,
@@ -21,18 +20,52 @@ from patternlang import (
     SemanticAnalyzer,
     IRGenerator,
     Optimizer,
-    Interpreter,
 )
+from patternlang.cli import (
+    add_options,
+    check_options,
+    compile_options,
+    execute,
+    read_source,
+)
+from patternlang.numeric import numeric_mode
 from patternlang.utils.errors import CompilerError
 
 
-def compile_and_run(source_code, verbose=False):
+def compile_and_run(
+    source_code,
+    verbose=False,
+    fast_math=False,
+    opt_level=2,
+    time_passes=False,
+    fuel=None,
+    memoize=None,
+    exact=False,
+    division=None,
+    profile=False,
+    profile_json=None,
+    flamegraph=None,
+):
     """
     Compile and execute PatternLang source code.
 
     Args:
         source_code: String containing PatternLang code
         verbose: If True, print intermediate results from each phase
+        fast_math: If True, allow optimizations that can change float rounding
+        opt_level: Optimization level, 0 (none) to 3
+        time_passes: If True, print each pass's run time and size change
+        fuel: Instructions the program may run at compile time to be replaced
+            by its output (None: the optimization level's default, 0: never)
+        memoize: If given, cache up to this many results per pure function at
+            run time and report the cache statistics
+        exact: If True, keep integers exact (as '#pragma exact' does)
+        division: Exact-mode division policy, "rational" or "float" (None:
+            the pragma's, else rational)
+        profile: If True, count what the program executes and report it
+        profile_json: If given, also write the profile as JSON to this path
+        flamegraph: If given, sample the time per source line, report it and
+            write the sampled call stacks in collapsed form to this path
     """
     try:
         # Phase 1: Lexical Analysis
@@ -43,6 +76,9 @@ def compile_and_run(source_code, verbose=False):
 
         lexer = Lexer(source_code)
         tokens = lexer.tokenize()
+        numeric = numeric_mode(lexer.pragmas, exact, division)
+        if numeric.exact:
+            sys.set_int_max_str_digits(0)  # Print big integers in full
 
         if verbose:
             print(f"Generated {len(tokens)} tokens:")
@@ -50,6 +86,7 @@ def compile_and_run(source_code, verbose=False):
                 print(f"  {token}")
             if len(tokens) > 20:
                 print(f"  ... and {len(tokens) - 20} more")
+            print(f"Numbers: {numeric}")
             print()
 
         # Phase 2: Syntax Analysis
@@ -58,7 +95,7 @@ def compile_and_run(source_code, verbose=False):
             print("PHASE 2: SYNTAX ANALYSIS")
             print("=" * 60)
 
-        parser = Parser(tokens)
+        parser = Parser(tokens, numeric)
         ast = parser.parse()
 
         if verbose:
@@ -78,6 +115,9 @@ def compile_and_run(source_code, verbose=False):
         if verbose:
             print("Symbol Table:")
             print(f"  {symbol_table}")
+            print("Call Graph:")
+            for line in semantic_analyzer.call_graph.summary():
+                print(f"  {line}")
             print()
 
         # Phase 4: IR Generation
@@ -101,15 +141,25 @@ def compile_and_run(source_code, verbose=False):
             print("PHASE 5: OPTIMIZATION")
             print("=" * 60)
 
-        optimizer = Optimizer()
+        optimizer = Optimizer(
+            fast_math=fast_math, level=opt_level, fuel=fuel, numeric=numeric
+        )
         optimized_ir = optimizer.optimize(ir_code)
 
         if verbose:
             print("Optimized IR:")
             for instr in optimized_ir:
                 print(f"  {instr}")
+            print(f"Pass statistics ({optimizer.rounds} rounds):")
+            for line in optimizer.summary():
+                print(f"  {line}")
             print()
 
+        if verbose or time_passes:
+            print("Pass timings:", file=sys.stderr)
+            for line in optimizer.timing_summary():
+                print(f"  {line}", file=sys.stderr)
+
         # Phase 6: Interpretation/Execution
         if verbose:
             print("=" * 60)
@@ -117,8 +167,16 @@ def compile_and_run(source_code, verbose=False):
             print("=" * 60)
             print("Output:")
 
-        interpreter = Interpreter()
-        interpreter.execute(optimized_ir)
+        execute(
+            optimized_ir,
+            optimizer,
+            numeric,
+            source_code,
+            memoize=memoize,
+            profile=profile,
+            profile_json=profile_json,
+            flamegraph=flamegraph,
+        )
 
         if verbose:
             print()
@@ -146,39 +204,19 @@ def main():
 Examples:
   python main.py program.pl              # Run program
   python main.py program.pl --verbose    # Show all compilation phases
+  python main.py program.pl -O3          # Optimize harder
   python main.py --help                  # Show this help message
         """,
     )
 
-    parser.add_argument("file", type=str, help="PatternLang source file (.pl)")
-
-    parser.add_argument(
-        "-v",
-        "--verbose",
-        action="store_true",
-        help="Show detailed output from each compiler phase",
-    )
-
+    add_options(parser)
     args = parser.parse_args()
+    check_options(parser, args)
 
-    # Read source file
-    source_path = Path(args.file)
-
-    if not source_path.exists():
-        print(f"Error: File '{args.file}' not found", file=sys.stderr)
-        sys.exit(1)
-
-    if not source_path.suffix == ".pl":
-        print(f"Warning: File extension is not .pl", file=sys.stderr)
-
-    try:
-        source_code = source_path.read_text(encoding="utf-8")
-    except Exception as e:
-        print(f"Error reading file: {e}", file=sys.stderr)
-        sys.exit(1)
+    _, source_code = read_source(args.file)
 
     # Compile and run
-    compile_and_run(source_code, verbose=args.verbose)
+    compile_and_run(source_code, **compile_options(args))
 
 
 if __name__ == "__main__":
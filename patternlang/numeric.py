@@ -0,0 +1,137 @@
+"""
+Numeric modes for PatternLang.
+
+By default every PatternLang number is a float, so integers past 2**53
+lose precision. In exact mode integer literals are Python ints from the
+lexer through the optimizer to the interpreter: +, -, *, % and the
+comparisons keep them exact at any size, and a decimal literal is a float
+that makes whatever it touches a float. Division follows a policy:
+- "rational": the exact quotient, an int when it divides evenly and a
+  Fraction otherwise
+- "float": a float, as in the default mode
+
+IR constants are text. The mode decides how they are read: in exact mode
+'5' is the int 5 and '5.0' the float, by default both are floats.
+
+Exact mode is chosen on the command line (--exact, --division) or in the
+source with '#pragma exact', optionally followed by the division policy
+('#pragma exact float'); the command line's policy wins.
+"""
+
+import operator
+from fractions import Fraction
+
+from .ir import fold_binary
+from .utils.errors import LexerError
+
+# Division policies of exact mode
+DIVISIONS = ("rational", "float")
+
+# Exact-mode operators other than division (comparisons give 1 or 0)
+EXACT_OPERATORS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "%": operator.mod,
+    "==": lambda a, b: 1 if a == b else 0,
+    "!=": lambda a, b: 1 if a != b else 0,
+    "<": lambda a, b: 1 if a < b else 0,
+    ">": lambda a, b: 1 if a > b else 0,
+    "<=": lambda a, b: 1 if a <= b else 0,
+    ">=": lambda a, b: 1 if a >= b else 0,
+}
+
+# Largest int (in bits) folded into an IR constant; larger ones are
+# computed at run time, which keeps the IR text short
+FOLD_BITS = 1024
+
+
+class NumericMode:
+    """How numbers behave: floats only, or exact integers with a division policy."""
+
+    __slots__ = ("exact", "division")
+
+    def __init__(self, exact=False, division="rational"):
+        if division not in DIVISIONS:
+            raise ValueError(f"Unknown division policy {division!r}")
+        self.exact = exact
+        self.division = division
+
+    def literal(self, value):
+        """The value of a NUMBER token (an int, or a float for a decimal)."""
+        return value if self.exact else float(value)
+
+    def constant(self, text):
+        """The value of an IR constant (ValueError if text is not a number)."""
+        if self.exact and text.lstrip("-").isdigit():
+            return int(text)
+        return float(text)
+
+    def compute(self, op, a, b):
+        """
+        Apply a binary operator in exact mode. Comparisons give 1 or 0;
+        mixing an int too large for a float with a float raises
+        OverflowError.
+        """
+        if op == "/":
+            return self.divide(a, b)
+        return EXACT_OPERATORS[op](a, b)
+
+    def divide(self, a, b):
+        """a / b under the division policy."""
+        if b == 0:
+            raise RuntimeError("Division by zero")
+        if self.division == "float" or isinstance(a, float) or isinstance(b, float):
+            return a / b
+        quotient = Fraction(a, b)
+        return quotient.numerator if quotient.denominator == 1 else quotient
+
+    def fold(self, op, a, b):
+        """
+        Evaluate a binary operator on two constants at compile time, or
+        return None when it is left to run time (see fold_binary). In exact
+        mode that also covers Fractions, since IR constants are ints or
+        floats, and ints past FOLD_BITS.
+        """
+        if not self.exact:
+            return fold_binary(op, a, b)
+        if op in ("/", "%") and b == 0:
+            return None
+        try:
+            result = self.compute(op, a, b)
+        except OverflowError:
+            return None
+        if isinstance(result, Fraction):
+            return None
+        if isinstance(result, int) and result.bit_length() > FOLD_BITS:
+            return None
+        if isinstance(result, float) and (result != result or abs(result) == float("inf")):
+            return None
+        return result
+
+    def __repr__(self):
+        if not self.exact:
+            return "NumericMode(float)"
+        return f"NumericMode(exact, {self.division} division)"
+
+
+# The default: every number is a float
+FLOAT = NumericMode()
+
+
+def numeric_mode(pragmas, exact=False, division=None):
+    """
+    The mode a program runs in, from the lexer's pragmas and the command
+    line: exact if either asks for it, with the command line's division
+    policy, else the pragma's, else rational.
+    """
+    arguments = pragmas.get("exact")
+    if arguments is not None:
+        if len(arguments) > 1 or not set(arguments) <= set(DIVISIONS):
+            raise LexerError(
+                f"Expected '#pragma exact' with one of {', '.join(DIVISIONS)}, "
+                f"got '#pragma exact {' '.join(arguments)}'"
+            )
+        exact = True
+        division = division or (arguments[0] if arguments else None)
+    return NumericMode(exact, division or "rational") if exact else FLOAT
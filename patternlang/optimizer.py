@@ -1,9 +1,55 @@
 """
 IR optimizer for PatternLang.
-Performs constant folding, algebraic simplification, and basic dead code elimination.
+Performs constant propagation, constant folding, algebraic simplification,
+global value numbering, loop-invariant code motion, copy propagation,
+temporary coalescing, induction-variable strength reduction, dead code
+elimination and control-flow simplification, repeated until the IR
+stops changing. Self tail calls then become jumps, small functions are
+inlined, accumulator loops replaced by closed forms and loops unrolled,
+each followed by another round of the same passes over the changed
+code; loops are rotated last.
+
+The passes run under a PassManager; the optimization level decides
+which of them are registered:
+- 0: none
+- 1: folding, simplification, copy propagation, coalescing, dead code
+  elimination and control-flow simplification
+- 2: everything above (the default)
+- 3: level 2 with larger inlining and unrolling budgets and twice the
+  round budget, after which the program is evaluated at compile time
+  (replaced by what it prints, if it finishes within a fuel budget)
+
+Value ranges of the final code are computed at every level; the
+interpreter and the assembly generator use them to drop division checks
+and to keep integer variables in integer registers.
+
+In exact numeric mode (see numeric.py) constants are folded as ints, and
+the passes whose rewrites assume float arithmetic are left out: closed
+forms, induction variables, unrolling, tail-call reassociation, partial
+evaluation and value ranges.
 """
 
-from .ir import IRInstruction
+from .ir import IRInstruction, build_jump_table, is_constant
+from .bytecode import decode, is_compact
+from .numeric import FLOAT
+from .passes.evaluate import DEFAULT_FUEL
+from .passes import (
+    SCCP,
+    CFGSimplification,
+    ClosedFormLoops,
+    CopyPropagation,
+    DeadCodeElimination,
+    FunctionInlining,
+    FunctionPass,
+    GlobalValueNumbering,
+    InductionVariables,
+    LoopInvariantCodeMotion,
+    LoopUnrolling,
+    PartialEvaluation,
+    PassManager,
+    TailCallElimination,
+    TemporaryCoalescing,
+)
 
 
 class Optimizer:
@@ -12,23 +58,148 @@ class Optimizer:
     Implements simple optimization techniques.
     """
 
-    def __init__(self):
+    # Upper bound on rounds of the pass pipeline
+    MAX_ROUNDS = 10
+
+    # Optimization levels accepted by the constructor
+    LEVELS = (0, 1, 2, 3)
+
+    def __init__(
+        self,
+        unroll_factor=4,
+        unroll_budget=64,
+        inline_limit=12,
+        inline_budget=64,
+        fast_math=False,
+        level=2,
+        fuel=None,
+        numeric=FLOAT,
+    ):
+        if level not in self.LEVELS:
+            raise ValueError(f"Unknown optimization level {level}")
+        self.unroll_factor = unroll_factor  # Body copies per partially unrolled test
+        self.unroll_budget = unroll_budget  # Instructions one unrolled loop may take
+        self.inline_limit = inline_limit  # Largest function inlined at every call
+        self.inline_budget = inline_budget  # Minimum growth allowed for inlining
+        self.fast_math = fast_math  # Allow rewrites that can change float rounding
+        self.level = level
+        self.numeric = numeric  # NumericMode constants are read and folded in
+        # Instructions a compile-time run of the program may take (0: none)
+        self.fuel = (DEFAULT_FUEL if level >= 3 else 0) if fuel is None else fuel
+        if numeric.exact:
+            self.fuel = 0  # The evaluator runs floats
         self.instructions = []
+        self.jump_table = {}  # label -> index in the optimized instructions
+        self.ranges = None  # ValueRanges of the optimized instructions
+        self.stats = {}  # pass name -> statistics summed over all rounds
+        self.timings = {}  # pass name -> runs, seconds and instruction delta
+        self.rounds = 0
 
     def optimize(self, instructions):
         """
         Main optimization entry point.
         Applies multiple optimization passes.
+        Compact (bytecode) input is decoded first.
         """
-        # Copy instructions
-        self.instructions = instructions[:]
+        # Copy instructions (passes rewrite them in place)
+        if is_compact(instructions):
+            self.instructions = decode(instructions)
+        else:
+            self.instructions = [instr.copy() for instr in instructions]
 
-        # Apply optimization passes
-        self.instructions = self.constant_folding(self.instructions)
-        self.instructions = self.algebraic_simplification(self.instructions)
+        manager = self.pass_manager()
+        self.instructions = manager.run(self.instructions)
+        self.stats = manager.stats
+        self.timings = manager.timings
+        self.rounds = manager.rounds
 
+        # Passes may move instructions, so the table and ranges are finalized last
+        self.jump_table = build_jump_table(self.instructions)
+        if self.numeric.exact:
+            # Ranges bound floats; an int past 2**53 would break their facts
+            return self.instructions
+        self.ranges = manager.analyses.ranges(self.instructions)
+        divisions = [instr for instr in self.instructions if instr.op in ("/", "%")]
+        self.stats["value ranges"] = {
+            "integer variables": len(self.ranges.integer_variables()),
+            "divisors proven non-zero": sum(map(self.ranges.nonzero_divisor, divisions)),
+        }
         return self.instructions
 
+    def pass_manager(self):
+        """
+        The passes for this optimization level. The scalar passes repeat
+        until a round changes nothing, since each can expose work for the
+        others (a folded branch leaves dead code, a removed copy a new
+        constant). Tail calls, inlining, closed forms and unrolling run
+        once each (they would otherwise keep growing the code), followed
+        by the scalar passes again if they changed anything. With a fuel
+        budget, partial evaluation runs last.
+        """
+        manager = PassManager()
+        if self.level == 0:
+            return manager
+        full = self.level >= 2
+        floats = not self.numeric.exact  # Passes that rewrite float arithmetic
+        scale = 4 if self.level >= 3 else 1
+
+        scalar = manager.group("scalar", self.MAX_ROUNDS * (2 if self.level >= 3 else 1))
+        if full:
+            scalar.add(SCCP(self.numeric))
+        scalar.add(FunctionPass("constant folding", self.constant_folding))
+        scalar.add(
+            FunctionPass("algebraic simplification", self.algebraic_simplification),
+            after=("constant folding",),
+        )
+        if full:
+            scalar.add(GlobalValueNumbering(self.numeric), after=("algebraic simplification",))
+            scalar.add(LoopInvariantCodeMotion(), after=("gvn",))
+        scalar.add(CopyPropagation())
+        scalar.add(TemporaryCoalescing(), after=("copy propagation",))
+        if full and floats:
+            # Basic induction variables are found once the increment is coalesced
+            scalar.add(InductionVariables(), after=("licm", "coalescing"))
+        scalar.add(DeadCodeElimination(), after=("copy propagation", "coalescing"))
+        scalar.add(CFGSimplification(fast_math=self.fast_math), after=("dce",))
+        if full:
+            expansions = [
+                TailCallElimination(reassociate=self.fast_math and floats),
+                FunctionInlining(self.inline_limit, self.inline_budget * scale),
+            ]
+            if floats:
+                expansions += [
+                    ClosedFormLoops(fast_math=self.fast_math),
+                    LoopUnrolling(self.unroll_factor, self.unroll_budget * scale),
+                ]
+            for expansion in expansions:
+                manager.group(expansion.name, then="scalar").add(expansion)
+
+            # Rotation changes the loop shape unrolling looks for, so it comes last
+            manager.group("rotation").add(
+                CFGSimplification(rotate_loops=True, fast_math=self.fast_math),
+                after=(expansions[-1].name,),
+            )
+
+        # The program is final now; if it can be run to the end, only its output is kept
+        if self.fuel:
+            manager.group("evaluation").add(PartialEvaluation(self.fuel))
+        return manager
+
+    def summary(self):
+        """One line of statistics per pass, for verbose output."""
+        return [
+            f"{name}: " + ", ".join(f"{key} {value}" for key, value in stats.items())
+            for name, stats in self.stats.items()
+        ]
+
+    def timing_summary(self):
+        """One line per pass: runs, wall time and net change in instructions."""
+        return [
+            f"{name:<26}{timing['runs']:>4} runs{timing['seconds'] * 1000:>10.2f} ms"
+            f"{timing['instructions']:>+8} instructions"
+            for name, timing in self.timings.items()
+        ]
+
     def constant_folding(self, instructions):
         """
         Fold constant expressions.
@@ -40,17 +211,20 @@ class Optimizer:
             if instr.op in ["+", "-", "*", "/", "%", "==", "!=", "<", ">", "<=", ">="]:
                 # Check if both operands are constants
                 if self.is_constant(instr.arg1) and self.is_constant(instr.arg2):
-                    val1 = float(instr.arg1)
-                    val2 = float(instr.arg2)
+                    val1 = self.numeric.constant(instr.arg1)
+                    val2 = self.numeric.constant(instr.arg2)
 
-                    # Compute result
-                    result_val = self.compute_op(instr.op, val1, val2)
+                    # Compute result (None: leave traps like x / 0 to run time)
+                    result_val = self.numeric.fold(instr.op, val1, val2)
 
-                    # Replace with assignment
-                    new_instr = IRInstruction(
-                        "assign", str(result_val), None, instr.result
-                    )
-                    optimized.append(new_instr)
+                    if result_val is None:
+                        optimized.append(instr)
+                    else:
+                        # Replace with assignment
+                        new_instr = IRInstruction(
+                            "assign", str(result_val), None, instr.result, instr.line
+                        )
+                        optimized.append(new_instr)
                 else:
                     optimized.append(instr)
             else:
@@ -65,50 +239,82 @@ class Optimizer:
         - x + 0 → x
         - x * 1 → x
         - x * 0 → 0
+        -0.0 + 0.0 is 0.0 and x * 0.0 is -0.0 or NaN for some x, so
+        adding 0.0 and multiplying by 0.0 are only simplified with
+        fast_math; adding -0.0 never changes a value.
+        In exact mode the identities use int constants (a float one would
+        turn an int into a float): x + 0 (only with fast_math, as -0.0 + 0
+        is 0.0), x - 0, x * 1 and, under rational division, x / 1.
         """
         optimized = []
+        if self.numeric.exact:
+            zero, one = "0", "1"
+            zeros = (zero,) if self.fast_math else ()
+            divide_one = one if self.numeric.division == "rational" else None
+        else:
+            zero, one = "0.0", "1.0"
+            zeros = ("-0.0", "0.0") if self.fast_math else ("-0.0",)
+            divide_one = one
 
         for instr in instructions:
             if instr.op == "+":
-                if instr.arg2 == "0.0":
+                if instr.arg2 in zeros:
                     # x + 0 → x
-                    new_instr = IRInstruction("assign", instr.arg1, None, instr.result)
+                    new_instr = IRInstruction(
+                        "assign", instr.arg1, None, instr.result, instr.line
+                    )
                     optimized.append(new_instr)
-                elif instr.arg1 == "0.0":
+                elif instr.arg1 in zeros:
                     # 0 + x → x
-                    new_instr = IRInstruction("assign", instr.arg2, None, instr.result)
+                    new_instr = IRInstruction(
+                        "assign", instr.arg2, None, instr.result, instr.line
+                    )
                     optimized.append(new_instr)
                 else:
                     optimized.append(instr)
 
             elif instr.op == "-":
-                if instr.arg2 == "0.0":
+                if instr.arg2 == zero:
                     # x - 0 → x
-                    new_instr = IRInstruction("assign", instr.arg1, None, instr.result)
+                    new_instr = IRInstruction(
+                        "assign", instr.arg1, None, instr.result, instr.line
+                    )
                     optimized.append(new_instr)
                 else:
                     optimized.append(instr)
 
             elif instr.op == "*":
-                if instr.arg1 == "0.0" or instr.arg2 == "0.0":
+                if (
+                    self.fast_math
+                    and not self.numeric.exact
+                    and "0.0" in (instr.arg1, instr.arg2)
+                ):
                     # x * 0.0 → 0.0 or 0.0 * x → 0.0
-                    new_instr = IRInstruction("assign", "0.0", None, instr.result)
+                    new_instr = IRInstruction(
+                        "assign", "0.0", None, instr.result, instr.line
+                    )
                     optimized.append(new_instr)
-                elif instr.arg2 == "1.0":
+                elif instr.arg2 == one:
                     # x * 1.0 → x
-                    new_instr = IRInstruction("assign", instr.arg1, None, instr.result)
+                    new_instr = IRInstruction(
+                        "assign", instr.arg1, None, instr.result, instr.line
+                    )
                     optimized.append(new_instr)
-                elif instr.arg1 == "1.0":
+                elif instr.arg1 == one:
                     # 1 * x → x
-                    new_instr = IRInstruction("assign", instr.arg2, None, instr.result)
+                    new_instr = IRInstruction(
+                        "assign", instr.arg2, None, instr.result, instr.line
+                    )
                     optimized.append(new_instr)
                 else:
                     optimized.append(instr)
 
             elif instr.op == "/":
-                if instr.arg2 == "1.0":
+                if instr.arg2 == divide_one:
                     # x / 1 → x
-                    new_instr = IRInstruction("assign", instr.arg1, None, instr.result)
+                    new_instr = IRInstruction(
+                        "assign", instr.arg1, None, instr.result, instr.line
+                    )
                     optimized.append(new_instr)
                 else:
                     optimized.append(instr)
@@ -120,35 +326,13 @@ class Optimizer:
 
     def is_constant(self, value):
         """Check if a value is a numeric constant."""
-        try:
-            float(value)
-            return True
-        except (ValueError, TypeError):
-            return False
+        return is_constant(value)
 
     def compute_op(self, op, val1, val2):
         """Compute the result of an operation on two constants."""
-        if op == "+":
-            return val1 + val2
-        elif op == "-":
-            return val1 - val2
-        elif op == "*":
-            return val1 * val2
-        elif op == "/":
-            if val2 == 0:
+        result = self.numeric.fold(op, val1, val2)
+        if result is None:
+            if op in ("/", "%") and val2 == 0:
                 raise ValueError("Division by zero in constant folding")
-            return val1 / val2  # Float division
-        elif op == "==":
-            return 1.0 if val1 == val2 else 0.0
-        elif op == "!=":
-            return 1.0 if val1 != val2 else 0.0
-        elif op == "<":
-            return 1.0 if val1 < val2 else 0.0
-        elif op == ">":
-            return 1.0 if val1 > val2 else 0.0
-        elif op == "<=":
-            return 1.0 if val1 <= val2 else 0.0
-        elif op == ">=":
-            return 1.0 if val1 >= val2 else 0.0
-        else:
-            raise ValueError(f"Unknown operator: {op}")
+            raise ValueError(f"Cannot fold {val1} {op} {val2}")
+        return result
@@ -5,6 +5,7 @@ Builds an Abstract Syntax Tree (AST) from tokens.
 
 from .tokens import TokenType
 from .ast_nodes import *
+from .numeric import FLOAT
 from .utils.errors import ParseError
 
 
@@ -12,10 +13,12 @@ class Parser:
     """
     Parses tokens into an AST using recursive descent.
     One method per grammar rule.
+    Number literals take the values of the given NumericMode.
     """
 
-    def __init__(self, tokens):
+    def __init__(self, tokens, numeric=FLOAT):
         self.tokens = tokens
+        self.numeric = numeric
         self.position = 0
         self.current_token = self.tokens[0] if tokens else None
 
@@ -40,6 +43,12 @@ class Parser:
         self.advance()
         return token
 
+    def located(self, node, token):
+        """Give node the source position of token and return it."""
+        node.line = token.line
+        node.column = token.column
+        return node
+
     def parse(self):
         """Entry point: parse the entire program."""
         return self.program()
@@ -49,7 +58,7 @@ class Parser:
         statements = self.stmt_list()
         self.expect(TokenType.END)
         self.expect(TokenType.SEMICOLON)
-        return Program(statements)
+        return self.located(Program(statements), self.tokens[0])
 
     def stmt_list(self):
         """stmt_list ::= { statement }"""
@@ -71,6 +80,11 @@ class Parser:
 
         Note: var_decl and assignment both start with 'let', so they're the same.
         """
+        token = self.current_token
+        return self.located(self.statement_at(), token)
+
+    def statement_at(self):
+        """The statement starting at the current token (statement() locates it)."""
         if self.current_token.type == TokenType.LET:
             return self.var_decl()
         elif self.current_token.type == TokenType.REPEAT:
@@ -216,10 +230,10 @@ class Parser:
             TokenType.LESS_EQUAL,
             TokenType.GREATER_EQUAL,
         ]:
-            op = self.current_token.type.name
+            operator = self.current_token
             self.advance()
             right = self.term()
-            left = BinaryOp(op, left, right)
+            left = self.located(BinaryOp(operator.type.name, left, right), operator)
 
         return left
 
@@ -232,19 +246,20 @@ class Parser:
             TokenType.DIVIDE,
             TokenType.MODULO,
         ]:
-            op = self.current_token.type.name
+            operator = self.current_token
             self.advance()
             right = self.factor()
-            left = BinaryOp(op, left, right)
+            left = self.located(BinaryOp(operator.type.name, left, right), operator)
 
         return left
 
     def factor(self):
         """factor ::= NUMBER | IDENT | '(' expr ')' | IDENT '(' [arg_list] ')'"""
+        token = self.current_token
         if self.current_token.type == TokenType.NUMBER:
-            value = float(self.current_token.value)  # Convert to float
+            value = self.numeric.literal(self.current_token.value)
             self.advance()
-            return Number(value)
+            return self.located(Number(value), token)
 
         elif self.current_token.type == TokenType.IDENTIFIER:
             name = self.current_token.value
@@ -262,10 +277,10 @@ class Parser:
                 if self.current_token.type != TokenType.RPAREN:
                     args = self.arg_list()
                 self.expect(TokenType.RPAREN)
-                return Call(name, args)
+                return self.located(Call(name, args), token)
             else:
                 self.advance()
-                return Identifier(name)
+                return self.located(Identifier(name), token)
 
         elif self.current_token.type == TokenType.LPAREN:
             self.advance()
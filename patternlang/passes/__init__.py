@@ -0,0 +1,34 @@
+"""Optimization passes over PatternLang IR, driven by the Optimizer."""
+
+from .closedform import ClosedFormLoops
+from .copies import CopyPropagation, TemporaryCoalescing
+from .dce import DeadCodeElimination
+from .evaluate import PartialEvaluation
+from .gvn import GlobalValueNumbering
+from .induction import InductionVariables
+from .inline import FunctionInlining
+from .licm import LoopInvariantCodeMotion
+from .manager import FunctionPass, PassGroup, PassManager
+from .sccp import SCCP
+from .simplify import CFGSimplification
+from .tailcalls import TailCallElimination
+from .unroll import LoopUnrolling
+
+__all__ = [
+    "CFGSimplification",
+    "ClosedFormLoops",
+    "CopyPropagation",
+    "DeadCodeElimination",
+    "FunctionInlining",
+    "FunctionPass",
+    "GlobalValueNumbering",
+    "InductionVariables",
+    "LoopInvariantCodeMotion",
+    "LoopUnrolling",
+    "PartialEvaluation",
+    "PassGroup",
+    "PassManager",
+    "SCCP",
+    "TailCallElimination",
+    "TemporaryCoalescing",
+]
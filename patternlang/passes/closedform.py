@@ -0,0 +1,302 @@
+"""
+Closed forms for accumulator loops in PatternLang IR.
+
+A counted loop that does nothing but update accumulators, by sums of
+polynomials in the counter or products by a constant (see evolution.py),
+is replaced by their final values, so it takes constant time however
+many iterations it had.
+
+Float additions round, so a sum computed in one step is only guaranteed
+to match the loop when every value involved is an integer below 2**53,
+and multiplying by a power of two is the only scaling that is always
+exact. Without fast_math the pass checks exactly that; when the trip
+count is only known at run time, it guards the closed form with a test
+on the bound and keeps the loop for the cases the test rejects.
+
+Loops whose variables feed each other, like a Fibonacci step, are linear
+recurrences instead (see recurrence.py), rewritten by powers.py; the
+run-time trip count both compute is in tripcount.py.
+"""
+
+from fractions import Fraction
+from math import comb, copysign, log2
+
+from ..ir import IRInstruction, is_constant
+from ..analysis.cache import AnalysisCache
+from ..analysis.ssa import temp_factory
+from .evolution import (
+    EXACT,
+    MAX_EXPONENT,
+    differences,
+    exact_integer,
+    poly_bound,
+    power_of_two_exponent,
+    scalar_evolution,
+)
+from .induction import entry_value, small_integer
+from .powers import RecurrencePowers
+from .recurrence import linear_recurrence
+from .tripcount import MAX_TRIPS, constant, countable, emitter, guarded_trips
+from .unroll import counted_loop
+
+
+class ClosedFormLoops:
+    """
+    Replaces counted loops that only update accumulators by closed forms.
+
+    The loop body must be straight-line arithmetic: the counter, temporaries
+    written before they are read in the same iteration, and accumulators
+    each updated once by 's = s + e', 's = s - e' or 'p = p * r', where e
+    depends only on the counter and constants and r is a constant. The
+    accumulators are read nowhere else in the loop, and the temporaries are
+    dead after it. With a constant trip count the loop becomes straight-line
+    code. With a run-time bound, the trip count is computed from it (the
+    step must then be 1 or -1), behind a test that falls back to the loop.
+
+    With fast_math, accumulators may start from any value, sums need not
+    be exact, and any constant ratio is accepted.
+
+    Other loops of the same shape that copy, add, subtract and scale by
+    constants are linear recurrences. Without fast_math they are replaced
+    only when the trip count and every starting value are constants and
+    all values stay exact integers, and then by the final values.
+    """
+
+    name = "closed form"
+
+    def __init__(self, fast_math=False):
+        self.fast_math = fast_math
+        self.stats = {}
+
+    def run(self, instructions, analyses=None):
+        """Apply the pass and return the new instruction list."""
+        analyses = analyses or AnalysisCache()
+        cfg = analyses.cfg(instructions)
+        self.cfg = cfg
+        self.new_temp = temp_factory(cfg)
+        liveness = analyses.liveness(instructions)
+        powers = RecurrencePowers(cfg, self.new_temp, self.fast_math)
+
+        replaced = {}  # first block id -> (last block id, new instructions)
+        summarized = versioned = recurrences = 0
+        inner = {loop.parent.header for loop in cfg.loops() if loop.parent}
+        for loop in cfg.loops():
+            if loop.header in inner:
+                continue
+            counted = counted_loop(cfg, loop, liveness)
+            if counted is None or small_integer(counted.start) is None:
+                continue
+            evolution = scalar_evolution(cfg, counted, liveness)
+            if evolution is None:
+                recurrence = linear_recurrence(cfg, counted, liveness)
+                if recurrence is None:
+                    continue
+                if is_constant(counted.bound):
+                    code = powers.constant_trips(recurrence)
+                else:
+                    code = powers.runtime_trips(recurrence)
+                if code is not None:
+                    recurrences += 1
+                    replaced[counted.first] = (counted.last, code)
+                continue
+            if is_constant(counted.bound):
+                code = self._constant_trips(evolution)
+                summarized += code is not None
+            else:
+                code = self._runtime_trips(evolution)
+                versioned += code is not None
+            if code is not None:
+                replaced[counted.first] = (counted.last, code)
+
+        self.stats = {
+            "loops summarized": summarized,
+            "loops versioned": versioned,
+            "recurrences accelerated": recurrences,
+        }
+        if not replaced:
+            return instructions
+        result = []
+        b = 0
+        while b < len(cfg.blocks):
+            if b in replaced:
+                last, code = replaced[b]
+                result.extend(code)
+                b = last + 1
+            else:
+                result.extend(cfg.blocks[b].instructions)
+                b += 1
+        return result
+
+    def _exact(self, evolution, trips, runtime):
+        """
+        True if the loop and the closed form compute the same floats for
+        trip counts up to trips. With runtime set, the sums are evaluated
+        from a run-time trip count, so their intermediate values count too.
+        """
+        if self.fast_math:
+            return all(
+                self._finite_power(ratio, trips) for ratio in evolution.products.values()
+            )
+        last = trips - 1
+        for poly in evolution.steps:
+            if any(x.denominator != 1 for x in poly) or poly_bound(poly, last) >= EXACT:
+                return False
+        loop = evolution.counted.loop
+        for name, increment in evolution.sums.items():
+            initial = entry_value(self.cfg, loop, name)
+            if not exact_integer(initial) or copysign(1, initial) < 0:
+                return False  # -0.0 + 0.0 is 0.0, so a loop may not start from -0.0
+            if abs(initial) + trips * poly_bound(increment, last) >= EXACT:
+                return False
+            if runtime:
+                # C(trips, j) * (trips - j) is at most trips ** (j + 1)
+                if trips ** len(increment) >= EXACT:
+                    return False
+                terms = differences(increment)
+                total = sum(abs(d) * comb(trips, j + 1) for j, d in enumerate(terms))
+                if abs(initial) + total >= EXACT:
+                    return False
+        for name, ratio in evolution.products.items():
+            exponent = power_of_two_exponent(ratio)
+            if exponent is not None:
+                if exponent * trips > MAX_EXPONENT:
+                    return False
+                continue
+            # Another integer ratio: only exact from a known integer start
+            initial = entry_value(self.cfg, loop, name)
+            if ratio.denominator != 1 or not exact_integer(initial):
+                return False
+            if ratio and trips * log2(abs(ratio)) >= log2(EXACT):
+                return False
+            if abs(Fraction(initial)) * abs(ratio) ** trips >= EXACT:
+                return False
+        return True
+
+    @staticmethod
+    def _finite_power(ratio, trips):
+        """True if every power of ratio up to trips is a finite nonzero float."""
+        if ratio == 0:
+            return False
+        magnitude = abs(log2(abs(ratio)))
+        return magnitude * trips <= MAX_EXPONENT - 1
+
+    # ------------------------------------------------------------------
+    # Rewriting
+    # ------------------------------------------------------------------
+
+    def _constant_trips(self, evolution):
+        """The loop's effect as straight-line code, for a constant bound."""
+        counted = evolution.counted
+        trips = counted.trip_count(EXACT)
+        if trips is None or (trips and not self._exact(evolution, trips, False)):
+            return None
+        header = self.cfg.blocks[counted.first].instructions[0]
+        code = [header]
+        for name in evolution.order:
+            if not trips:
+                break
+            if name in evolution.sums:
+                terms = differences(evolution.sums[name])
+                total = sum(d * comb(trips, j + 1) for j, d in enumerate(terms))
+                if abs(total) >= 2**MAX_EXPONENT:
+                    return None
+                if total:
+                    code.append(IRInstruction("+", name, constant(total), name))
+            else:
+                ratio = evolution.products[name]
+                factor = float(ratio) ** trips if self.fast_math else ratio**trips
+                if factor != 1:
+                    code.append(IRInstruction("*", name, constant(factor), name))
+        final = counted.start + counted.step * trips
+        code.append(IRInstruction("assign", str(float(final)), None, counted.counter))
+        return code
+
+    def _runtime_trips(self, evolution):
+        """
+        'if bound in range: trip count; closed form; goto exit' in front of
+        the loop, which still runs when the test fails.
+        """
+        counted = evolution.counted
+        if not countable(counted):
+            return None
+        limit = self._max_trips(evolution)
+        if limit is None:
+            return None
+
+        cfg = self.cfg
+        code = []
+        emit = emitter(code, self.new_temp)
+        trips = self.new_temp()
+        guarded_trips(cfg, code, counted, 1, limit, trips, self.new_temp)
+        for name in evolution.order:
+            if name in evolution.sums:
+                total = self._emit_sum(emit, evolution.sums[name], trips)
+                if total is not None:
+                    emit("+", name, total, name)
+            else:
+                factor = self._emit_power(code, evolution.products[name], trips)
+                emit("*", name, factor, name)
+        near = str(float(counted.start))
+        emit("+" if counted.step > 0 else "-", near, trips, counted.counter)
+        code.append(IRInstruction("goto", cfg.blocks[counted.last + 1].label))
+
+        for b in range(counted.first, counted.last + 1):
+            code.extend(cfg.blocks[b].instructions)
+        return code
+
+    def _max_trips(self, evolution):
+        """Largest trip count (up to MAX_TRIPS) the closed form is exact for."""
+        if not self._exact(evolution, 1, True):
+            return None
+        low, high = 1, MAX_TRIPS
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self._exact(evolution, middle, True):
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def _emit_sum(self, emit, increment, trips):
+        """
+        Sum of increment(k) for k < trips as the sum of d_j * C(trips, j + 1),
+        with C(trips, j + 1) = C(trips, j) * (trips - j) / (j + 1); every
+        step is an exact integer. Returns the temporary holding it.
+        """
+        total = None
+        binomial = trips  # C(trips, 1)
+        for j, d in enumerate(differences(increment)):
+            if j:
+                factor = emit("-", trips, str(float(j)))
+                binomial = emit("/", emit("*", binomial, factor), str(float(j + 1)))
+            if not d:
+                continue
+            term = binomial if d == 1 else emit("*", binomial, constant(d))
+            total = term if total is None else emit("+", total, term)
+        return total
+
+    def _emit_power(self, code, ratio, trips):
+        """ratio ** trips by repeated squaring, in a loop of its own."""
+        new = self.new_temp
+        result, base, exponent = new(), new(), new()
+        loop_label, skip_label, done_label = (self.cfg.new_label() for _ in range(3))
+        more, bit = new(), new()
+        half = new()
+        code += [
+            IRInstruction("assign", "1.0", None, result),
+            IRInstruction("assign", constant(ratio), None, base),
+            IRInstruction("assign", trips, None, exponent),
+            IRInstruction("label", None, None, loop_label),
+            IRInstruction(">", exponent, "0.0", more),
+            IRInstruction("if_false", more, done_label),
+            IRInstruction("%", exponent, "2.0", bit),
+            IRInstruction("if_false", bit, skip_label),
+            IRInstruction("*", result, base, result),
+            IRInstruction("label", None, None, skip_label),
+            IRInstruction("*", base, base, base),
+            IRInstruction("-", exponent, bit, half),
+            IRInstruction("*", half, "0.5", exponent),
+            IRInstruction("goto", loop_label),
+            IRInstruction("label", None, None, done_label),
+        ]
+        return result
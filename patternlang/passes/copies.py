@@ -0,0 +1,163 @@
+"""
+Copy propagation and temporary coalescing for PatternLang IR.
+The IR generator routes every result through temporaries, so code like
+'t5 = i + 1; i = t5' and 't0 = getret; z = t0' is everywhere. These
+passes read through copies and fold them into the instruction that
+computes the value, leaving the dead copies to DeadCodeElimination.
+"""
+
+from ..ir import (
+    BINARY_OPS,
+    instruction_def,
+    instruction_uses,
+    is_variable,
+    replace_uses,
+)
+from ..analysis.cache import AnalysisCache
+
+
+class CopyPropagation:
+    """
+    Global copy propagation.
+    A copy 'x = y' is available where every path from an entry passes
+    through it without redefining x or y; uses of x there read y instead.
+    """
+
+    name = "copy propagation"
+
+    def __init__(self):
+        self.stats = {}
+
+    def run(self, instructions, analyses=None):
+        """Apply the pass and return the new instruction list."""
+        analyses = analyses or AnalysisCache()
+        cfg = analyses.cfg(instructions)
+        available = self._solve(cfg)
+
+        propagated = 0
+        for b, facts in available.items():
+            facts = dict(facts)
+            for instr in cfg.blocks[b].instructions:
+                mapping = {n: facts[n] for n in instruction_uses(instr) if n in facts}
+                if mapping:
+                    replace_uses(instr, mapping)
+                    propagated += len(mapping)
+                self._transfer(facts, instr)
+
+        self.stats = {"uses replaced": propagated}
+        return cfg.linearize()
+
+    def _solve(self, cfg):
+        """Copies available on entry to each reachable block (dest -> source)."""
+        order = cfg.reverse_postorder()
+        entries = set(cfg.entries)
+        out = {}  # Missing: not computed yet (optimistically everything)
+        available = {}
+        changed = True
+        while changed:
+            changed = False
+            for b in order:
+                block = cfg.blocks[b]
+                if b in entries:
+                    facts = {}
+                else:
+                    facts = None
+                    for p in block.preds:
+                        if p not in out:
+                            continue
+                        if facts is None:
+                            facts = dict(out[p])
+                        else:
+                            facts = {
+                                d: s for d, s in facts.items() if out[p].get(d) == s
+                            }
+                    facts = facts or {}
+                available[b] = facts
+
+                facts = dict(facts)
+                for instr in block.instructions:
+                    self._transfer(facts, instr)
+                if out.get(b) != facts:
+                    out[b] = facts
+                    changed = True
+        return available
+
+    @staticmethod
+    def _transfer(facts, instr):
+        """Update the available copies across one instruction."""
+        defined = instruction_def(instr)
+        if defined is None:
+            return
+        for dest in [d for d, s in facts.items() if d == defined or s == defined]:
+            del facts[dest]
+        if instr.op == "assign" and is_variable(instr.arg1) and instr.arg1 != defined:
+            facts[defined] = instr.arg1
+
+
+class TemporaryCoalescing:
+    """
+    Merges a value into its final destination.
+    For 't = a + b; ...; v = t' where t is written and read exactly once
+    and v is untouched in between, the two lifetimes do not interfere:
+    the computation writes v directly and the copy goes away.
+    """
+
+    name = "coalescing"
+
+    # Instructions whose result can be retargeted
+    RETARGETABLE = BINARY_OPS | {"assign", "getret"}
+
+    def __init__(self):
+        self.stats = {}
+
+    def run(self, instructions, analyses=None):
+        """Apply the pass and return the new instruction list."""
+        defs = {}
+        uses = {}
+        for instr in instructions:
+            defined = instruction_def(instr)
+            if defined is not None:
+                defs[defined] = defs.get(defined, 0) + 1
+            for name in instruction_uses(instr):
+                uses[name] = uses.get(name, 0) + 1
+
+        analyses = analyses or AnalysisCache()
+        cfg = analyses.cfg(instructions)
+        coalesced = 0
+        for block in cfg.blocks:
+            instrs = block.instructions
+            removed = set()
+            for j, copy in enumerate(instrs):
+                if copy.op != "assign" or not is_variable(copy.arg1):
+                    continue
+                temp, dest = copy.arg1, copy.result
+                if temp == dest or defs.get(temp) != 1 or uses.get(temp) != 1:
+                    continue
+                i = self._find_def(instrs, j, temp, dest, removed)
+                if i is None:
+                    continue
+                instrs[i].result = dest
+                removed.add(j)
+                coalesced += 1
+            if removed:
+                block.instructions = [
+                    instr for k, instr in enumerate(instrs) if k not in removed
+                ]
+
+        self.stats = {"temporaries coalesced": coalesced}
+        return cfg.linearize()
+
+    def _find_def(self, instrs, j, temp, dest, removed):
+        """
+        Index of the definition of temp before position j in the block, if
+        dest is neither read nor written between it and the copy.
+        """
+        for i in range(j - 1, -1, -1):
+            if i in removed:
+                continue
+            instr = instrs[i]
+            if instruction_def(instr) == temp:
+                return i if instr.op in self.RETARGETABLE else None
+            if instruction_def(instr) == dest or dest in instruction_uses(instr):
+                return None
+        return None
@@ -0,0 +1,90 @@
+"""
+Dead code elimination for PatternLang IR.
+Removes blocks that no entry can reach and, using liveness, every
+assignment whose result is never read again. Instructions with side
+effects (print, push, call, ret and jumps) always stay, and so does an
+assignment that reads a variable not set on every path to it, since
+the read fails at run time with 'Undefined variable'.
+"""
+
+from ..ir import BINARY_OPS, instruction_def, instruction_uses, is_constant
+from ..analysis.assigned import DefiniteAssignment, reads_assigned
+from ..analysis.cache import AnalysisCache
+from ..analysis.liveness import Liveness
+
+
+class DeadCodeElimination:
+    """Deletes unreachable blocks and dead assignments until none are left."""
+
+    name = "dce"
+
+    def __init__(self):
+        self.stats = {}
+
+    def run(self, instructions, analyses=None):
+        """Apply the pass and return the new instruction list."""
+        analyses = analyses or AnalysisCache()
+        cfg = analyses.cfg(instructions)
+
+        reachable = cfg.reachable()
+        unreachable = 0
+        for block in cfg.blocks:
+            if block.id not in reachable and block.instructions:
+                unreachable += 1
+                block.instructions = []
+
+        # Removing one dead assignment can make the ones feeding it dead
+        # in other blocks too, so re-solve until a sweep removes nothing
+        dead = 0
+        while True:
+            removed = self._sweep(cfg)
+            if not removed:
+                break
+            dead += removed
+
+        self.stats = {"dead instructions": dead, "unreachable blocks": unreachable}
+        return cfg.linearize()
+
+    def _sweep(self, cfg):
+        """Drop dead assignments block by block; return how many went."""
+        liveness = Liveness(cfg)
+        assignment = DefiniteAssignment(cfg)
+        removed = 0
+        for block in cfg.blocks:
+            safe = {
+                id(instr)
+                for instr, assigned in assignment.assigned_before(block.id)
+                if reads_assigned(instr, assigned)
+            }
+            live = set(liveness.live_out[block.id])
+            kept = []
+            for instr in reversed(block.instructions):
+                defined = instruction_def(instr)
+                if (
+                    defined is not None
+                    and self.removable(instr)
+                    and id(instr) in safe
+                    and (defined not in live or instr.op == "assign" and instr.arg1 == defined)
+                ):
+                    removed += 1
+                    continue
+                if defined is not None:
+                    live.discard(defined)
+                live.update(instruction_uses(instr))
+                kept.append(instr)
+            kept.reverse()
+            block.instructions = kept
+        return removed
+
+    @staticmethod
+    def removable(instr):
+        """
+        True if dropping the instruction cannot change what the program
+        does. Division and modulo stay unless the divisor is a nonzero
+        constant, so a division by zero still fails at run time.
+        """
+        if instr.op in ("assign", "getret"):
+            return True
+        if instr.op in ("/", "%"):
+            return is_constant(instr.arg2) and float(instr.arg2) != 0
+        return instr.op in BINARY_OPS
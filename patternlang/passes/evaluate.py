@@ -0,0 +1,52 @@
+"""
+Partial evaluation for PatternLang IR.
+A PatternLang program reads no input, so what it prints is fixed by its
+source. The optimized program is run at compile time under a budget of
+executed instructions, charged per loop iteration and per call; if it
+finishes, it is replaced by a residual program that only prints the
+values it printed. A program that runs out of budget, fails at run time
+or prints more than the residual may hold is left as it was, to be run
+normally.
+"""
+
+from ..interpreter import BoundedInterpreter
+from ..ir import IRInstruction
+
+# Instructions run at compile time before giving up
+DEFAULT_FUEL = 1_000_000
+
+# Most print instructions a residual program may consist of
+MAX_OUTPUT = 10_000
+
+
+class PartialEvaluation:
+    """Replaces a program that terminates within `fuel` instructions by its output."""
+
+    name = "partial evaluation"
+
+    def __init__(self, fuel=DEFAULT_FUEL, max_output=MAX_OUTPUT):
+        self.fuel = fuel
+        self.max_output = max_output
+        self.stats = {}
+
+    def run(self, instructions, analyses=None):
+        """Apply the pass and return the new instruction list."""
+        machine = BoundedInterpreter(self.fuel)
+        try:
+            machine.execute(instructions)
+            failed = False
+        except (RuntimeError, ArithmeticError):
+            failed = True  # Left for the program to report when it runs
+        evaluated = (
+            machine.finished and not failed and len(machine.output) <= self.max_output
+        )
+        self.stats = {
+            "fuel used": machine.steps,
+            "programs evaluated": int(evaluated),
+        }
+        if not evaluated:
+            return instructions
+        return [
+            IRInstruction("print", repr(float(value)), line=line)
+            for value, line in zip(machine.output, machine.output_lines)
+        ]
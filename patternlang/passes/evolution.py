@@ -0,0 +1,170 @@
+"""
+Scalar evolution for PatternLang IR.
+
+In a counted loop, the counter is a polynomial in the iteration number k
+and so is anything computed from it with +, - and *. An accumulator
+updated by 's = s + e(k)' ends up holding s plus the sum of e(k) over all
+iterations, which is again a polynomial (in the trip count); one updated
+by 'p = p * r' ends up multiplied by r to the trip count.
+
+This module follows one iteration symbolically and does the polynomial
+arithmetic; ClosedFormLoops decides when the result matches the loop and
+rewrites it.
+"""
+
+from fractions import Fraction
+from math import isfinite
+
+from ..ir import is_constant
+
+# Integers of at most this magnitude are exact floats
+EXACT = 2**53
+
+# Highest degree of a polynomial the pass keeps track of
+MAX_DEGREE = 6
+
+# Largest power of two a float can hold
+MAX_EXPONENT = 1023
+
+
+def poly_add(a, b):
+    """a + b, for polynomials as coefficient lists (constant term first)."""
+    if len(a) < len(b):
+        a, b = b, a
+    return [x + (b[j] if j < len(b) else 0) for j, x in enumerate(a)]
+
+
+def poly_scale(a, factor):
+    """a * factor, for a constant factor."""
+    return [x * factor for x in a]
+
+
+def poly_mul(a, b):
+    """a * b."""
+    product = [Fraction(0)] * (len(a) + len(b) - 1)
+    for i, x in enumerate(a):
+        for j, y in enumerate(b):
+            product[i + j] += x * y
+    return product
+
+
+def poly_bound(a, k):
+    """Upper bound on |a(x)| for 0 <= x <= k."""
+    return sum(abs(x) * k**j for j, x in enumerate(a))
+
+
+def differences(a):
+    """
+    Coefficients d_j with a(k) = sum of d_j * C(k, j). The sum of a(k)
+    over k < T is then the sum of d_j * C(T, j + 1), and for a polynomial
+    with integer values every d_j is an integer.
+    """
+    values = [sum(x * k**j for j, x in enumerate(a)) for k in range(len(a))]
+    result = []
+    while values:
+        result.append(values[0])
+        values = [y - x for x, y in zip(values, values[1:])]
+    return result
+
+
+def exact_integer(value):
+    """True if value is an integer float that arithmetic keeps exact."""
+    return value is not None and abs(value) < EXACT and value == int(value)
+
+
+def power_of_two_exponent(value):
+    """j if |value| is 2**j for an integer j >= 0, else None."""
+    magnitude = abs(value)
+    if magnitude < 1 or magnitude != int(magnitude):
+        return None
+    magnitude = int(magnitude)
+    if magnitude & (magnitude - 1):
+        return None
+    return magnitude.bit_length() - 1
+
+
+class Evolution:
+    """What one iteration of a counted loop does to each variable it writes."""
+
+    def __init__(self, counted, steps, values, sums, products):
+        self.counted = counted
+        self.steps = steps  # Polynomial computed by each arithmetic instruction
+        self.values = values  # temporary -> polynomial in k at the last write
+        self.sums = sums  # accumulator -> polynomial it grows by at iteration k
+        self.products = products  # accumulator -> constant factor per iteration
+        self.order = list(sums) + list(products)
+
+
+def scalar_evolution(cfg, counted, liveness):
+    """
+    Follow one iteration of a counted loop symbolically and return its
+    Evolution, or None if the loop does anything else.
+    """
+    body = [
+        instr
+        for b in range(counted.first + 1, counted.last + 1)
+        for instr in cfg.blocks[b].instructions
+    ][:-1]
+    counter, step = counted.counter, Fraction(counted.step)
+    start = Fraction(counted.start)
+    values = {counter: [start, step]}
+    steps = []
+    sums, products = {}, {}
+
+    def value(operand):
+        """An operand as a polynomial in the iteration number, or None if it is not one."""
+        if is_constant(operand):
+            number = float(operand)
+            return [Fraction(number)] if isfinite(number) else None
+        return values.get(operand)
+
+    for instr in body:
+        op, target = instr.op, instr.result
+        if op not in ("assign", "+", "-", "*"):
+            return None
+        if target == counter:
+            values[counter] = [start + step, step]  # The increment
+            continue
+        if target in sums or target in products:
+            return None
+        if op != "assign" and target not in values and target in (instr.arg1, instr.arg2):
+            # An accumulator: 's = s + e', 's = e + s', 's = s - e', 'p = p * r'
+            other = instr.arg2 if instr.arg1 == target else instr.arg1
+            if other == target or (op == "-" and instr.arg1 != target):
+                return None
+            if op == "*":
+                ratio = value(other) if is_constant(other) else None
+                if ratio is None:
+                    return None
+                products[target] = ratio[0]
+                continue
+            increment = value(other)
+            if increment is None:
+                return None
+            sums[target] = increment if op == "+" else poly_scale(increment, -1)
+            steps.append(sums[target])
+            continue
+        operands = [value(instr.arg1)]
+        if op != "assign":
+            operands.append(value(instr.arg2))
+        if None in operands:
+            return None  # Reads an accumulator, an invariant or last iteration's value
+        if op == "assign":
+            result = operands[0]
+        elif op == "*":
+            result = poly_mul(*operands)
+        else:
+            sign = 1 if op == "+" else -1
+            result = poly_add(operands[0], poly_scale(operands[1], sign))
+        if len(result) > MAX_DEGREE + 1:
+            return None
+        values[target] = result
+        steps.append(result)
+
+    if not sums and not products:
+        return None
+    exit_live = liveness.live_in[counted.last + 1]
+    if any(name != counter and name in exit_live for name in values):
+        return None
+    values.pop(counter)
+    return Evolution(counted, steps, values, sums, products)
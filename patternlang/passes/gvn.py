@@ -0,0 +1,165 @@
+"""
+Value numbering for PatternLang IR.
+Walks the dominator tree giving every computed value a number, so a
+computation whose operands carry the same numbers as an earlier one can
+reuse that result instead. Variables are mutable, so a redefinition gives
+the variable a fresh number, and at a join every variable written on a
+path into it (since its immediate dominator) is treated as unknown.
+"""
+
+from math import copysign
+
+from ..ir import BINARY_OPS, IRInstruction, instruction_def, is_constant
+from ..analysis.cache import AnalysisCache
+from ..numeric import FLOAT
+
+# Operators whose operands can be swapped
+COMMUTATIVE_OPS = {"+", "*", "==", "!="}
+
+
+class GlobalValueNumbering:
+    """
+    Dominator-tree value numbering (local value numbering inside each
+    block, extended to every block the defining block dominates).
+    A redundant 'x = a op b' becomes 'x = y' where y still holds the
+    value; copy propagation and DCE clean up afterwards.
+    Constants are numbered by their value in the given NumericMode, its
+    type (1 and 1.0 differ in exact mode) and, for a float, its sign
+    (0.0 and -0.0 compare equal but can give different results).
+    """
+
+    name = "gvn"
+
+    def __init__(self, numeric=FLOAT):
+        self.numeric = numeric
+        self.stats = {}
+
+    def run(self, instructions, analyses=None):
+        """Apply the pass and return the new instruction list."""
+        analyses = analyses or AnalysisCache()
+        cfg = analyses.cfg(instructions)
+        self.cfg = cfg
+        self.block_defs = [
+            {d for d in map(instruction_def, block.instructions) if d is not None}
+            for block in cfg.blocks
+        ]
+        self.local = 0
+        self.dominated = 0
+
+        idom = cfg.dominators()
+        self.reachable = set(idom)
+        children = cfg.dominator_children()
+        for root in (b for b, d in idom.items() if d is None):
+            self._walk(root, idom, children)
+
+        self.stats = {"local": self.local, "global": self.dominated}
+        return cfg.linearize()
+
+    def _walk(self, root, idom, children):
+        """Number every block under root; state is undone on the way back up."""
+        self.var_vn = {}  # name -> value number it currently holds
+        self.table = {}  # (op, vn, vn) -> (value number, holder name, block)
+        self.next_vn = 0
+        undo = []  # (dict, key, previous value or _MISSING)
+
+        work = [(root, None)]
+        while work:
+            b, mark = work.pop()
+            if mark is not None:
+                self._undo(undo, mark)
+                continue
+            mark = len(undo)
+            if idom[b] is not None and self.cfg.blocks[b].preds != [idom[b]]:
+                for name in self._region_defs(b, idom[b]):
+                    self._set(undo, self.var_vn, name, self._fresh())
+            self._number_block(b, undo)
+            work.append((b, mark))
+            work.extend((c, None) for c in children.get(b, ()))
+
+    def _region_defs(self, b, dominator):
+        """Names written on some path from dominator to b (join blocks only)."""
+        blocks = self.cfg.blocks
+        defs = set()
+        seen = {dominator}
+        stack = list(blocks[b].preds)
+        while stack:
+            p = stack.pop()
+            if p in seen or p not in self.reachable:
+                continue
+            seen.add(p)
+            defs |= self.block_defs[p]
+            stack.extend(blocks[p].preds)
+        return defs
+
+    def _number_block(self, b, undo):
+        """Number the expressions of block b, replacing ones already held by a variable."""
+        var_vn = self.var_vn
+        for k, instr in enumerate(self.cfg.blocks[b].instructions):
+            defined = instruction_def(instr)
+            if defined is None:
+                continue
+            if instr.op == "assign":
+                self._set(undo, var_vn, defined, self._operand(instr.arg1, undo))
+                continue
+            if instr.op not in BINARY_OPS:
+                self._set(undo, var_vn, defined, self._fresh())
+                continue
+
+            left = self._operand(instr.arg1, undo)
+            right = self._operand(instr.arg2, undo)
+            if instr.op in COMMUTATIVE_OPS and repr(right) < repr(left):
+                left, right = right, left
+            key = (instr.op, left, right)
+
+            found = self.table.get(key)
+            if found is not None and var_vn.get(found[1]) == found[0]:
+                vn, holder, where = found
+                self.cfg.blocks[b].instructions[k] = IRInstruction(
+                    "assign", holder, None, defined, instr.line
+                )
+                if where == b:
+                    self.local += 1
+                else:
+                    self.dominated += 1
+                self._set(undo, var_vn, defined, vn)
+            else:
+                vn = self._fresh()
+                self._set(undo, var_vn, defined, vn)
+                self._set(undo, self.table, key, (vn, defined, b))
+
+    def _operand(self, operand, undo):
+        """Value number of an operand (constants number themselves)."""
+        if is_constant(operand):
+            value = self.numeric.constant(operand)
+            if isinstance(value, float):
+                return ("const", float, value, copysign(1.0, value))
+            return ("const", type(value), value)
+        vn = self.var_vn.get(operand)
+        if vn is None:
+            vn = self._fresh()  # Value on entry (parameters, globals)
+            self._set(undo, self.var_vn, operand, vn)
+        return vn
+
+    def _fresh(self):
+        """A new value number."""
+        self.next_vn += 1
+        return self.next_vn
+
+    @staticmethod
+    def _set(undo, mapping, key, value):
+        """Set mapping[key] to value, logging the old entry in undo."""
+        undo.append((mapping, key, mapping.get(key, _MISSING)))
+        mapping[key] = value
+
+    @staticmethod
+    def _undo(undo, mark):
+        """Restore every entry logged in undo after position mark."""
+        while len(undo) > mark:
+            mapping, key, previous = undo.pop()
+            if previous is _MISSING:
+                del mapping[key]
+            else:
+                mapping[key] = previous
+
+
+_MISSING = object()
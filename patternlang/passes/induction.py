@@ -0,0 +1,207 @@
+"""
+Induction-variable strength reduction and elimination for PatternLang IR.
+
+A basic induction variable changes only by 'i = i + c' inside its loop
+(the repeat variable, once the increment is coalesced). A derived one is
+a multiple 'j = i * k'. Each multiplication is replaced by a variable
+that starts at k * i before the loop and grows by k * c next to the
+increment. When the loop then reads i only in its exit test, the test
+is rewritten in terms of that variable and i disappears.
+
+Values are floats, so the rewrite is only made where the sums are exact:
+the start value of i and every constant involved are integers well
+below 2**53. The factor k must also be positive: k * 0 is -0.0 for a
+negative k, but a running sum that reaches zero is +0.0.
+"""
+
+from fractions import Fraction
+from math import isfinite
+
+from ..ir import IRInstruction, instruction_def, instruction_uses, is_constant
+from ..analysis.cache import AnalysisCache
+from ..analysis.ssa import temp_factory
+from .licm import can_place_preheader, place_in_preheader
+
+# Largest magnitude for a constant taking part in a rewrite; with these,
+# 2**53 is out of reach of any loop that could actually finish
+EXACT_LIMIT = 2**20
+
+# Exit comparisons that can be rewritten
+ORDERED_OPS = {"<=", "<", ">=", ">"}
+
+
+def small_integer(operand):
+    """The operand as a float if it is a small integral constant, else None."""
+    if not is_constant(operand):
+        return None
+    value = float(operand)
+    if not isfinite(value) or value != int(value) or abs(value) > EXACT_LIMIT:
+        return None
+    return value
+
+
+def basic_induction_variables(defs):
+    """
+    (name, increment instruction, step) for each name whose only
+    definition in a loop is 'i = i + c', 'i = c + i' or 'i = i - c' with a
+    nonzero constant c. defs maps each name to its definitions in the loop.
+    """
+    found = []
+    for name, instrs in defs.items():
+        if len(instrs) != 1:
+            continue
+        instr = instrs[0]
+        if instr.op == "+" and instr.arg1 == name and is_constant(instr.arg2):
+            step = float(instr.arg2)
+        elif instr.op == "+" and instr.arg2 == name and is_constant(instr.arg1):
+            step = float(instr.arg1)
+        elif instr.op == "-" and instr.arg1 == name and is_constant(instr.arg2):
+            step = -float(instr.arg2)
+        else:
+            continue
+        if step:
+            found.append((name, instr, step))
+    return found
+
+
+def entry_value(cfg, loop, name):
+    """The constant name holds on entry to the loop, if every way in assigns the same one."""
+    values = set()
+    for p in cfg.blocks[loop.header].preds:
+        if p in loop.blocks:
+            continue
+        value = None
+        for instr in reversed(cfg.blocks[p].instructions):
+            if instruction_def(instr) == name:
+                if instr.op == "assign" and is_constant(instr.arg1):
+                    value = float(instr.arg1)
+                break
+        if value is None:
+            return None
+        values.add(value)
+    return values.pop() if len(values) == 1 else None
+
+
+class InductionVariables:
+    """Strength-reduces 'i * k' in loops and eliminates the basic variable when possible."""
+
+    name = "induction variables"
+
+    def __init__(self):
+        self.stats = {}
+
+    def run(self, instructions, analyses=None):
+        """Apply the pass and return the new instruction list."""
+        analyses = analyses or AnalysisCache()
+        cfg = analyses.cfg(instructions)
+        new_temp = temp_factory(cfg)
+        liveness = analyses.liveness(instructions)
+        reduced = 0
+        eliminated = 0
+
+        # Only innermost loops: their blocks are disjoint, so one CFG serves all
+        inner = {loop.parent.header for loop in cfg.loops() if loop.parent}
+        for loop in cfg.loops():
+            if loop.header in inner or not can_place_preheader(cfg, loop):
+                continue
+            count, removed = self._reduce(cfg, loop, liveness, new_temp)
+            reduced += count
+            eliminated += removed
+
+        self.stats = {"multiplications reduced": reduced, "variables eliminated": eliminated}
+        return cfg.linearize()
+
+    def _reduce(self, cfg, loop, liveness, new_temp):
+        """Reduce the multiplications by loop's induction variables; return both counts."""
+        blocks = [cfg.blocks[b] for b in sorted(loop.blocks)]
+        defs = {}  # name -> defining instructions in the loop
+        uses = {}  # name -> reading instructions in the loop
+        for block in blocks:
+            for instr in block.instructions:
+                defined = instruction_def(instr)
+                if defined is not None:
+                    defs.setdefault(defined, []).append(instr)
+                for name in instruction_uses(instr):
+                    uses.setdefault(name, []).append(instr)
+
+        preheader = []
+        reduced = 0
+        eliminated = 0
+        for name, increment, step in basic_induction_variables(defs):
+            start = small_integer(entry_value(cfg, loop, name))
+            if start is None or small_integer(step) is None:
+                continue
+
+            # Derived variables: every 'j = i * k' with a positive integral constant k
+            survivors = []
+            for instr in uses.get(name, ()):
+                if instr.op != "*":
+                    continue
+                factor = instr.arg2 if instr.arg1 == name else instr.arg1
+                k = small_integer(factor)
+                if k is None or k <= 0 or abs(k * step) > EXACT_LIMIT:
+                    continue
+                scaled = new_temp()
+                preheader.append(IRInstruction("assign", str(k * start), None, scaled))
+                self._insert_after(
+                    blocks, increment, IRInstruction("+", scaled, str(k * step), scaled)
+                )
+                instr.op, instr.arg1, instr.arg2 = "assign", scaled, None
+                survivors.append((scaled, k))
+                reduced += 1
+
+            if survivors and self._eliminate(
+                cfg, loop, liveness, name, increment, uses, defs, survivors[0]
+            ):
+                eliminated += 1
+
+        if preheader:
+            place_in_preheader(cfg, loop, preheader)
+        return reduced, eliminated
+
+    @staticmethod
+    def _insert_after(blocks, anchor, instr):
+        """Insert instr right after anchor, in whichever of blocks holds it."""
+        for block in blocks:
+            for k, candidate in enumerate(block.instructions):
+                if candidate is anchor:
+                    block.instructions.insert(k + 1, instr)
+                    return
+
+    def _eliminate(self, cfg, loop, liveness, name, increment, uses, defs, survivor):
+        """
+        Rewrite the exit test 't = i <= n; if_false t' as 't = s <= k * n'
+        and drop the increment of i, if nothing else in the loop or after
+        it reads i and k * n is exact.
+        """
+        scaled, k = survivor
+        # The reduced multiplications no longer read i
+        others = [
+            instr
+            for instr in uses.get(name, ())
+            if instr is not increment and name in instruction_uses(instr)
+        ]
+        if len(others) != 1:
+            return False
+        test = others[0]
+        if test.op not in ORDERED_OPS or test.arg1 != name or not is_constant(test.arg2):
+            return False
+        if len(defs.get(test.result, ())) != 1 or len(uses.get(test.result, ())) != 1:
+            return False
+        if any(
+            name in liveness.live_in[target] or test.result in liveness.live_in[target]
+            for _, target in loop.exits(cfg)
+        ):
+            return False
+
+        bound = Fraction(float(test.arg2)) * int(k)
+        if Fraction(float(bound)) != bound:
+            return False
+
+        test.arg1, test.arg2 = scaled, str(float(bound))
+        for b in loop.blocks:
+            block = cfg.blocks[b]
+            if increment in block.instructions:
+                block.instructions.remove(increment)
+                break
+        return True
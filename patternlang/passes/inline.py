@@ -0,0 +1,234 @@
+"""
+Function inlining for PatternLang IR.
+A call costs a push per argument, a frame switch, a return and a getret,
+which dwarfs a body like 'return a + b'. Small non-recursive functions
+are copied into their callers instead, where the surrounding passes can
+optimize the body together with the arguments it is called with.
+"""
+
+from ..ir import (
+    JUMP_OPERAND,
+    IRInstruction,
+    instruction_def,
+    instruction_uses,
+    is_variable,
+    replace_uses,
+)
+from ..analysis.callgraph import CallGraph
+from ..analysis.cache import AnalysisCache
+from ..analysis.liveness import Liveness
+from ..analysis.ssa import temp_factory
+
+# Instructions the scan for a call's pushes cannot cross
+SCAN_STOPS = {"label", "goto", "if_false", "ret"}
+
+
+def argument_pushes(code, c, argc):
+    """
+    Indices of the pushes passing the arguments of the call at code[c],
+    first argument first, or None if they are not all in the straight-line
+    code before it. Pushes consumed by calls in between are skipped.
+    """
+    found = []
+    nested = 0  # Pushes still owed to calls seen during the scan
+    k = c - 1
+    while len(found) < argc:
+        if k < 0 or code[k].op in SCAN_STOPS:
+            return None
+        if code[k].op == "call":
+            nested += code[k].arg2
+        elif code[k].op == "push":
+            if nested:
+                nested -= 1
+            else:
+                found.append(k)
+        k -= 1
+    found.reverse()
+    return found
+
+
+class FunctionInlining:
+    """
+    Replaces calls to small functions by a copy of the callee's body.
+
+    A function is inlined when it is not recursive, every local it reads
+    is written first (so a fresh frame and a renamed copy behave alike),
+    and its body has at most `size_limit` instructions, or it has a single
+    call site. Callees are handled before their callers, so a caller
+    receives bodies that are already inlined themselves. In the copy,
+    parameters and locals become fresh temporaries, labels are renamed,
+    and 'ret v' assigns the call's result and jumps past the copy. The
+    program may grow by at most its own size or `budget` instructions,
+    whichever is larger. Functions left without callers are removed.
+    """
+
+    name = "inline"
+
+    def __init__(self, size_limit=12, budget=64):
+        self.size_limit = size_limit
+        self.budget = budget
+        self.stats = {}
+
+    def run(self, instructions, analyses=None):
+        """Apply the pass and return the new instruction list."""
+        analyses = analyses or AnalysisCache()
+        cfg = analyses.cfg(instructions)
+        self.cfg = cfg
+        self.new_temp = temp_factory(cfg)
+        self.growth = max(len(instructions), self.budget)
+        self.inlined = 0
+        graph = CallGraph.from_cfg(cfg)
+
+        # Maximal runs of consecutive blocks belonging to the same function
+        segments = []  # [owner, instructions]
+        for block in cfg.blocks:
+            owner = cfg.function_of.get(block.id, _UNREACHABLE)
+            if owner is None:
+                owner = CallGraph.MAIN
+            if segments and segments[-1][0] == owner:
+                segments[-1][1].extend(block.instructions)
+            else:
+                segments.append([owner, list(block.instructions)])
+
+        self.bodies = self._inlinable(cfg, graph, segments)
+        for component in graph.sccs:
+            for owner in component:
+                for segment in segments:
+                    if segment[0] == owner:
+                        segment[1] = self._rewrite(segment[1], owner)
+                        if owner in self.bodies:
+                            self.bodies[owner] = segment[1]
+
+        # Drop functions no remaining call can reach
+        called = {CallGraph.MAIN, _UNREACHABLE}
+        work = [CallGraph.MAIN]
+        while work:
+            owner = work.pop()
+            for segment in segments:
+                if segment[0] != owner:
+                    continue
+                for instr in segment[1]:
+                    if instr.op == "call":
+                        callee = instr.arg1[len("func_") :]
+                        if callee not in called:
+                            called.add(callee)
+                            work.append(callee)
+        removed = {s[0] for s in segments if s[0] not in called}
+
+        self.stats = {"calls inlined": self.inlined, "functions removed": len(removed)}
+        return [instr for owner, code in segments if owner in called for instr in code]
+
+    def _inlinable(self, cfg, graph, segments):
+        """Function name -> body, for every function a call may be replaced with."""
+        owners = [owner for owner, _ in segments]
+        liveness = Liveness(cfg)
+        bodies = {}
+        for owner, code in segments:
+            if owner not in graph.functions or owners.count(owner) != 1:
+                continue
+            entry = graph.functions[owner]
+            if graph.is_recursive(owner) or code[0] is not cfg.blocks[entry].instructions[0]:
+                continue
+            # The last instruction must not fall out of the function
+            if code[-1].op not in ("goto", "ret"):
+                continue
+            if not all(name.startswith("_args[") for name in liveness.live_in[entry]):
+                continue
+            bodies[owner] = code
+        self.call_sites = {name: graph.call_count(name) for name in bodies}
+        return bodies
+
+    def _rewrite(self, code, owner):
+        """Inline the eligible calls of one code segment."""
+        replaced = {}  # index -> instructions replacing it
+        for c, instr in enumerate(code):
+            if instr.op != "call":
+                continue
+            callee = instr.arg1[len("func_") :]
+            body = self.bodies.get(callee)
+            if body is None or callee == owner:
+                continue
+            size = sum(1 for i in body if i.op != "label")
+            if size > self.size_limit and self.call_sites[callee] != 1:
+                continue
+            if len(body) > self.growth:
+                continue
+            pushes = argument_pushes(code, c, instr.arg2)
+            if pushes is None:
+                continue
+
+            params = [self.new_temp() for _ in pushes]
+            for k, param in zip(pushes, params):
+                replaced[k] = [
+                    IRInstruction("assign", code[k].arg1, None, param, code[k].line)
+                ]
+            result = None
+            if c + 1 < len(code) and code[c + 1].op == "getret":
+                result = code[c + 1].result
+                replaced[c + 1] = []
+            replaced[c] = self._copy(body, params, result)
+            self.growth -= len(body)
+            self.inlined += 1
+
+        if not replaced:
+            return code
+        rewritten = []
+        for k, instr in enumerate(code):
+            rewritten.extend(replaced.get(k, [instr]))
+        return rewritten
+
+    def _copy(self, body, params, result):
+        """The callee's body renamed into the caller, returning into result."""
+        names = {f"_args[{i}]": param for i, param in enumerate(params)}
+        labels = {}
+        for instr in body:
+            if instr.op == "label":
+                labels[instr.result] = self.cfg.new_label()
+        entry_label = body[0].result
+        return_label = self.cfg.new_label()
+
+        def rename(name):
+            """The fresh temporary standing for name in this copy of the body."""
+            if name not in names:
+                names[name] = self.new_temp()
+            return names[name]
+
+        copy = []
+        jumps_back = False
+        returns = False
+        for k, instr in enumerate(body):
+            new = instr.copy()
+            if new.op == "ret":
+                if result is not None:
+                    value = rename(new.arg1) if is_variable(new.arg1) else new.arg1
+                    copy.append(IRInstruction("assign", value, None, result, new.line))
+                if k != len(body) - 1:
+                    copy.append(IRInstruction("goto", return_label, line=new.line))
+                    returns = True
+                continue
+            if new.op == "label":
+                new.result = labels[new.result]
+            field = JUMP_OPERAND.get(new.op)
+            if field is not None and new.op != "call":
+                target = getattr(new, field)
+                setattr(new, field, labels[target])
+                jumps_back = jumps_back or target == entry_label
+            self._rename_operands(new, rename)
+            copy.append(new)
+
+        if not jumps_back:
+            copy = copy[1:]  # Nothing jumps to the entry label
+        if returns:
+            copy.append(IRInstruction("label", None, None, return_label))
+        return copy
+
+    @staticmethod
+    def _rename_operands(instr, rename):
+        """Rename every variable instr reads or writes, in place."""
+        replace_uses(instr, {name: rename(name) for name in instruction_uses(instr)})
+        defined = instruction_def(instr)
+        if defined is not None:
+            instr.result = rename(defined)
+
+
+_UNREACHABLE = object()  # Owner of blocks no entry reaches
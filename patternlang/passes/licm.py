@@ -0,0 +1,195 @@
+"""
+Loop-invariant code motion for PatternLang IR.
+Computations inside a natural loop whose operands do not change in the
+loop are moved to a preheader, so a repeat loop evaluates them once
+instead of on every iteration.
+"""
+
+from ..ir import BINARY_OPS, IRInstruction, instruction_def, is_constant
+from ..analysis.cache import AnalysisCache
+from ..analysis.assigned import DefiniteAssignment, is_argument
+from ..analysis.cfg import build_cfg
+from ..analysis.liveness import Liveness
+
+
+class LoopInvariantCodeMotion:
+    """
+    Hoists invariant assignments out of natural loops, innermost first.
+
+    'x = a op b' moves to the preheader when a and b are constants, never
+    written in the loop, or themselves hoisted, and when moving it cannot
+    be observed: x has no other definition in the loop, its value from
+    before the loop is never read inside it, and if x is read after the
+    loop, the instruction runs on every path out of it. An instruction
+    that can trap - a division or modulo by a non-constant divisor, or a
+    read of a name not definitely assigned when the loop is entered -
+    only moves when it would have run first thing anyway: in the loop
+    header, before anything the program prints or calls, on every
+    iteration and even if the loop body runs zero times.
+    """
+
+    name = "licm"
+
+    def __init__(self):
+        self.stats = {}
+
+    def run(self, instructions, analyses=None):
+        """Apply the pass and return the new instruction list."""
+        hoisted = 0
+        preheaders = 0
+        analyses = analyses or AnalysisCache()
+        cfg = analyses.cfg(instructions)
+        depths = sorted({loop.depth for loop in cfg.loops()}, reverse=True)
+
+        # Loops of one depth are disjoint, so they are handled together;
+        # the graph is rebuilt before the enclosing depth sees the result
+        for level, depth in enumerate(depths):
+            if level:
+                cfg = build_cfg(cfg.linearize())
+            liveness = Liveness(cfg)
+            assignment = DefiniteAssignment(cfg)
+            for loop in cfg.loops():
+                if loop.depth != depth:
+                    continue
+                moved = self._invariants(cfg, loop, liveness, assignment)
+                if moved and self._hoist(cfg, loop, moved):
+                    hoisted += len(moved)
+                    preheaders += 1
+
+        self.stats = {"hoisted": hoisted, "loops": preheaders}
+        return cfg.linearize()
+
+    def _invariants(self, cfg, loop, liveness, assignment):
+        """Instructions of the loop that can move to its preheader, in order."""
+        blocks = sorted(loop.blocks)
+        def_count = {}
+        for b in blocks:
+            for instr in cfg.blocks[b].instructions:
+                defined = instruction_def(instr)
+                if defined is not None:
+                    def_count[defined] = def_count.get(defined, 0) + 1
+
+        exits = loop.exits(cfg)
+        live_after_loop = set()
+        for _, target in exits:
+            live_after_loop |= liveness.live_in[target]
+        exiting = {b for b, _ in exits}
+        exiting.update(
+            b
+            for b in blocks
+            if cfg.blocks[b].terminator is not None
+            and cfg.blocks[b].terminator.op == "ret"
+        )
+        header_live = liveness.live_in[loop.header]
+        on_entry = assignment.on_entry_to(loop)
+
+        # Instructions of the header that run before its first print or call
+        header_start = set()
+        for instr in cfg.blocks[loop.header].instructions:
+            if instr.op in ("print", "push", "call"):
+                break
+            header_start.add(id(instr))
+
+        def runs_on_every_exit(b):
+            """True if block b dominates every block the loop exits from."""
+            return all(cfg.dominates(b, e) for e in exiting)
+
+        def runs_first(b, instr):
+            """True if instr runs before anything observable, on every iteration and exit."""
+            return (
+                b == loop.header
+                and id(instr) in header_start
+                and runs_on_every_exit(b)
+                and all(cfg.dominates(b, latch) for latch in loop.latches)
+            )
+
+        def assigned(name):
+            """True if name is set on entry, by a hoisted instruction or as an argument."""
+            return name in on_entry or name in invariant or is_argument(name)
+
+        invariant = set()  # Names whose loop definition was hoisted
+        moved = []
+        moved_ids = set()
+        changed = True
+        while changed:
+            changed = False
+            for b in blocks:
+                for instr in cfg.blocks[b].instructions:
+                    if id(instr) in moved_ids:
+                        continue
+                    if instr.op != "assign" and instr.op not in BINARY_OPS:
+                        continue
+                    target = instr.result
+                    if def_count.get(target) != 1 or target in header_live:
+                        continue
+                    operands = [instr.arg1] if instr.op == "assign" else [instr.arg1, instr.arg2]
+                    if not all(
+                        is_constant(a) or a not in def_count or a in invariant
+                        for a in operands
+                    ):
+                        continue
+                    if target in live_after_loop and not runs_on_every_exit(b):
+                        continue
+                    traps = self.may_trap(instr) or not all(
+                        assigned(a) for a in operands if not is_constant(a)
+                    )
+                    if traps and not runs_first(b, instr):
+                        continue
+                    moved.append(instr)
+                    moved_ids.add(id(instr))
+                    invariant.add(target)
+                    changed = True
+        return moved
+
+    def _hoist(self, cfg, loop, moved):
+        """Move the instructions out of the loop body into its preheader."""
+        if not can_place_preheader(cfg, loop):
+            return False
+        moved_ids = {id(instr) for instr in moved}
+        for b in loop.blocks:
+            block = cfg.blocks[b]
+            block.instructions = [i for i in block.instructions if id(i) not in moved_ids]
+        place_in_preheader(cfg, loop, moved)
+        return True
+
+    @staticmethod
+    def may_trap(instr):
+        """True for a division or modulo whose divisor is not a nonzero constant."""
+        if instr.op not in ("/", "%"):
+            return False
+        return not (is_constant(instr.arg2) and float(instr.arg2) != 0)
+
+
+def can_place_preheader(cfg, loop):
+    """True if code can be placed so it runs once, just before the loop is entered."""
+    header = cfg.blocks[loop.header]
+    before = loop.header - 1
+    outside = [p for p in header.preds if p not in loop.blocks]
+    return bool(outside) and not (before in loop.blocks and before in header.preds)
+
+
+def place_in_preheader(cfg, loop, instructions):
+    """
+    Add instructions to the loop's preheader (check can_place_preheader
+    first). The block falling into the header serves as one when it is
+    the only way in; otherwise a labelled preheader is placed right
+    before the header and outside jumps are pointed at it. Block ids do
+    not change, so the CFG stays usable for other loops until rebuilt.
+    """
+    header = cfg.blocks[loop.header]
+    before = loop.header - 1
+    outside = [p for p in header.preds if p not in loop.blocks]
+    if outside == [before] and cfg.blocks[before].terminator is None:
+        cfg.blocks[before].instructions.extend(instructions)
+        return
+
+    label = cfg.new_label()
+    for p in outside:
+        term = cfg.blocks[p].terminator
+        if term is not None and term.op == "goto" and term.arg1 == header.label:
+            term.arg1 = label
+        elif term is not None and term.op == "if_false" and term.arg2 == header.label:
+            term.arg2 = label
+    header.instructions[0:0] = [IRInstruction("label", None, None, label)] + list(
+        instructions
+    )
@@ -0,0 +1,157 @@
+"""
+Pass manager for the PatternLang optimizer.
+Passes are registered in groups, each naming the passes it has to run
+after. A group runs its passes in dependency order, either once or
+repeatedly until a round leaves the IR unchanged (within a round
+budget). Cached analyses survive a pass that changes nothing and are
+dropped as soon as one changes the IR. Every pass is timed, and the
+change in instruction count it causes is recorded, so the cost of an
+optimization level can be weighed against what it saves at run time.
+After every pass, instructions it created without a source line take
+the line of the code before them (see fill_lines).
+"""
+
+import time
+
+from ..analysis.cache import AnalysisCache
+from ..ir import fill_lines
+
+
+class FunctionPass:
+    """Wraps a function from instruction list to instruction list as a pass."""
+
+    def __init__(self, name, function):
+        self.name = name
+        self.function = function
+        self.stats = {}
+
+    def run(self, instructions, analyses=None):
+        """Apply the function and return the new instruction list."""
+        return self.function(instructions)
+
+
+class PassGroup:
+    """Passes run together, up to max_rounds times until nothing changes."""
+
+    def __init__(self, name, max_rounds=1, then=None):
+        self.name = name
+        self.max_rounds = max_rounds
+        self.then = then  # Group to run again if this one changed the IR
+        self.passes = []  # (pass, names of passes it runs after)
+
+    def add(self, optimization, after=()):
+        """Register a pass; after names passes (here or in an earlier group) it follows."""
+        self.passes.append((optimization, tuple(after)))
+        return optimization
+
+    def ordered(self):
+        """The passes with each after its dependencies, otherwise in registration order."""
+        local = {optimization.name for optimization, _ in self.passes}
+        placed = set()
+        pending = list(self.passes)
+        order = []
+        while pending:
+            for k, (optimization, after) in enumerate(pending):
+                if all(name in placed or name not in local for name in after):
+                    break
+            else:
+                names = ", ".join(optimization.name for optimization, _ in pending)
+                raise ValueError(f"Pass dependency cycle in group '{self.name}': {names}")
+            order.append(optimization)
+            placed.add(optimization.name)
+            del pending[k]
+        return order
+
+
+class PassManager:
+    """
+    Runs pass groups in registration order over one instruction list.
+
+    Statistics are summed per pass name; timings record, per pass name,
+    the number of runs, the wall time in seconds and the net change in
+    instruction count.
+    """
+
+    def __init__(self):
+        self.groups = []
+        self.analyses = AnalysisCache()
+        self.stats = {}  # pass name -> statistics summed over all runs
+        self.timings = {}  # pass name -> {"runs", "seconds", "instructions"}
+        self.rounds = 0  # Rounds of repeated groups
+
+    def group(self, name, max_rounds=1, then=None):
+        """Add an empty group and return it for registering passes."""
+        group = PassGroup(name, max_rounds, then)
+        self.groups.append(group)
+        return group
+
+    def run(self, instructions):
+        """Run every group and return the optimized instructions."""
+        self._check_dependencies()
+        self.instructions = instructions
+        self.signatures = self._signatures(instructions)
+        self.analyses.invalidate()
+        groups = {group.name: group for group in self.groups}
+        for group in self.groups:
+            if self.run_group(group) and group.then is not None:
+                self.run_group(groups[group.then])
+        return self.instructions
+
+    def run_group(self, group):
+        """Run one group to its fixpoint or round budget; True if the IR changed."""
+        passes = group.ordered()
+        start = self.signatures
+        for _ in range(group.max_rounds):
+            if group.max_rounds > 1:
+                self.rounds += 1
+            before = self.signatures
+            for optimization in passes:
+                self.run_pass(optimization)
+            if self.signatures == before:
+                break
+        return self.signatures != start
+
+    def run_pass(self, optimization):
+        """Run one pass, keep or drop the cached analyses, and record its cost."""
+        size = len(self.instructions)
+        started = time.perf_counter()
+        result = optimization.run(self.instructions, self.analyses)
+        elapsed = time.perf_counter() - started
+        fill_lines(result)
+
+        signatures = self._signatures(result)
+        if signatures == self.signatures:
+            self.analyses.adopt(result)
+        else:
+            self.analyses.invalidate()
+            self.signatures = signatures
+        self.instructions = result
+
+        if optimization.stats:
+            totals = self.stats.setdefault(optimization.name, {})
+            for key, value in optimization.stats.items():
+                totals[key] = totals.get(key, 0) + value
+        timing = self.timings.setdefault(
+            optimization.name, {"runs": 0, "seconds": 0.0, "instructions": 0}
+        )
+        timing["runs"] += 1
+        timing["seconds"] += elapsed
+        timing["instructions"] += len(result) - size
+
+    def _check_dependencies(self):
+        """Every dependency must name a pass in the same or an earlier group."""
+        seen = set()
+        for group in self.groups:
+            names = {optimization.name for optimization, _ in group.passes}
+            for optimization, after in group.passes:
+                for name in after:
+                    if name not in names and name not in seen:
+                        raise ValueError(
+                            f"Pass '{optimization.name}' depends on unknown pass '{name}'"
+                        )
+            seen |= names
+
+    @staticmethod
+    def _signatures(instructions):
+        """Comparable form of the IR, to tell whether a pass changed it."""
+        return [(i.op, i.arg1, i.arg2, i.result) for i in instructions]
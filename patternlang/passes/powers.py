@@ -0,0 +1,256 @@
+"""
+Closed forms for linear recurrences in PatternLang IR.
+A recurrence loop (see recurrence.py) applies the T-th power of its
+matrix. With a constant trip count and integer values that stay exact,
+the final values are computed at compile time. With fast_math the
+matrix power is also taken in floats, and for a run-time trip count by
+repeated squaring in the program itself, once the trip count is large
+enough to make that cheaper than the loop.
+"""
+
+from math import copysign, isfinite
+
+from ..ir import IRInstruction, is_constant
+from .evolution import EXACT, MAX_EXPONENT, exact_integer
+from .induction import entry_value
+from .recurrence import ONE, exact_apply, identity, mat_pow, reach_bound
+from .tripcount import MAX_TRIPS, constant, countable, emitter, guarded_trips
+
+
+class RecurrencePowers:
+    """
+    Rewrites the linear recurrences of one CFG for ClosedFormLoops.
+    Without fast_math a recurrence is only replaced when the trip count
+    and every starting value are constants and all values stay exact
+    integers, and then by the final values.
+    """
+
+    def __init__(self, cfg, new_temp, fast_math=False):
+        self.cfg = cfg
+        self.new_temp = new_temp
+        self.fast_math = fast_math
+
+    def _values(self, recurrence, trips):
+        """
+        Each variable's value after trips iterations if the loop's floats
+        are exactly the integers computed here, else None: every starting
+        value is a known integer, and no value ever reaches 2**53.
+        """
+        if recurrence.signed_zero or any(factor <= 0 for factor in recurrence.factors):
+            return None  # 0.0 times a negative number is -0.0
+        rows = recurrence.matrix + recurrence.steps
+        if any(x.denominator != 1 for row in rows for x in row):
+            return None
+        start = []
+        for name in recurrence.names[:-1]:
+            value = entry_value(self.cfg, recurrence.counted.loop, name)
+            if not exact_integer(value) or copysign(1, value) < 0:
+                return None
+            start.append(int(value))
+        start.append(1)
+        matrix = [[int(x) for x in row] for row in recurrence.matrix]
+        bound = reach_bound(matrix, start, trips, EXACT)
+        bound[-1] = 1
+        for row in rows:
+            if sum(abs(int(x)) * b for x, b in zip(row, bound)) >= EXACT:
+                return None
+        return exact_apply(matrix, trips, start)
+
+    def constant_trips(self, recurrence):
+        """The recurrence's final values, for a constant bound."""
+        counted = recurrence.counted
+        trips = counted.trip_count(EXACT)
+        if trips is None:
+            return None
+        code = [self.cfg.blocks[counted.first].instructions[0]]
+        values = self._values(recurrence, trips)
+        if values is not None:
+            for name, value in zip(recurrence.names, values):
+                if name in recurrence.written:
+                    code.append(IRInstruction("assign", constant(value), None, name))
+            return code
+        if not self.fast_math:
+            return None
+        matrix = [[float(x) for x in row] for row in recurrence.matrix]
+        power = mat_pow(matrix, trips, one=1.0, zero=0.0)
+        if not all(isfinite(x) for row in power for x in row):
+            return None
+        rows = [[constant(x) for x in row] for row in power]
+        emit = emitter(code, self.new_temp)
+        self._apply(emit, recurrence.names, rows, recurrence.written)
+        return code
+
+    def runtime_trips(self, recurrence):
+        """
+        With fast_math, 'if trip count in range: M ** trips by repeated
+        squaring; state = M ** trips * state; goto exit' in front of the
+        loop. The range starts where the squaring beats running the loop.
+        """
+        counted = recurrence.counted
+        if not self.fast_math or not countable(counted):
+            return None
+        names, matrix = self._needed(recurrence)
+        if len(names) == 1:
+            return None
+        cfg = self.cfg
+        trips = self.new_temp()
+        setup, loop, finish = [], [], []
+        emit = emitter(setup, self.new_temp)
+
+        # Entry i, j of a power can only be nonzero if names[j] feeds names[i];
+        # the others stay 0 (in particular, the last row stays 0, ..., 0, 1)
+        size = len(names)
+        feeds = [{i} | {j for j in range(size) if matrix[i][j]} for i in range(size)]
+        changed = True
+        while changed:
+            changed = False
+            for reached in feeds:
+                wider = set().union(*(feeds[j] for j in reached))
+                if wider != reached:
+                    reached |= wider
+                    changed = True
+
+        def variables(rows):
+            """Copy the rows into variables, except entries that stay 0 and the last row."""
+            return [
+                [emit("assign", x, None) if j in feeds[i] else "0.0" for j, x in enumerate(row)]
+                for i, row in enumerate(rows[:-1])
+            ] + [rows[-1]]
+
+        result = variables(identity(size, "1.0", "0.0"))
+        base = variables([[constant(x) for x in row] for row in matrix])
+        exponent = emit("assign", trips, None)
+
+        # The trip count is at least 1, and the base is only squared while
+        # bits remain, so no power beyond the trip count is computed
+        loop_label, skip_label, done_label = (cfg.new_label() for _ in range(3))
+        emit = emitter(loop, self.new_temp)
+        loop.append(IRInstruction("label", None, None, loop_label))
+        bit = emit("%", exponent, "2.0")
+        loop.append(IRInstruction("if_false", bit, skip_label))
+        self._assign_rows(emit, result, self._matrix_product(emit, result, base))
+        loop.append(IRInstruction("label", None, None, skip_label))
+        emit("*", emit("-", exponent, bit), "0.5", exponent)
+        more = emit(">", exponent, "0.0")
+        loop.append(IRInstruction("if_false", more, done_label))
+        self._assign_rows(emit, base, self._matrix_product(emit, base, base))
+        loop.append(IRInstruction("goto", loop_label))
+        loop.append(IRInstruction("label", None, None, done_label))
+
+        emit = emitter(finish, self.new_temp)
+        self._apply(emit, names, result, recurrence.written)
+        if counted.counter not in names:
+            near = str(float(counted.start))
+            emit("+" if counted.step > 0 else "-", near, trips, counted.counter)
+        finish.append(IRInstruction("goto", cfg.blocks[counted.last + 1].label))
+
+        # An iteration of the loop runs its body, the test and the branch;
+        # the squaring loop runs once per bit of the trip count
+        per_trip = sum(len(cfg.blocks[b].instructions) for b in counted.loop.blocks) - 1
+        fixed = len(setup) + len(finish) + 10  # Roughly, with the guard
+        low = 1
+        while low * per_trip < fixed + low.bit_length() * len(loop):
+            low += 1
+        high = self._finite_trips(matrix)
+        if high < low:
+            return None
+
+        code = []
+        guarded_trips(self.cfg, code, counted, low, high, trips, self.new_temp)
+        code += setup + loop + finish
+        for b in range(counted.first, counted.last + 1):
+            code.extend(cfg.blocks[b].instructions)
+        return code
+
+    @staticmethod
+    def _finite_trips(matrix):
+        """
+        Largest trip count (up to MAX_TRIPS) for which every power of the
+        matrix up to the trip count stays finite, and so every product the
+        squaring computes; the loop handles larger ones as it always did.
+        """
+        limit = 2.0 ** (MAX_EXPONENT - 1)
+        magnitude = [[float(abs(x)) for x in row] for row in matrix]
+        ones = [1.0] * len(matrix)
+
+        def finite(trips):
+            """True if every power up to the trip count stays below the limit."""
+            return max(reach_bound(magnitude, ones, trips, limit)) < limit
+
+        low, high = 0, MAX_TRIPS
+        while low < high:
+            middle = (low + high + 1) // 2
+            if finite(middle):
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    @staticmethod
+    def _needed(recurrence):
+        """The variables the live results depend on, with their matrix."""
+        names, matrix = recurrence.names, recurrence.matrix
+        needed = {len(names) - 1}
+        needed |= {
+            i
+            for i, name in enumerate(names)
+            if name in recurrence.live and name != recurrence.counted.counter
+        }
+        pending = list(needed)
+        while pending:
+            i = pending.pop()
+            for j, x in enumerate(matrix[i]):
+                if x and j not in needed:
+                    needed.add(j)
+                    pending.append(j)
+        keep = sorted(needed)
+        return [names[i] for i in keep], [[matrix[i][j] for j in keep] for i in keep]
+
+    def _matrix_product(self, emit, a, b):
+        """Temporaries holding a * b for affine matrices (last rows 0, ..., 0, 1)."""
+        columns = range(len(b[0]))
+        rows = [
+            [self._sum(emit, [self._product(emit, x, b[k][j]) for k, x in enumerate(row)]) for j in columns]
+            for row in a[:-1]
+        ]
+        return rows + [a[-1]]
+
+    @staticmethod
+    def _assign_rows(emit, target, rows):
+        """Copy rows into the temporaries of target (both affine matrices)."""
+        for target_row, row in zip(target[:-1], rows[:-1]):
+            for name, value in zip(target_row, row):
+                emit("assign", value, None, name)
+
+    def _apply(self, emit, names, rows, written):
+        """Set each written names[i] to the sum of rows[i][j] * names[j] at once."""
+        values = []
+        for name, row in zip(names, rows):
+            if name in written:
+                operands = ["1.0" if other == ONE else other for other in names]
+                terms = [self._product(emit, x, y) for x, y in zip(row, operands)]
+                values.append((name, self._sum(emit, terms)))
+        for name, value in values:
+            emit("assign", value, None, name)
+
+    @staticmethod
+    def _product(emit, a, b):
+        """a * b, leaving out factors of 1 (fast_math only); None if either is 0."""
+        for x, y in ((a, b), (b, a)):
+            if is_constant(x):
+                if float(x) == 0:
+                    return None
+                if float(x) == 1:
+                    return y
+        return emit("*", a, b)
+
+    @staticmethod
+    def _sum(emit, terms):
+        """The sum of the terms that are not None ('0.0' if none is left)."""
+        terms = [term for term in terms if term is not None]
+        if not terms:
+            return "0.0"
+        total = terms[0]
+        for term in terms[1:]:
+            total = emit("+", total, term)
+        return total
@@ -0,0 +1,191 @@
+"""
+Linear recurrences in PatternLang IR.
+
+A loop that only moves a fixed set of variables through +, - and
+multiplication by constants, like the Fibonacci step 't = a + b; a = b;
+b = t', applies the same affine map to them on every iteration. Running
+it T times applies the T-th power of that map, which exponentiation by
+squaring computes with O(log T) matrix products instead of T iterations.
+
+This module finds such loops and does the arithmetic on their matrices;
+ClosedFormLoops decides when the result matches the loop and rewrites it.
+"""
+
+from fractions import Fraction
+from math import copysign, isfinite
+
+from ..ir import is_constant
+
+# Key of the constant term in a linear form, and the name of the matching
+# last row and column of a recurrence matrix (no variable starts with a digit)
+ONE = "1"
+
+# Most variables (besides the constant) a recurrence may involve
+MAX_STATE = 8
+
+# A prime well above 2**54: integers below 2**53 in magnitude are told
+# apart by their residues, so exact powers never need big numbers
+PRIME = 2**61 - 1
+
+
+class Recurrence:
+    """The affine map one iteration of a counted loop applies to its variables."""
+
+    def __init__(self, counted, names, matrix, steps, written, live, factors, signed_zero):
+        self.counted = counted
+        self.names = names  # Variables in matrix order, ONE last
+        self.matrix = matrix  # New value of names[i] = sum of matrix[i][j] * names[j]
+        self.steps = steps  # Coefficient row of every arithmetic result in the body
+        self.written = written  # Names the loop assigns (the others are invariant)
+        self.live = live  # State variables read after the loop
+        self.factors = factors  # Constants the body multiplies by
+        self.signed_zero = signed_zero  # True if the body uses the constant -0.0
+
+
+def linear_recurrence(cfg, counted, liveness):
+    """
+    The recurrence of a counted loop whose straight-line body only adds,
+    subtracts, copies and scales by constants; None for any other loop.
+    Variables read before they are written (including invariants) and
+    variables live after the loop are the state; everything else the body
+    writes is a temporary that is dead once the loop exits.
+    """
+    body = [
+        instr
+        for b in range(counted.first + 1, counted.last + 1)
+        for instr in cfg.blocks[b].instructions
+    ][:-1]
+    forms = {}  # name -> {name or ONE: coefficient} in terms of the iteration's start
+    state = []
+    steps = []
+    factors = []
+    signed_zero = False
+
+    def form(operand):
+        """An operand as a linear combination {name or ONE: coefficient}, or None."""
+        nonlocal signed_zero
+        if is_constant(operand):
+            number = float(operand)
+            if not isfinite(number):
+                return None
+            signed_zero |= number == 0 and copysign(1, number) < 0
+            return {ONE: Fraction(number)} if number else {}
+        if operand not in forms:
+            state.append(operand)
+            forms[operand] = {operand: Fraction(1)}
+        return forms[operand]
+
+    for instr in body:
+        op = instr.op
+        if op not in ("assign", "+", "-", "*"):
+            return None
+        left = form(instr.arg1)
+        right = form(instr.arg2) if op != "assign" else {}
+        if left is None or right is None:
+            return None
+        if op == "assign":
+            result = dict(left)
+        elif op == "*":
+            if set(left) <= {ONE}:
+                factor, other = left.get(ONE, Fraction(0)), right
+            elif set(right) <= {ONE}:
+                factor, other = right.get(ONE, Fraction(0)), left
+            else:
+                return None  # A product of two variables is not linear
+            factors.append(factor)
+            result = {name: x * factor for name, x in other.items() if x * factor}
+        else:
+            sign = 1 if op == "+" else -1
+            result = dict(left)
+            for name, x in right.items():
+                result[name] = result.get(name, 0) + sign * x
+            result = {name: x for name, x in result.items() if x}
+        forms[instr.result] = result
+        if op != "assign":
+            steps.append(result)
+
+    written = {instr.result for instr in body}
+    exit_live = liveness.live_in[counted.last + 1]
+    for name in written:
+        if name in exit_live and name not in state:
+            state.append(name)
+    if counted.counter not in state:
+        state.append(counted.counter)
+    if len(state) > MAX_STATE or not any(
+        name in written and name != counted.counter for name in state
+    ):
+        return None
+
+    names = state + [ONE]
+    matrix = []
+    for name in state:
+        row = forms[name] if name in written else {name: Fraction(1)}
+        matrix.append([row.get(other, Fraction(0)) for other in names])
+    matrix.append([Fraction(0)] * len(state) + [Fraction(1)])
+    steps = [[step.get(other, Fraction(0)) for other in names] for step in steps]
+    live = {name for name in state if name in exit_live}
+    return Recurrence(counted, names, matrix, steps, written, live, factors, signed_zero)
+
+
+def identity(size, one=1, zero=0):
+    """The size x size identity matrix, with the given one and zero."""
+    return [[one if i == j else zero for j in range(size)] for i in range(size)]
+
+
+def mat_mul(a, b):
+    """The matrix product a b."""
+    return [[sum(x * b[k][j] for k, x in enumerate(row)) for j in range(len(b[0]))] for row in a]
+
+
+def mat_pow(matrix, n, multiply=mat_mul, one=1, zero=0):
+    """matrix ** n by repeated squaring, with multiply as the product."""
+    result = identity(len(matrix), one, zero)
+    while n:
+        if n & 1:
+            result = multiply(result, matrix)
+        n >>= 1
+        if n:
+            matrix = multiply(matrix, matrix)
+    return result
+
+
+def residue_mul(a, b):
+    """The matrix product a b modulo PRIME."""
+    return [[x % PRIME for x in row] for row in mat_mul(a, b)]
+
+
+def exact_apply(matrix, n, vector):
+    """
+    matrix ** n times vector for integer entries, assuming every entry of
+    the result is below 2**53 in magnitude: the product is only computed
+    modulo PRIME, which determines such entries uniquely.
+    """
+    power = mat_pow([[int(x) % PRIME for x in row] for row in matrix], n, residue_mul)
+    result = []
+    for row in power:
+        value = sum(x * int(v) for x, v in zip(row, vector)) % PRIME
+        result.append(value - PRIME if value > PRIME // 2 else value)
+    return result
+
+
+def reach_bound(matrix, vector, n, limit):
+    """
+    Bound on the magnitude each variable reaches over iterations 0..n,
+    starting from vector: the sum of |matrix| ** k |vector| for k <= n,
+    with every entry capped at limit (capping keeps it an upper bound).
+    """
+    size = len(matrix)
+
+    def capped_mul(a, b):
+        """The matrix product a b, every entry capped at limit."""
+        return [[min(x, limit) for x in row] for row in mat_mul(a, b)]
+
+    # [[A, I], [0, I]] ** (n + 1) holds the sum of A ** k for k <= n top right
+    magnitude = [[abs(x) for x in row] for row in matrix]
+    block = [row + identity(size)[i] for i, row in enumerate(magnitude)]
+    block += [[0] * size + identity(size)[i] for i in range(size)]
+    power = mat_pow(block, n + 1, capped_mul)
+    return [
+        min(sum(power[i][size + j] * abs(v) for j, v in enumerate(vector)), limit)
+        for i in range(size)
+    ]
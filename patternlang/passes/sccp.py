@@ -0,0 +1,255 @@
+"""
+Sparse conditional constant propagation (Wegman-Zadeck) for PatternLang IR.
+Solves on SSA form, so a constant flows through every copy and across
+blocks, and branches whose condition becomes constant only mark one edge
+executable.
+"""
+
+from math import copysign
+
+from ..ir import (
+    BINARY_OPS,
+    IRInstruction,
+    instruction_def,
+    instruction_uses,
+    is_constant,
+)
+from ..analysis.cache import AnalysisCache
+from ..analysis.ssa import to_ssa
+from ..numeric import FLOAT
+
+# Lattice: TOP (no information yet) > a constant > BOTTOM (varies)
+TOP = "top"
+BOTTOM = "bottom"
+
+
+def meet(a, b):
+    """
+    Combine two lattice values (0.0 and -0.0 are different constants, and
+    so are the exact-mode int 1 and the float 1.0).
+    """
+    if a == TOP:
+        return b
+    if b == TOP:
+        return a
+    if a == BOTTOM or b == BOTTOM or a != b or type(a) is not type(b):
+        return BOTTOM
+    if isinstance(a, float) and copysign(1, a) != copysign(1, b):
+        return BOTTOM
+    return a
+
+
+class SCCP:
+    """
+    Propagates constants along executable control flow.
+    Constant definitions become 'x = c', constant uses are replaced,
+    constant branches become a goto (or disappear), and blocks that are
+    never executable are deleted. Constants are read and folded in the
+    given NumericMode.
+    """
+
+    name = "sccp"
+
+    def __init__(self, numeric=FLOAT):
+        self.numeric = numeric
+        self.stats = {}
+
+    def run(self, instructions, analyses=None):
+        """
+        Apply the pass and return the new instruction list.
+        The solver runs on an SSA copy; its facts are then written back to
+        the original instructions (which line up block by block once phis
+        are skipped), so no SSA copies are left behind.
+        """
+        analyses = analyses or AnalysisCache()
+        cfg = analyses.cfg(instructions)
+        self.cfg = to_ssa([instr.copy() for instr in instructions])
+        self.values = {}
+        self.executable_edges = set()
+        self.executable_blocks = set()
+        self._solve()
+
+        folded, branches = self._rewrite(cfg)
+        removed = 0
+        for b, block in enumerate(cfg.blocks):
+            if b not in self.executable_blocks and block.instructions:
+                removed += 1
+                block.instructions = []
+        self.stats = {
+            "constants": folded,
+            "branches folded": branches,
+            "blocks removed": removed,
+        }
+        return cfg.linearize()
+
+    # ------------------------------------------------------------------
+    # Solver
+    # ------------------------------------------------------------------
+
+    def _solve(self):
+        """Run the flow and SSA worklists until no lattice value or edge changes."""
+        cfg = self.cfg
+        self.users = {}  # name -> list of (block id, instruction)
+        self.defined = set()
+        for block in cfg.blocks:
+            for instr in block.instructions:
+                for name in instruction_uses(instr):
+                    self.users.setdefault(name, []).append((block.id, instr))
+                defined = instruction_def(instr)
+                if defined is not None:
+                    self.defined.add(defined)
+
+        flow_work = [(None, entry) for entry in cfg.entries]
+        ssa_work = []
+
+        while flow_work or ssa_work:
+            while flow_work:
+                pred, b = flow_work.pop()
+                if pred is not None:
+                    if (pred, b) in self.executable_edges:
+                        continue
+                    self.executable_edges.add((pred, b))
+                first_visit = b not in self.executable_blocks
+                self.executable_blocks.add(b)
+                block = cfg.blocks[b]
+                for instr in block.instructions:
+                    if instr.op == "phi" or first_visit:
+                        self._visit(b, instr, flow_work, ssa_work)
+                if first_visit and block.terminator is None:
+                    for s in block.succs:
+                        flow_work.append((b, s))
+
+            while ssa_work:
+                name = ssa_work.pop()
+                for b, instr in self.users.get(name, ()):
+                    if b in self.executable_blocks:
+                        self._visit(b, instr, flow_work, ssa_work)
+
+    def _value(self, operand):
+        """Lattice value of an operand."""
+        if operand is None:
+            return BOTTOM  # Undefined on some path: never assume a constant
+        if is_constant(operand):
+            return self.numeric.constant(operand)
+        if operand not in self.defined:
+            return BOTTOM  # Parameters (_args) and entry values vary
+        return self.values.get(operand, TOP)
+
+    def _set(self, name, value, ssa_work):
+        """Lower name to its meet with value, queueing its users if that changed it."""
+        old = self.values.get(name, TOP)
+        new = meet(old, value)
+        if new != old:
+            self.values[name] = new
+            ssa_work.append(name)
+
+    def _visit(self, b, instr, flow_work, ssa_work):
+        """Evaluate one instruction in an executable block."""
+        op = instr.op
+        block = self.cfg.blocks[b]
+
+        if op == "phi":
+            value = TOP
+            for pred, source in instr.arg1.items():
+                if (pred, b) in self.executable_edges:
+                    value = meet(value, self._value(source))
+            self._set(instr.result, value, ssa_work)
+
+        elif op == "assign":
+            self._set(instr.result, self._value(instr.arg1), ssa_work)
+
+        elif op in BINARY_OPS:
+            left = self._value(instr.arg1)
+            right = self._value(instr.arg2)
+            if left == BOTTOM or right == BOTTOM:
+                value = BOTTOM
+            elif left == TOP or right == TOP:
+                value = TOP
+            else:
+                folded = self.numeric.fold(op, left, right)
+                value = BOTTOM if folded is None else folded
+            self._set(instr.result, value, ssa_work)
+
+        elif op == "getret":
+            self._set(instr.result, BOTTOM, ssa_work)
+
+        elif op == "if_false":
+            condition = self._value(instr.arg1)
+            fall, target = self._branch_targets(block)
+            if condition == TOP:
+                return
+            if condition == BOTTOM:
+                edges = [fall, target]
+            elif condition == 0:
+                edges = [target]
+            else:
+                edges = [fall]
+            for s in edges:
+                if s is not None:
+                    flow_work.append((b, s))
+
+        elif op in ("goto", "call"):
+            for s in block.succs:
+                flow_work.append((b, s))
+
+    def _branch_targets(self, block):
+        """(fall-through block, jump target block) of an if_false block."""
+        target = self.cfg.label_block[block.terminator.arg2]
+        fall = block.id + 1 if block.id + 1 < len(self.cfg.blocks) else None
+        return fall, target
+
+    # ------------------------------------------------------------------
+    # Rewrite
+    # ------------------------------------------------------------------
+
+    def _constant(self, name):
+        """The constant name settled on, or None."""
+        value = self.values.get(name)
+        return value if isinstance(value, (int, float)) else None
+
+    def _rewrite(self, cfg):
+        """Rewrite the original blocks using the facts found on the SSA copy."""
+        folded = 0
+        branches = 0
+        for block in cfg.blocks:
+            if block.id not in self.executable_blocks:
+                continue
+            ssa_block = self.cfg.blocks[block.id]
+            ssa_instrs = [i for i in ssa_block.instructions if i.op != "phi"]
+            rewritten = []
+            for instr, ssa_instr in zip(block.instructions, ssa_instrs):
+                defined = instruction_def(ssa_instr)
+                constant = self._constant(defined) if defined is not None else None
+                if constant is not None:
+                    if not (instr.op == "assign" and instr.arg1 == str(constant)):
+                        instr = IRInstruction(
+                            "assign", str(constant), None, instr.result, instr.line
+                        )
+                        folded += 1
+                    rewritten.append(instr)
+                    continue
+
+                for field in self._value_fields(instr):
+                    constant = self._constant(getattr(ssa_instr, field))
+                    if constant is not None:
+                        setattr(instr, field, str(constant))
+
+                if instr.op == "if_false" and is_constant(instr.arg1):
+                    branches += 1
+                    if float(instr.arg1) == 0:
+                        rewritten.append(
+                            IRInstruction("goto", instr.arg2, line=instr.line)
+                        )
+                    continue  # Always true: fall through
+                rewritten.append(instr)
+            block.instructions = rewritten
+        return folded, branches
+
+    @staticmethod
+    def _value_fields(instr):
+        """Operand fields that hold values (not labels) for an instruction."""
+        if instr.op in BINARY_OPS:
+            return ("arg1", "arg2")
+        if instr.op in ("assign", "print", "push", "if_false", "ret"):
+            return ("arg1",)
+        return ()
@@ -0,0 +1,451 @@
+"""
+Control-flow simplification for PatternLang IR.
+visit_If emits 'if_false c goto Lx; goto target; Lx:' for every if, and
+repeat loops jump back to a header that only re-tests the condition.
+These passes fold branches on constants, send jumps straight to their
+final destination, flip conditions so one branch does the work of two,
+merge blocks that are only reached by a jump and drop everything that
+is no longer reached or referenced.
+"""
+
+from math import isfinite
+
+from ..ir import (
+    COMPARISON_OPS,
+    JUMP_OPERAND,
+    IRInstruction,
+    instruction_def,
+    instruction_uses,
+    is_constant,
+)
+from ..analysis.assigned import is_argument
+from ..analysis.cache import AnalysisCache
+from ..analysis.cfg import build_cfg
+
+# The comparison that is true exactly when the key is false (for NaN
+# operands only '==' and '!=' are complements, see never_nan)
+COMPLEMENT = {"==": "!=", "!=": "==", "<": ">=", ">=": "<", ">": "<=", "<=": ">"}
+
+# Operators whose result cannot be NaN when one operand is a finite
+# constant and the other is not NaN ('*' also needs the constant nonzero)
+NAN_SAFE_OPS = {"+", "-", "*"}
+
+# Upper bound on simplification sweeps per run
+MAX_SWEEPS = 10
+
+
+def never_nan(instructions):
+    """
+    Names that can never hold NaN, judged over all their definitions:
+    constant copies, comparison results, copies of such names, and such
+    names plus, minus or times a finite constant (a loop counter).
+    Parameters and call results are unknown, even where a tail call
+    writes the parameter (the caller's argument is not seen here).
+    """
+    defs = {}
+    readers = {}  # name -> names with a definition reading it
+    for instr in instructions:
+        defined = instruction_def(instr)
+        if defined is not None:
+            defs.setdefault(defined, []).append(instr)
+            for name in instruction_uses(instr):
+                readers.setdefault(name, set()).add(defined)
+
+    def finite(operand):
+        """True for a constant that is neither infinite nor NaN."""
+        return is_constant(operand) and isfinite(float(operand))
+
+    def never_nan_result(instr):
+        """True if instr cannot produce NaN, given the names already known to be safe."""
+        if instr.op in COMPARISON_OPS:
+            return True
+        if instr.op == "assign":
+            return finite(instr.arg1) or instr.arg1 in safe
+        if instr.op not in NAN_SAFE_OPS:
+            return False
+        if finite(instr.arg2) and instr.arg1 in safe:
+            constant = instr.arg2
+        elif finite(instr.arg1) and instr.arg2 in safe and instr.op != "-":
+            constant = instr.arg1
+        else:
+            return False
+        return instr.op != "*" or float(constant) != 0
+
+    # Optimistic: start from every name, drop those with a bad definition
+    safe = {name for name in defs if not is_argument(name)}
+    work = list(defs)
+    while work:
+        name = work.pop()
+        if name in safe and not all(map(never_nan_result, defs[name])):
+            safe.discard(name)
+            work.extend(readers.get(name, ()))
+    return safe
+
+
+class CFGSimplification:
+    """
+    Simplifies the control flow of the program.
+
+    - 'if_false c' on a constant becomes a goto or disappears
+    - jumps to a block that only jumps on are sent to the final target,
+      and a goto to a block that only returns becomes that return
+    - 'if_false c goto Lx; goto T; Lx:' becomes 'if_false c' goto T'
+      when c comes from a comparison that can be flipped
+    - a jump to the next instruction is removed, as are labels nothing
+      jumps to, and a block reached only by one goto is moved in its place
+    - blocks no entry reaches are deleted
+
+    With rotate_loops set, a jump back to a loop header that only tests
+    the exit condition is replaced by the flipped test itself, so each
+    iteration saves a jump. This changes the loop shape other passes
+    look for, so it belongs at the end of the pipeline.
+
+    A comparison is only flipped where NaN is impossible (or fast_math
+    is set), since NaN < x and NaN >= x are both false.
+    """
+
+    name = "cfg simplification"
+
+    def __init__(self, rotate_loops=False, fast_math=False):
+        self.rotate_loops = rotate_loops
+        self.fast_math = fast_math
+        self.stats = {}
+
+    def run(self, instructions, analyses=None):
+        """Apply the pass and return the new instruction list."""
+        self.counts = {
+            "branches folded": 0,
+            "jumps threaded": 0,
+            "branches inverted": 0,
+            "loops rotated": 0,
+            "jumps removed": 0,
+            "blocks merged": 0,
+            "unreachable blocks": 0,
+        }
+        analyses = analyses or AnalysisCache()
+        code = self._remove_unreachable(analyses.cfg(instructions))
+        for _ in range(MAX_SWEEPS):
+            before = sum(self.counts.values())
+            code = self._fold_branches(code)
+            code = self._thread_jumps(code)
+            code = self._invert_branches(code)
+            if self.rotate_loops:
+                code = self._rotate_loops(code)
+            code = self._remove_jumps_and_labels(code)
+            code = self._merge_blocks(code)
+            if sum(self.counts.values()) == before:
+                break
+            code = self._remove_unreachable(build_cfg(code))
+        self.stats = dict(self.counts)
+        return code
+
+    # ------------------------------------------------------------------
+    # Helpers over the flat instruction list
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _references(code):
+        """label -> number of instructions naming it as a jump or call target."""
+        counts = {}
+        for instr in code:
+            field = JUMP_OPERAND.get(instr.op)
+            if field is not None:
+                label = getattr(instr, field)
+                counts[label] = counts.get(label, 0) + 1
+        return counts
+
+    @staticmethod
+    def _use_counts(code):
+        """How many instructions of code read each name."""
+        counts = {}
+        for instr in code:
+            for name in instruction_uses(instr):
+                counts[name] = counts.get(name, 0) + 1
+        return counts
+
+    @staticmethod
+    def _labels_at(code, i):
+        """Labels at code[i] and the labels directly after it."""
+        labels = set()
+        while i < len(code) and code[i].op == "label":
+            labels.add(code[i].result)
+            i += 1
+        return labels
+
+    @staticmethod
+    def _target(instr):
+        """Label a goto or if_false jumps to (None for anything else)."""
+        if instr.op in ("goto", "if_false"):
+            return getattr(instr, JUMP_OPERAND[instr.op])
+        return None
+
+    @staticmethod
+    def _retarget(instr, label):
+        """A copy of the jump instr going to label instead."""
+        copy = instr.copy()
+        setattr(copy, JUMP_OPERAND[copy.op], label)
+        return copy
+
+    def _invertible(self, compare, safe):
+        """True if compare may become its complement (no operand can be NaN, or fast-math)."""
+        if compare.op in ("==", "!="):
+            return True
+        if self.fast_math:
+            return True
+        return all(
+            (is_constant(a) and float(a) == float(a)) or a in safe
+            for a in (compare.arg1, compare.arg2)
+        )
+
+    # ------------------------------------------------------------------
+    # Transformations
+    # ------------------------------------------------------------------
+
+    def _remove_unreachable(self, cfg):
+        """Instructions of the blocks an entry reaches, in order."""
+        reachable = cfg.reachable()
+        kept = []
+        for block in cfg.blocks:
+            if block.id in reachable:
+                kept.extend(block.instructions)
+            elif block.instructions:
+                self.counts["unreachable blocks"] += 1
+        return kept
+
+    def _fold_branches(self, code):
+        """Branches on a constant condition (the VM jumps when it is falsy)."""
+        result = []
+        for instr in code:
+            if instr.op == "if_false" and is_constant(instr.arg1):
+                self.counts["branches folded"] += 1
+                if not float(instr.arg1):
+                    result.append(IRInstruction("goto", instr.arg2, line=instr.line))
+                continue
+            result.append(instr)
+        return result
+
+    def _thread_jumps(self, code):
+        """Point jumps past blocks that only jump, and gotos at returns directly."""
+        forward = {}  # label -> label its block jumps straight on to
+        returns = {}  # label -> the 'ret' its block consists of
+        i = 0
+        while i < len(code):
+            if code[i].op != "label":
+                i += 1
+                continue
+            labels = []
+            while i < len(code) and code[i].op == "label":
+                labels.append(code[i].result)
+                i += 1
+            if i < len(code) and code[i].op == "goto":
+                forward.update((label, code[i].arg1) for label in labels)
+            elif i < len(code) and code[i].op == "ret":
+                returns.update((label, code[i]) for label in labels)
+
+        def final(label):
+            """The label a chain of gotos starting at label ends on."""
+            seen = {label}
+            while label in forward and forward[label] not in seen:
+                label = forward[label]
+                seen.add(label)
+            return label
+
+        result = []
+        for instr in code:
+            target = self._target(instr)
+            if target is not None:
+                destination = final(target)
+                if instr.op == "goto" and destination in returns:
+                    self.counts["jumps threaded"] += 1
+                    result.append(returns[destination].copy())
+                    continue
+                if destination != target:
+                    self.counts["jumps threaded"] += 1
+                    instr = self._retarget(instr, destination)
+            result.append(instr)
+        return result
+
+    def _comparison_before(self, code, i, condition):
+        """
+        Index of the comparison defining condition for the branch at i, if
+        it is the last write of condition before the branch and no label,
+        jump or ret comes between them. Its operands may be written in
+        between: the comparison is inverted where it stands, not moved.
+        """
+        for k in range(i - 1, -1, -1):
+            instr = code[k]
+            if instr.op == "label" or instr.op in JUMP_OPERAND or instr.op == "ret":
+                return None
+            defined = instruction_def(instr)
+            if defined == condition:
+                return k if instr.op in COMPARISON_OPS else None
+        return None
+
+    def _invert_branches(self, code):
+        """'if_false c goto Lx; goto T; Lx:' -> 'if_false not-c goto T'."""
+        uses = self._use_counts(code)
+        safe = never_nan(code)
+        replaced = {}
+        for i in range(len(code) - 2):
+            branch, jump = code[i], code[i + 1]
+            if branch.op != "if_false" or jump.op != "goto":
+                continue
+            if branch.arg2 not in self._labels_at(code, i + 2):
+                continue
+            condition = branch.arg1
+            if uses.get(condition) != 1:
+                continue
+            k = self._comparison_before(code, i, condition)
+            if k is None or k in replaced or not self._invertible(code[k], safe):
+                continue
+            compare = code[k]
+            if instruction_def(code[k]) in (compare.arg1, compare.arg2):
+                continue
+            replaced[k] = IRInstruction(
+                COMPLEMENT[compare.op],
+                compare.arg1,
+                compare.arg2,
+                compare.result,
+                compare.line,
+            )
+            replaced[i] = IRInstruction("if_false", condition, jump.arg1, line=branch.line)
+            replaced[i + 1] = None
+            self.counts["branches inverted"] += 1
+        if not replaced:
+            return code
+        return [
+            replaced.get(k, instr)
+            for k, instr in enumerate(code)
+            if replaced.get(k, instr) is not None
+        ]
+
+    def _rotate_loops(self, code):
+        """
+        'H: t = a < b; if_false t goto X; body; goto H; X:' -> the latch
+        repeats the test flipped: '... body; t = a >= b; if_false t goto B; X:'
+        where B labels the start of the body.
+        """
+        uses = self._use_counts(code)
+        safe = never_nan(code)
+        positions = {instr.result: k for k, instr in enumerate(code) if instr.op == "label"}
+        replaced = {}  # index -> instructions replacing it
+        body_labels = {}  # index of the body's first instruction -> new label
+        rotated = set()
+        new_label = self._label_factory(code)
+        for i, jump in enumerate(code):
+            if jump.op != "goto" or jump.arg1 in rotated:
+                continue
+            h = positions.get(jump.arg1)
+            if h is None or h + 3 > len(code) or h + 3 > i:
+                continue
+            compare, branch = code[h + 1], code[h + 2]
+            if (
+                compare.op not in COMPARISON_OPS
+                or branch.op != "if_false"
+                or branch.arg1 != compare.result
+                or uses.get(compare.result) != 1
+                or compare.result in (compare.arg1, compare.arg2)
+                or branch.arg2 not in self._labels_at(code, i + 1)
+                or not self._invertible(compare, safe)
+            ):
+                continue
+            if code[h + 3].op == "label":
+                body = code[h + 3].result
+            else:
+                body = body_labels.get(h + 3)
+                if body is None:
+                    body = new_label()
+                    body_labels[h + 3] = body
+            replaced[i] = [
+                IRInstruction(
+                    COMPLEMENT[compare.op],
+                    compare.arg1,
+                    compare.arg2,
+                    compare.result,
+                    compare.line,
+                ),
+                IRInstruction("if_false", compare.result, body, line=branch.line),
+            ]
+            rotated.add(jump.arg1)
+            self.counts["loops rotated"] += 1
+        if not replaced:
+            return code
+        result = []
+        for k, instr in enumerate(code):
+            if k in body_labels:
+                result.append(IRInstruction("label", None, None, body_labels[k]))
+            result.extend(replaced.get(k, [instr]))
+        return result
+
+    @staticmethod
+    def _label_factory(code):
+        """Return a function producing 'L<n>' labels not used in code."""
+        highest = -1
+        for instr in code:
+            label = instr.result if instr.op == "label" else None
+            if label and label[:1] == "L" and label[1:].isdigit():
+                highest = max(highest, int(label[1:]))
+        counter = [highest]
+
+        def new_label():
+            """The next unused label name."""
+            counter[0] += 1
+            return f"L{counter[0]}"
+
+        return new_label
+
+    def _remove_jumps_and_labels(self, code):
+        """Drop jumps to the very next instruction and labels nothing targets."""
+        result = []
+        for i, instr in enumerate(code):
+            target = self._target(instr)
+            if target is not None and target in self._labels_at(code, i + 1):
+                self.counts["jumps removed"] += 1
+                continue
+            result.append(instr)
+        references = self._references(result)
+        return [
+            instr
+            for instr in result
+            if instr.op != "label"
+            or references.get(instr.result)
+            or instr.result.startswith("func_")
+        ]
+
+    def _merge_blocks(self, code):
+        """
+        Replace 'goto S' by S's block when that goto is the only way into
+        S (nothing falls into it) and the block ends in goto or ret.
+        """
+        references = self._references(code)
+        starts = {}
+        for k, instr in enumerate(code):
+            if instr.op == "label" and references.get(instr.result) == 1:
+                starts[instr.result] = k
+
+        moved = {}  # index of the goto -> block instructions
+        removed = set()
+        for i, jump in enumerate(code):
+            if jump.op != "goto" or jump.arg1 not in starts or i in removed:
+                continue
+            s = starts[jump.arg1]
+            if s == 0 or code[s - 1].op not in ("goto", "ret") or s - 1 in moved:
+                continue  # Control falls into the block
+            end = s + 1
+            while end < len(code) and code[end].op not in ("label", "goto", "ret", "if_false", "call"):
+                end += 1
+            if end == len(code) or code[end].op not in ("goto", "ret"):
+                continue
+            if s <= i <= end or any(k in removed or k in moved for k in range(s, end + 1)):
+                continue
+            moved[i] = code[s + 1 : end + 1]
+            removed.update(range(s, end + 1))
+            self.counts["blocks merged"] += 1
+        if not moved:
+            return code
+        result = []
+        for k, instr in enumerate(code):
+            if k in removed:
+                continue
+            result.extend(moved.get(k, [instr]))
+        return result
@@ -0,0 +1,154 @@
+"""
+Tail-call elimination for PatternLang IR.
+A function that ends by returning the result of a call to itself needs
+nothing from its frame afterwards, yet every level of the recursion
+keeps one on the interpreter's call stack. Such calls are replaced by
+storing the new arguments and jumping back to the start of the function,
+which turns the recursion into a loop.
+"""
+
+from ..ir import IRInstruction
+from ..analysis.callgraph import CallGraph
+from ..analysis.cache import AnalysisCache
+from ..analysis.ssa import temp_factory
+from .inline import argument_pushes
+
+# Operators an accumulator can collect, with their identity element
+# (-0.0 + x is x even for x = -0.0, where 0.0 + x would not be)
+ACCUMULATORS = {"+": "-0.0", "*": "1.0"}
+
+
+class TailCallElimination:
+    """
+    Turns self-recursive tail calls into jumps.
+
+    'push ...; call func_f; t = getret; ret t' inside f becomes
+    'p = ...; _args[i] = p; goto L' where L follows f's entry label, so
+    the parameters are bound again from the new arguments. Every local
+    f reads must be written first in the same call, so values left over
+    from the previous iteration are never observed.
+
+    With reassociate set, 'return a + f(...)' and 'return a * f(...)'
+    are converted too: an accumulator collects the pending operands on
+    the way down and every other return combines it with its value. This
+    regroups the float operations (a * (b * c) becomes (a * b) * c), so
+    results can differ in the last bits; it is only done on request.
+    """
+
+    name = "tail calls"
+
+    def __init__(self, reassociate=False):
+        self.reassociate = reassociate
+        self.stats = {}
+
+    def run(self, instructions, analyses=None):
+        """Apply the pass and return the new instruction list."""
+        analyses = analyses or AnalysisCache()
+        cfg = analyses.cfg(instructions)
+        self.cfg = cfg
+        self.new_temp = temp_factory(cfg)
+        graph = CallGraph.from_cfg(cfg)
+        liveness = analyses.liveness(instructions)
+
+        code = []
+        owners = []  # Function of each instruction in code
+        for block in cfg.blocks:
+            owner = cfg.function_of.get(block.id)
+            code.extend(block.instructions)
+            owners.extend([owner] * len(block.instructions))
+
+        replaced = {}  # index -> instructions replacing it
+        eliminated = accumulated = 0
+        for name, entry in graph.functions.items():
+            if name not in graph.edges[name]:
+                continue  # Not self-recursive
+            if not all(n.startswith("_args[") for n in liveness.live_in[entry]):
+                continue
+            sites = self._tail_sites(code, owners, name)
+            ops = {op for _, _, op, _ in sites if op is not None}
+            if len(ops) > 1 or (ops and not self.reassociate):
+                sites = [site for site in sites if site[2] is None]
+                ops = set()
+            if not sites:
+                continue
+
+            accumulator = self.new_temp() if ops else None
+            op = ops.pop() if ops else None
+            loop_label = cfg.new_label()
+            start = code.index(cfg.blocks[entry].instructions[0])
+            replaced[start] = [code[start]]
+            if accumulator is not None:
+                replaced[start].append(
+                    IRInstruction("assign", ACCUMULATORS[op], None, accumulator)
+                )
+            replaced[start].append(IRInstruction("label", None, None, loop_label))
+
+            tail_code = set()
+            for c, pushes, site_op, operand in sites:
+                params = [self.new_temp() for _ in pushes]
+                for k, param in zip(pushes, params):
+                    replaced[k] = [IRInstruction("assign", code[k].arg1, None, param)]
+                jump = []
+                if site_op is not None:
+                    jump.append(IRInstruction(op, accumulator, operand, accumulator))
+                    accumulated += 1
+                jump += [
+                    IRInstruction("assign", param, None, f"_args[{i}]")
+                    for i, param in enumerate(params)
+                ]
+                jump.append(IRInstruction("goto", loop_label))
+                replaced[c] = jump
+                length = 3 if site_op is None else 4
+                for k in range(c + 1, c + length):
+                    replaced[k] = []
+                    tail_code.add(k)
+                eliminated += 1
+
+            if accumulator is not None:
+                # The remaining returns deliver the value combined with the accumulator
+                for j, instr in enumerate(code):
+                    if instr.op == "ret" and owners[j] == name and j not in tail_code:
+                        result = self.new_temp()
+                        replaced[j] = [
+                            IRInstruction(op, accumulator, instr.arg1, result),
+                            IRInstruction("ret", result),
+                        ]
+
+        self.stats = {"calls eliminated": eliminated, "accumulators": accumulated}
+        if not replaced:
+            return instructions
+        result = []
+        for k, instr in enumerate(code):
+            result.extend(replaced.get(k, [instr]))
+        return result
+
+    @staticmethod
+    def _tail_sites(code, owners, name):
+        """
+        (call index, push indices, op, operand) for each call of name in
+        its own body whose result is returned directly (op None) or
+        combined by an accumulator operator with another value first.
+        """
+        target = f"func_{name}"
+        sites = []
+        for c, instr in enumerate(code):
+            if instr.op != "call" or instr.arg1 != target or owners[c] != name:
+                continue
+            if c + 2 >= len(code) or code[c + 1].op != "getret":
+                continue
+            value = code[c + 1].result
+            after = code[c + 2]
+            op = operand = None
+            if after.op in ACCUMULATORS and c + 3 < len(code):
+                operand = after.arg2 if after.arg1 == value else after.arg1
+                if operand == value or value not in (after.arg1, after.arg2):
+                    continue
+                op = after.op
+                value = after.result
+                after = code[c + 3]
+            if after.op != "ret" or after.arg1 != value:
+                continue
+            pushes = argument_pushes(code, c, instr.arg2)
+            if pushes is not None:
+                sites.append((c, pushes, op, operand))
+        return sites
@@ -0,0 +1,77 @@
+"""
+Run-time trip counts for PatternLang closed forms.
+Code that replaces a counted loop whose bound is only known at run time
+first computes how often the loop would run, behind tests that fall back
+to the loop itself when the count is out of the range the replacement
+is valid for. Shared by the closed forms of accumulators and of linear
+recurrences.
+"""
+
+from ..ir import IRInstruction
+from .unroll import EXIT_TESTS
+
+# Largest trip count a run-time closed form is computed for
+MAX_TRIPS = 2**40
+
+
+def countable(counted):
+    """True if the trip count can be computed exactly from a run-time bound."""
+    direction = EXIT_TESTS[counted.test.op]
+    return abs(counted.step) == 1 and counted.start * direction >= 0
+
+
+def guarded_trips(cfg, code, counted, low, high, trips, new_temp):
+    """
+    Code that computes the trip count into trips, after tests that
+    branch to the loop unless it lies between low and high.
+    """
+    header = cfg.blocks[counted.first]
+    direction = EXIT_TESTS[counted.test.op]
+    start = counted.start
+    bound = counted.bound
+    inclusive = counted.test.op in ("<=", ">=")
+    emit = emitter(code, new_temp)
+
+    def branch_unless(condition):
+        """Jump to the loop header unless condition holds."""
+        code.append(IRInstruction("if_false", condition, header.label))
+
+    # With <= the loop runs floor(d) + 1 times for d = (bound - start)
+    # * direction, with < ceil(d) times
+    far = str(float(start + direction * high))
+    low_bound = str(float(start + direction * (low - 1)))
+    near = str(float(start))
+    if direction > 0:
+        branch_unless(emit("<" if inclusive else "<=", bound, far))
+        branch_unless(emit(">=" if inclusive else ">", bound, low_bound))
+        distance = emit("-", bound, near)
+    else:
+        branch_unless(emit(">" if inclusive else ">=", bound, far))
+        branch_unless(emit("<=" if inclusive else "<", bound, low_bound))
+        distance = emit("-", near, bound)
+    fraction = emit("%", distance, "1.0")
+    whole = emit("-", distance, fraction)
+    if inclusive:
+        emit("+", whole, "1.0", trips)
+    else:
+        emit("+", whole, emit("!=", fraction, "0.0"), trips)
+
+
+def emitter(code, new_temp):
+    """
+    emit(op, arg1, arg2, result=None) appending to code; returns the
+    result, a new temporary from new_temp unless given.
+    """
+
+    def emit(op, arg1, arg2, result=None):
+        """Append 'result = arg1 op arg2' to code and return result."""
+        result = result or new_temp()
+        code.append(IRInstruction(op, arg1, arg2, result))
+        return result
+
+    return emit
+
+
+def constant(value):
+    """A number as an IR constant."""
+    return str(float(value))
@@ -0,0 +1,338 @@
+"""
+Loop unrolling for PatternLang IR.
+A repeat loop pays for a compare, a branch and a jump on every
+iteration. Loops with a small constant trip count are replaced by
+straight-line copies of their body, which constant propagation then
+folds; larger ones run several copies per test, with the leftover
+iterations handled after the unrolled loop.
+"""
+
+from fractions import Fraction
+from math import ceil, floor
+
+from ..ir import (
+    JUMP_OPERAND,
+    IRInstruction,
+    fold_binary,
+    instruction_def,
+    instruction_uses,
+    is_constant,
+)
+from ..analysis.cache import AnalysisCache
+from ..analysis.ssa import temp_factory
+from .induction import (
+    EXACT_LIMIT,
+    basic_induction_variables,
+    entry_value,
+    small_integer,
+)
+
+# Exit tests the unroller understands, with the step sign they count towards
+EXIT_TESTS = {"<=": 1, "<": 1, ">=": -1, ">": -1}
+
+# Executed instructions that cost about as much as encoding one more
+ENCODE_COST = 8
+
+
+class CountedLoop:
+    """A loop shaped like the ones visit_Repeat emits, with its counter and exit test."""
+
+    __slots__ = ("loop", "first", "last", "test", "counter", "step", "start", "bound")
+
+    def __init__(self, loop, first, last, test, counter, step, start, bound):
+        self.loop = loop
+        self.first = first  # Header block id; the loop occupies first..last
+        self.last = last
+        self.test = test  # 't = counter <op> bound'
+        self.counter = counter
+        self.step = step
+        self.start = start  # Constant value on entry, or None
+        self.bound = bound
+
+    def trip_count(self, limit):
+        """
+        Number of iterations if start and bound are constants, None if
+        unknown or above limit. Integer counters are counted exactly;
+        otherwise the loop's float additions are replayed.
+        """
+        if self.start is None or not is_constant(self.bound):
+            return None
+        bound = float(self.bound)
+        if small_integer(self.start) is not None and small_integer(self.step) is not None:
+            # Count k >= 0 with start + k * step passing the test, in exact arithmetic
+            sign = EXIT_TESTS[self.test.op]
+            distance = (Fraction(bound) - Fraction(self.start)) * sign
+            step = abs(Fraction(self.step))
+            if self.test.op in ("<=", ">="):
+                count = floor(distance / step) + 1 if distance >= 0 else 0
+            else:
+                count = ceil(distance / step) if distance > 0 else 0
+            return count if count <= limit else None
+
+        value, count = self.start, 0
+        while fold_binary(self.test.op, value, bound):
+            count += 1
+            if count > limit:
+                return None
+            value += self.step
+        return count
+
+
+def counted_loop(cfg, loop, liveness):
+    """
+    Match 'L: t = i <op> n; if_false t goto X; body; goto L; X:' where
+    the loop is laid out contiguously and falls out into X, i changes
+    only by a constant step that runs on every iteration, n is
+    invariant, and t is read by nothing but the branch.
+    """
+    first, last = loop.header, max(loop.blocks)
+    if set(range(first, last + 1)) != loop.blocks or last + 1 >= len(cfg.blocks):
+        return None
+    header = cfg.blocks[first]
+    if len(header.instructions) != 3:
+        return None
+    test, branch = header.instructions[1], header.instructions[2]
+    exit_block = cfg.blocks[last + 1]
+    if (
+        test.op not in EXIT_TESTS
+        or branch.op != "if_false"
+        or branch.arg1 != test.result
+        or exit_block.label is None
+        or branch.arg2 != exit_block.label
+    ):
+        return None
+    tail = cfg.blocks[last].terminator
+    if tail is None or tail.op != "goto" or tail.arg1 != header.label:
+        return None
+
+    defs = {}
+    for b in loop.blocks:
+        for instr in cfg.blocks[b].instructions:
+            defined = instruction_def(instr)
+            if defined is not None:
+                defs.setdefault(defined, []).append(instr)
+            if instr is not branch and test.result in instruction_uses(instr):
+                return None
+    if test.result in liveness.live_in[exit_block.id]:
+        return None
+    bound = test.arg2
+    if not is_constant(bound) and bound in defs:
+        return None
+
+    for name, increment, step in basic_induction_variables(defs):
+        if name != test.arg1 or (step > 0) != (EXIT_TESTS[test.op] > 0):
+            continue
+        where = next(b for b in loop.blocks if increment in cfg.blocks[b].instructions)
+        if all(cfg.dominates(where, latch) for latch in loop.latches):
+            start = entry_value(cfg, loop, name)
+            return CountedLoop(loop, first, last, test, name, step, start, bound)
+    return None
+
+
+class LoopUnrolling:
+    """
+    Unrolls innermost counted loops.
+
+    With a constant trip count whose copies fit in the budget the loop is
+    unrolled completely. Otherwise, when the counter is an integer, the
+    loop is unrolled by `factor`: it tests once whether `factor` more
+    iterations fit, runs that many copies, and leaves the rest to a copy
+    of the original loop (or to straight-line copies when the trip count
+    is known). `budget` caps the instructions an unrolled loop may take;
+    in total the program may grow by its own size or the budget, whichever
+    is larger.
+    """
+
+    name = "unroll"
+
+    def __init__(self, factor=4, budget=64):
+        self.factor = factor
+        self.budget = budget
+        self.stats = {}
+
+    def run(self, instructions, analyses=None):
+        """Apply the pass and return the new instruction list."""
+        analyses = analyses or AnalysisCache()
+        cfg = analyses.cfg(instructions)
+        self.cfg = cfg
+        self.new_temp = temp_factory(cfg)
+        self.growth = max(len(instructions), self.budget)
+        self.references = {}
+        for instr in instructions:
+            field = JUMP_OPERAND.get(instr.op)
+            if field is not None:
+                label = getattr(instr, field)
+                self.references[label] = self.references.get(label, 0) + 1
+        liveness = analyses.liveness(instructions)
+
+        replaced = {}  # first block id -> (last block id, new instructions)
+        full = partial = 0
+        inner = {loop.parent.header for loop in cfg.loops() if loop.parent}
+        for loop in cfg.loops():
+            if loop.header in inner:
+                continue
+            counted = counted_loop(cfg, loop, liveness)
+            if counted is None:
+                continue
+            code = self._unroll_fully(counted)
+            if code is not None:
+                full += 1
+            else:
+                code = self._unroll_partially(counted)
+                if code is None:
+                    continue
+                partial += 1
+            replaced[counted.first] = (counted.last, code)
+
+        result = []
+        b = 0
+        while b < len(cfg.blocks):
+            if b in replaced:
+                last, code = replaced[b]
+                result.extend(code)
+                b = last + 1
+            else:
+                result.extend(cfg.blocks[b].instructions)
+                b += 1
+        self.stats = {"fully unrolled": full, "partially unrolled": partial}
+        return result
+
+    # ------------------------------------------------------------------
+    # Rewriting
+    # ------------------------------------------------------------------
+
+    def _body(self, counted):
+        """The loop's body: every instruction after the header block, ending in 'goto header'."""
+        return [
+            instr
+            for b in range(counted.first + 1, counted.last + 1)
+            for instr in self.cfg.blocks[b].instructions
+        ]
+
+    def _copies(self, counted, count, after, jump_after):
+        """
+        count straight-line copies of the body. Each copy continues into
+        the next one; after the last, control goes to label 'after' (with
+        an explicit jump if jump_after, else by falling through). Labels
+        inside the body are renamed in every copy.
+        """
+        body = self._body(counted)
+        header_label = self.cfg.blocks[counted.first].label
+        inner_labels = [instr.result for instr in body if instr.op == "label"]
+        # The body ends in 'goto header', which becomes a fall-through; any
+        # other jump back needs a label at the start of the next copy
+        jumps_back = any(self._target(instr) == header_label for instr in body[:-1])
+        starts = [self.cfg.new_label() if jumps_back else None for _ in range(count - 1)]
+        starts.append(after)
+
+        code = []
+        for k in range(count):
+            if k > 0 and starts[k - 1] is not None:
+                code.append(IRInstruction("label", None, None, starts[k - 1]))
+            rename = {label: self.cfg.new_label() for label in inner_labels}
+            rename[header_label] = starts[k]
+            code += [self._renamed(instr, rename) for instr in body[:-1]]
+        if jump_after and count:
+            code.append(IRInstruction("goto", after))
+        return code
+
+    @staticmethod
+    def _target(instr):
+        """Label a goto or if_false jumps to (None for anything else)."""
+        if instr.op in ("goto", "if_false"):
+            return getattr(instr, JUMP_OPERAND[instr.op])
+        return None
+
+    @staticmethod
+    def _renamed(instr, rename):
+        """A copy of instr with its label, or the label it jumps to, renamed by rename."""
+        copy = instr.copy()
+        if copy.op == "label":
+            copy.result = rename.get(copy.result, copy.result)
+        field = JUMP_OPERAND.get(copy.op)
+        if field is not None and copy.op != "call":
+            setattr(copy, field, rename.get(getattr(copy, field), getattr(copy, field)))
+        return copy
+
+    def _header(self, counted):
+        """The header's label, kept only if something outside the loop jumps to it."""
+        header = self.cfg.blocks[counted.first]
+        inside = sum(
+            1
+            for b in counted.loop.blocks
+            for instr in self.cfg.blocks[b].instructions
+            if self._target(instr) == header.label
+        )
+        if self.references.get(header.label, 0) > inside:
+            return [header.instructions[0]]
+        return []
+
+    def _unroll_fully(self, counted):
+        """The loop as straight-line copies of its body, or None if too big or not counted."""
+        trips = counted.trip_count(self.budget)
+        if trips is None:
+            return None
+        body_size = len(self._body(counted)) - 1
+        size = trips * body_size
+        if size > self.budget or size > self.growth:
+            return None
+        self.growth -= size
+        exit_label = self.cfg.blocks[counted.last + 1].label
+        return self._header(counted) + self._copies(counted, trips, exit_label, False)
+
+    def _unroll_partially(self, counted):
+        """
+        Unrolled loop 'L: g = i + (factor-1)*step; t = g <op> n; if_false t
+        goto R; factor copies; goto L; R:' followed by the remaining
+        iterations. The counter is an integer, so g is exact.
+        """
+        factor = self.factor
+        if factor < 2 or small_integer(counted.start) is None:
+            return None
+        if small_integer(counted.step * factor) is None:
+            return None
+        body = self._body(counted)
+        body_size = len(body) - 1
+        trips = counted.trip_count(EXACT_LIMIT)
+        if trips is not None and trips < factor:
+            return None
+
+        remainder_trips = trips % factor if trips is not None else None
+        size = factor * body_size + 4
+        if remainder_trips is not None:
+            size += remainder_trips * body_size
+        else:
+            size += len(body) + 3
+        if size > self.budget or size > self.growth:
+            return None
+        # A short loop does not repay the larger code: each test removed
+        # saves a compare, a branch and a jump, but encoding an instruction
+        # costs about as much as running it ENCODE_COST times
+        saved = 3 * (trips - trips // factor) if trips is not None else None
+        if saved is not None and saved < ENCODE_COST * (size - len(body) - 3):
+            return None
+        self.growth -= size
+
+        header = self.cfg.blocks[counted.first]
+        test = counted.test
+        guard = self.new_temp()
+        remainder_label = self.cfg.new_label()
+        code = [
+            header.instructions[0],
+            IRInstruction("+", counted.counter, str(counted.step * (factor - 1)), guard),
+            IRInstruction(test.op, guard, test.arg2, test.result),
+            IRInstruction("if_false", test.result, remainder_label),
+        ]
+        code += self._copies(counted, factor, header.label, True)
+        code.append(IRInstruction("label", None, None, remainder_label))
+
+        if remainder_trips is not None:
+            exit_label = self.cfg.blocks[counted.last + 1].label
+            return code + self._copies(counted, remainder_trips, exit_label, False)
+
+        # Unknown trip count: the original loop, under a new header label
+        loop_label = self.cfg.new_label()
+        rename = {header.label: loop_label}
+        code += [self._renamed(instr, rename) for instr in header.instructions]
+        code += [self._renamed(instr, rename) for instr in body]
+        return code
@@ -0,0 +1,285 @@
+"""
+Execution profiles for PatternLang.
+
+A ProfilingInterpreter counts how often every IR instruction runs, how
+often every if_false jumps, and samples the clock every few hundred
+dispatches, crediting the time since the previous sample to the basic
+block running at that moment. Profile turns those counters into the
+numbers worth reading:
+- executions per instruction and per operation
+- estimated time per basic block
+- calls per function
+- loop trip counts: how often each natural loop was entered and how
+  often its header ran, i.e. its iterations per entry
+- executions per source line
+as a text report sorted hottest first, or as JSON.
+
+A SamplingInterpreter instead runs the program at full speed and is
+interrupted by a profiling timer: each sample records the source line
+running and the lines of the calls that led to it. SampleProfile turns
+the samples into time per source line, and into collapsed stacks
+('main:4;sq:2 17' per line), the input of flamegraph.pl, speedscope and
+similar flame graph viewers.
+"""
+
+# Rows of each table in the text report
+REPORT_ROWS = 10
+
+# Seconds of CPU time between two samples of a SamplingInterpreter
+SAMPLE_INTERVAL = 0.001
+
+
+class Profile:
+    """
+    Counters of one profiled run, over the IR instructions that ran (in
+    order) and their CFG. counts[i] is how often instruction i ran (a
+    jump landing on a label counts as running it), taken[i] how often the
+    if_false at i jumped, block_time[b] the sampled seconds of block b.
+    """
+
+    def __init__(self, instructions, cfg, counts, taken, block_time, seconds):
+        self.instructions = instructions
+        self.cfg = cfg
+        self.counts = counts
+        self.taken = taken
+        self.block_time = block_time
+        self.seconds = seconds  # Wall time of the whole run
+        self.start = []  # Block id -> index of its first instruction
+        position = 0
+        for block in cfg.blocks:
+            self.start.append(position)
+            position += len(block.instructions)
+
+    @property
+    def total(self):
+        """Instructions executed."""
+        return sum(self.counts)
+
+    def block_runs(self, b):
+        """How often block b was entered."""
+        block = self.cfg.blocks[b]
+        return self.counts[self.start[b]] if block.instructions else 0
+
+    def edge_count(self, b, s):
+        """How often control went from block b to block s."""
+        block = self.cfg.blocks[b]
+        if not block.instructions or s not in block.succs:
+            return 0
+        last = self.start[b] + len(block.instructions) - 1
+        term = block.terminator
+        if term is None or term.op in ("goto", "call"):
+            return self.counts[last]
+        if term.op == "if_false":
+            fall, target = b + 1, self.cfg.label_block[term.arg2]
+            jumped = self.taken[last]
+            return (jumped if s == target else 0) + (
+                self.counts[last] - jumped if s == fall else 0
+            )
+        return 0
+
+    def opcodes(self):
+        """Executions per IR operation, most frequent first."""
+        totals = {}
+        for instr, count in zip(self.instructions, self.counts):
+            if count:
+                totals[instr.op] = totals.get(instr.op, 0) + count
+        return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+    def calls(self):
+        """Calls per function, most called first."""
+        totals = {}
+        for instr, count in zip(self.instructions, self.counts):
+            if instr.op == "call" and count:
+                name = instr.arg1[len("func_") :]
+                totals[name] = totals.get(name, 0) + count
+        return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+    def blocks(self):
+        """Per block: id, label, function, runs and sampled seconds, slowest first."""
+        rows = [
+            {
+                "block": block.id,
+                "label": block.label,
+                "function": self.cfg.function_of.get(block.id),
+                "runs": self.block_runs(block.id),
+                "seconds": self.block_time[block.id],
+            }
+            for block in self.cfg.blocks
+            if self.block_runs(block.id) or self.block_time[block.id]
+        ]
+        return sorted(rows, key=lambda row: (-row["seconds"], -row["runs"]))
+
+    def loops(self):
+        """
+        Per natural loop: header, depth, entries and header runs, most
+        iterations first. A header that is a function's entry is also
+        entered by every call, and the program start once.
+        """
+        calls = self.calls()
+        rows = []
+        for loop in self.cfg.loops():
+            header = self.cfg.blocks[loop.header]
+            entries = sum(
+                self.edge_count(p, loop.header)
+                for p in header.preds
+                if p not in loop.blocks
+            )
+            if loop.header == 0:
+                entries += 1
+            elif loop.header in self.cfg.entries:
+                entries += calls.get(header.label[len("func_") :], 0)
+            runs = self.block_runs(loop.header)
+            rows.append(
+                {
+                    "header": header.label or f"B{loop.header}",
+                    "function": self.cfg.function_of.get(loop.header),
+                    "depth": loop.depth,
+                    "entries": entries,
+                    "header runs": runs,
+                    "runs per entry": runs / entries if entries else 0.0,
+                }
+            )
+        return sorted(rows, key=lambda row: -row["header runs"])
+
+    def lines(self):
+        """Executions per source line, most executed first (None: no line)."""
+        totals = {}
+        for instr, count in zip(self.instructions, self.counts):
+            if count:
+                totals[instr.line] = totals.get(instr.line, 0) + count
+        return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+    def hot_instructions(self):
+        """(index, count) of every instruction that ran, most executed first."""
+        ran = [(i, count) for i, count in enumerate(self.counts) if count]
+        return sorted(ran, key=lambda item: -item[1])
+
+    def report(self, rows=REPORT_ROWS):
+        """The text report: one table per counter, hottest first."""
+        total = self.total or 1
+        sampled = sum(self.block_time) or 1.0
+        lines = [f"{self.total} instructions in {self.seconds * 1000:.2f} ms"]
+
+        lines.append("Operations:")
+        for op, count in list(self.opcodes().items())[:rows]:
+            lines.append(f"  {op:<10}{count:>12}{count / total:>8.1%}")
+
+        lines.append("Lines:")
+        for line, count in list(self.lines().items())[:rows]:
+            name = "?" if line is None else line
+            lines.append(f"  {name:<10}{count:>12}{count / total:>8.1%}")
+
+        lines.append("Hot instructions:")
+        for i, count in self.hot_instructions()[:rows]:
+            lines.append(f"  {i:>5}  {count:>12}  {self.instructions[i]}")
+
+        lines.append("Blocks (sampled time):")
+        for row in self.blocks()[:rows]:
+            name = row["label"] or f"B{row['block']}"
+            where = f" in {row['function']}" if row["function"] else ""
+            lines.append(
+                f"  {name + where:<24}{row['runs']:>10} runs"
+                f"{row['seconds'] * 1000:>10.2f} ms{row['seconds'] / sampled:>8.1%}"
+            )
+
+        calls = self.calls()
+        if calls:
+            lines.append("Calls:")
+            for name, count in list(calls.items())[:rows]:
+                lines.append(f"  {name:<24}{count:>10}")
+
+        loops = self.loops()
+        if loops:
+            lines.append("Loops:")
+            for row in loops[:rows]:
+                where = f" in {row['function']}" if row["function"] else ""
+                lines.append(
+                    f"  {row['header'] + where:<24}{row['entries']:>8} entries"
+                    f"{row['header runs']:>10} header runs"
+                    f"{row['runs per entry']:>10.1f} per entry"
+                )
+        return lines
+
+    def to_json(self):
+        """Every counter, for json.dump."""
+        return {
+            "instructions executed": self.total,
+            "seconds": self.seconds,
+            "operations": self.opcodes(),
+            "lines": [
+                {"line": line, "count": count} for line, count in self.lines().items()
+            ],
+            "instructions": [
+                {"index": i, "instruction": repr(instr), "line": instr.line, "count": count}
+                for i, (instr, count) in enumerate(zip(self.instructions, self.counts))
+            ],
+            "blocks": self.blocks(),
+            "calls": self.calls(),
+            "loops": self.loops(),
+        }
+
+
+class SampleProfile:
+    """
+    Samples of one run. stacks maps a call stack, a tuple of (function,
+    line) frames from the top level ('main') to the line running, to the
+    samples that caught it; a line is None for code without one.
+    """
+
+    def __init__(self, stacks, interval, seconds):
+        self.stacks = stacks
+        self.interval = interval  # Seconds of CPU time per sample
+        self.seconds = seconds  # Wall time of the whole run
+
+    @property
+    def total(self):
+        """Samples taken."""
+        return sum(self.stacks.values())
+
+    def lines(self):
+        """
+        Per (function, line): the samples running it ("self") and the
+        samples with it anywhere on the stack ("total"), most self first.
+        """
+        rows = {}
+        for stack, count in self.stacks.items():
+            for frame in set(stack):
+                row = rows.setdefault(frame, {"self": 0, "total": 0})
+                row["total"] += count
+            rows[stack[-1]]["self"] += count
+        order = sorted(rows.items(), key=lambda item: (-item[1]["self"], -item[1]["total"]))
+        return dict(order)
+
+    def collapsed(self):
+        """One 'frame;frame;... count' line per stack, frames named function:line."""
+        return sorted(
+            ";".join(_frame_name(frame) for frame in stack) + f" {count}"
+            for stack, count in self.stacks.items()
+        )
+
+    def report(self, source=None, rows=REPORT_ROWS):
+        """
+        The text report: the lines with the most samples, with their
+        source text if source (the program's text) is given.
+        """
+        total = self.total or 1
+        text = source.splitlines() if source is not None else []
+        lines = [
+            f"{self.total} samples in {self.seconds * 1000:.2f} ms "
+            f"(timer every {self.interval * 1000:g} ms of CPU time)"
+        ]
+        lines.append("Lines (sampled):")
+        for frame, row in list(self.lines().items())[:rows]:
+            line = frame[1]
+            code = text[line - 1].strip() if line is not None and line <= len(text) else ""
+            lines.append(
+                f"  {_frame_name(frame):<16}{row['self'] / total:>8.1%} self"
+                f"{row['total'] / total:>8.1%} total  {code}"
+            )
+        return lines
+
+
+def _frame_name(frame):
+    """function:line, or the function alone if the line is unknown."""
+    function, line = frame
+    return function if line is None else f"{function}:{line}"
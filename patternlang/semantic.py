@@ -3,9 +3,11 @@ Semantic analyzer for PatternLang.
 Performs type checking and ensures variables are declared before use.
 """
 
+import re
 from .ast_nodes import *
 from .utils.symbol_table import SymbolTable
 from .utils.errors import SemanticError
+from .analysis.callgraph import CallGraph
 
 
 class SemanticAnalyzer:
@@ -17,13 +19,22 @@ class SemanticAnalyzer:
     def __init__(self):
         self.symbol_table = SymbolTable()
         self.errors = []
+        self.functions = {}  # name -> FunctionDef, filled by the pre-pass
+        self.labels = {}  # label name -> owning function name (None for top level)
+        self.current_function = None
+        self.call_graph = None
 
     def analyze(self, ast):
         """
         Main entry point for semantic analysis.
         Returns the symbol table if successful.
         """
+        # Pre-pass: register every function and label so forward calls
+        # and forward gotos can be checked
+        self.collect_declarations(ast)
+
         self.visit(ast)
+        self.call_graph = CallGraph(self.functions).build(ast)
 
         if self.errors:
             # Report all errors
@@ -32,6 +43,43 @@ class SemanticAnalyzer:
 
         return self.symbol_table
 
+    # Label names the IR generator uses for its own labels
+    RESERVED_LABEL = re.compile(r"^(L\d+|func_\w+)$")
+
+    def collect_declarations(self, ast):
+        """
+        Register all function definitions and labels before the main visit.
+        Reports redeclared functions and duplicate or reserved labels.
+        Labels share one namespace in the IR, so duplicates are rejected
+        even when they live in different functions.
+        """
+        pending = [(stmt, None) for stmt in ast.statements]
+        while pending:
+            stmt, owner = pending.pop(0)
+            if isinstance(stmt, FunctionDef):
+                if stmt.name in self.functions:
+                    self.errors.append(
+                        SemanticError(f"Function '{stmt.name}' redeclared")
+                    )
+                else:
+                    self.functions[stmt.name] = stmt
+                pending.extend((body_stmt, stmt.name) for body_stmt in stmt.body)
+            elif isinstance(stmt, Repeat):
+                pending.extend((body_stmt, owner) for body_stmt in stmt.body)
+            elif isinstance(stmt, Label):
+                if stmt.name in self.labels:
+                    self.errors.append(
+                        SemanticError(f"Label '{stmt.name}' defined more than once")
+                    )
+                elif self.RESERVED_LABEL.match(stmt.name):
+                    self.errors.append(
+                        SemanticError(
+                            f"Label '{stmt.name}' is reserved for compiler-generated labels"
+                        )
+                    )
+                else:
+                    self.labels[stmt.name] = owner
+
     def visit(self, node):
         """Dispatch to appropriate visitor method."""
         method_name = f"visit_{type(node).__name__}"
@@ -93,9 +141,20 @@ class SemanticAnalyzer:
         self.symbol_table.exit_scope()
 
     def visit_If(self, node):
-        """Visit if statement."""
+        """
+        Visit if statement.
+        The goto target must be a label in the same function (or top level),
+        since jumping between functions would bypass the call frame.
+        """
         self.visit(node.condition)
-        # Note: We don't validate label existence here (could be added)
+        if node.label not in self.labels:
+            self.errors.append(SemanticError(f"Undefined label '{node.label}'"))
+        elif self.labels[node.label] != self.current_function:
+            self.errors.append(
+                SemanticError(
+                    f"Label '{node.label}' is not in the same function as its goto"
+                )
+            )
 
     def visit_Print(self, node):
         """Visit print statement."""
@@ -126,14 +185,9 @@ class SemanticAnalyzer:
         pass
 
     def visit_FunctionDef(self, node):
-        """Register function and check its body in a new scope."""
-        # Functions share global namespace for names; record name to prevent duplicates
-        if not hasattr(self, "functions"):
-            self.functions = {}
-        if node.name in self.functions:
-            self.errors.append(SemanticError(f"Function '{node.name}' redeclared"))
-        else:
-            self.functions[node.name] = node
+        """Check a function body in a new scope (registered by the pre-pass)."""
+        enclosing_function = self.current_function
+        self.current_function = node.name
         # Enter function scope
         self.symbol_table.enter_scope()
         # Declare parameters
@@ -145,25 +199,26 @@ class SemanticAnalyzer:
             self.visit(stmt)
         # Exit scope
         self.symbol_table.exit_scope()
+        self.current_function = enclosing_function
 
     def visit_Return(self, node):
         """Validate return expression."""
         self.visit(node.expression)
 
     def visit_Call(self, node):
-        """Validate call arguments (assume function exists for now)."""
-        # Verify function exists if registry available and arity matches
-        if hasattr(self, "functions") and node.name in self.functions:
-            func = self.functions[node.name]
-            if len(node.args) != len(func.params):
-                self.errors.append(
-                    SemanticError(
-                        f"Function '{node.name}' expects {len(func.params)} argument(s), got {len(node.args)}"
-                    )
+        """Validate that the callee exists and the argument count matches."""
+        func = self.functions.get(node.name)
+        if func is None:
+            self.errors.append(SemanticError(f"Function '{node.name}' is not defined"))
+        elif len(node.args) != len(func.params):
+            self.errors.append(
+                SemanticError(
+                    f"Function '{node.name}' expects {len(func.params)} argument(s), got {len(node.args)}"
                 )
+            )
         for arg in node.args:
             self.visit(arg)
 
     def visit_Label(self, node):
-        """Label statement - no validation needed."""
+        """Label statement - validated by the declaration pre-pass."""
         pass
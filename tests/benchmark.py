@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Optimizer benchmark for PatternLang.
+For every test program, reports the IR instruction count before and after
+optimization, the time spent optimizing and the interpreter runtime of
+both versions. A second table compares the optimized runtime in float
+mode with exact mode (ints and rational division, see numeric.py), and
+big-integer programs (factorials and powers past 2**53) in exact mode.
+
+Usage: benchmark.py [repeat] [optimization level]
+"""
+
+import io
+import sys
+import time
+import contextlib
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from patternlang import Lexer, Parser, SemanticAnalyzer, IRGenerator, Optimizer
+from patternlang import Interpreter
+from patternlang.numeric import FLOAT, NumericMode
+from patternlang.utils.errors import CompilerError
+
+# Exact mode with rational division
+EXACT = NumericMode(exact=True)
+
+# Programs whose values outgrow 2**53 (only exact mode prints them exactly)
+BIG_PROGRAMS = {
+    "factorial 500": "let f = 1; repeat i in 1..500 { let f = f * i; } print f; end;",
+    "powers of 3": "let p = 1; repeat i in 1..2000 { let p = p * 3; } print p; end;",
+    "harmonic 200": "let h = 0; repeat i in 1..200 { let h = h + 1 / i; } print h; end;",
+}
+
+
+def compile_program(source_code, level=2, numeric=FLOAT):
+    """Run the front end and return (unoptimized IR, optimizer, optimize ms)."""
+    ast = Parser(Lexer(source_code).tokenize(), numeric).parse()
+    SemanticAnalyzer().analyze(ast)
+    ir_code = IRGenerator().generate(ast)
+    optimizer = Optimizer(level=level, numeric=numeric)
+    start = time.perf_counter()
+    optimizer.optimize(ir_code)
+    elapsed = (time.perf_counter() - start) * 1000
+    return ir_code, optimizer, elapsed
+
+
+def time_execution(
+    instructions, jump_table=None, ranges=None, repeat=20, numeric=FLOAT
+):
+    """Best-of-N interpreter runtime in milliseconds (output discarded)."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            Interpreter(numeric).execute(instructions, jump_table, ranges)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    """Benchmark all test programs that compile."""
+    tests_dir = Path(__file__).parent
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    level = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+
+    print(f"{'program':<28}{'IR':>6}{'opt':>6}{'compile':>10}{'ms':>10}{'opt ms':>10}")
+    print("-" * 70)
+    totals = [0, 0, 0.0, 0.0, 0.0]
+
+    for test_file in sorted(tests_dir.glob("*.pl")):
+        try:
+            ir_code, optimizer, compile_ms = compile_program(
+                test_file.read_text(encoding="utf-8"), level
+            )
+        except CompilerError:
+            continue  # error_*.pl programs
+
+        before = time_execution(ir_code, repeat=repeat)
+        after = time_execution(
+            optimizer.instructions, optimizer.jump_table, optimizer.ranges, repeat=repeat
+        )
+        row = [len(ir_code), len(optimizer.instructions), compile_ms, before, after]
+        totals = [t + r for t, r in zip(totals, row)]
+        print(f"{test_file.name:<28}" + format_row(row))
+
+    print("-" * 70)
+    print(f"{'total':<28}" + format_row(totals))
+    print()
+    benchmark_numeric_modes(tests_dir, repeat, level)
+
+
+def benchmark_numeric_modes(tests_dir, repeat, level):
+    """Optimized runtime in float and exact mode, then big-integer programs."""
+    print(f"{'program':<28}{'float ms':>10}{'exact ms':>10}{'ratio':>8}")
+    print("-" * 56)
+    programs = [
+        (path.name, path.read_text(encoding="utf-8"))
+        for path in sorted(tests_dir.glob("*.pl"))
+    ]
+    for name, source in programs + list(BIG_PROGRAMS.items()):
+        times = []
+        for numeric in (FLOAT, EXACT):
+            try:
+                _, optimizer, _ = compile_program(source, level, numeric)
+            except CompilerError:
+                break
+            times.append(
+                time_execution(
+                    optimizer.instructions,
+                    optimizer.jump_table,
+                    optimizer.ranges,
+                    repeat=repeat,
+                    numeric=numeric,
+                )
+            )
+        if len(times) == 2:
+            ratio = times[1] / times[0]
+            print(f"{name:<28}{times[0]:>10.3f}{times[1]:>10.3f}{ratio:>8.2f}")
+
+
+def format_row(row):
+    """Instruction counts, then compile and run times in milliseconds."""
+    return f"{row[0]:>6}{row[1]:>6}{row[2]:>10.3f}{row[3]:>10.3f}{row[4]:>10.3f}"
+
+
+if __name__ == "__main__":
+    main()
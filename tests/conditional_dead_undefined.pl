@@ -0,0 +1,14 @@
+# Conditional: a dead assignment reading a variable a jump skipped
+# y is never assigned, so computing x fails with "Undefined variable"
+# at every optimization level, even though x is never used (removing
+# the assignment would hide the error)
+
+let a = 1;
+print a;
+if a goto skip;
+let y = 2;
+skip:
+let x = y + 1;
+print a + 1;
+
+end;
@@ -0,0 +1,22 @@
+# Conditional: a loop reading a variable a jump skipped
+# z is never assigned, and the loop only reads it once a division by
+# zero has already failed, so the program prints 1 to 11 and then stops
+# with "Division by zero" at every optimization level (the read of z
+# must not be hoisted in front of the loop)
+
+let y = 1;
+let w = 3;
+if y goto lab2;
+let z = w * 2;
+lab2:
+
+repeat i in 1..12 {
+    if i < 12 goto skip;
+    let q = i / 0;
+    let r = z + 1;
+    print r;
+    skip:
+    print i;
+}
+
+end;
@@ -0,0 +1,10 @@
+# Error Test: the same label defined twice
+let x = 4;
+
+if x > 2 goto big;
+print 0;
+big:
+print x;
+big:
+
+end;
@@ -0,0 +1,8 @@
+# Error Test: Wrong arity on a call that appears before the definition
+print area(3);  # area() is defined below and expects 2 arguments
+
+func area(w, h) {
+    return w * h;
+}
+
+end;
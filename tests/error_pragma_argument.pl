@@ -0,0 +1,6 @@
+# Error Test: A known pragma with an argument it does not take
+#pragma exact bogus
+
+print 22 / 7;
+
+end;
@@ -0,0 +1,9 @@
+# Error Test: Call to a function that is never defined
+func double(x) {
+    return x * 2;
+}
+
+print double(4);
+print triple(4);  # triple() does not exist
+
+end;
@@ -0,0 +1,10 @@
+# Error Test: goto a label that does not exist
+let n = 3;
+
+repeat i in 1..n {
+    if i == 2 goto skip;   # only "skp" is defined below
+    print i;
+    skp:
+}
+
+end;
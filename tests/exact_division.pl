@@ -0,0 +1,23 @@
+# Integer arithmetic under the numeric mode chosen on the command line:
+#   python main.py tests/exact_division.pl                             (floats)
+#   python main.py tests/exact_division.pl --exact                     (rationals)
+#   python main.py tests/exact_division.pl --exact --division float
+
+# 21! is past 2^53: only exact mode prints every digit
+let f = 1;
+repeat i in 1..21 {
+    let f = f * i;
+}
+print f;
+print f - 1;
+
+print 84 / 12;
+print 22 / 7;
+print f / 1000;
+
+let m = 0 - 7;
+print m % 3;
+print 7 % (0 - 3);
+print m / 2;
+
+end;
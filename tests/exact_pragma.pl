@@ -0,0 +1,32 @@
+#pragma exact
+#pragma unroll 4
+# Exact mode: integers keep every digit and dividing them gives a rational
+# (an unknown pragma such as 'unroll' is a comment)
+
+# 25! is far past 2^53, where floats start skipping integers
+let f = 1;
+repeat i in 1..25 {
+    let f = f * i;
+}
+print f;
+print f + 1;
+
+# Quotients: exact when they divide evenly, a fraction otherwise
+print 84 / 12;
+print 22 / 7;
+let third = 1 / 3;
+print third + third + third;
+
+# Negative operands: % takes the sign of the divisor, / stays exact
+let m = 0 - 7;
+print m % 3;
+print 7 % (0 - 3);
+print m % (0 - 3);
+print m / 2;
+print m / (0 - 7);
+
+# A decimal literal is a float and makes the result a float
+print 7 / 2.0;
+print f * 1.0;
+
+end;
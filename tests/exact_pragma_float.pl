@@ -0,0 +1,22 @@
+#pragma exact float
+# Exact integers, but dividing them gives a float
+
+let f = 1;
+repeat i in 1..22 {
+    let f = f * i;
+}
+print f;
+
+print 84 / 12;
+print 22 / 7;
+
+let m = 0 - 7;
+print m % 3;
+print 7 % (0 - 3);
+print m / 2;
+
+# Integer division by zero still fails
+let z = 0;
+print f / z;
+
+end;
@@ -0,0 +1,53 @@
+# Global value numbering: an expression whose operands hold the same
+# values as an earlier one reuses that result
+# Constants are numbered by value and sign, so 0.0 and -0.0 stay apart
+
+# i * 0.0 and i * -0.0 compare equal but print differently
+let z = 0 - 1;
+let n = 0 * z;
+repeat i in 1..2 {
+    let a = i * 0;
+    let b = i * n;
+    print a;
+    print b;
+}
+
+# NaN operands: the repeated expressions still give NaN, and a NaN is
+# never equal to itself
+let big = 1;
+repeat k in 1..400 {
+    let big = big * 10;
+}
+let undef = big - big;
+repeat i in 1..2 {
+    let c = undef * i;
+    let d = undef * i;
+    print c;
+    print d;
+    let e = c == d;
+    let f = c == d;
+    print e + f;
+}
+
+# An expression reused in a block its first computation dominates
+repeat i in 1..3 {
+    let p = i * i - 1;
+    if p > 3 goto skip;
+    let q = i * i - 1;
+    print q;
+    skip:
+    print p;
+}
+
+# Redundant expressions in a loop that never runs, and after it
+let s = 5;
+repeat i in 3..1 {
+    let g = i * s + 1;
+    let h = i * s + 1;
+    print g + h;
+}
+let u = s * s;
+let w = s * s;
+print u + w;
+
+end;
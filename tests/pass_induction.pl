@@ -0,0 +1,36 @@
+# Induction variables: 'j = i * k' for a loop counter i and a constant k
+# becomes a running sum of k, and i goes if the exit test can use the sum
+
+# Multiples of 3 and 7 of a counter
+repeat i in 1..5 {
+    let j = i * 3;
+    let m = i * 7;
+    print j + m;
+}
+
+# A counter crossing zero: the sum reaches +0.0, as i * 4 does
+let low = 0 - 2;
+repeat i in low..2 {
+    let j = i * 4;
+    print j;
+}
+
+# A NaN factor is not a small integer, so the product stays
+let big = 1;
+repeat k in 1..400 {
+    let big = big * 10;
+}
+let undef = big - big;
+repeat i in 1..3 {
+    let j = i * undef;
+    print j;
+}
+
+# A loop that never runs, so neither does the sum
+repeat i in 5..1 {
+    let j = i * 2;
+    print j;
+}
+print 0;
+
+end;
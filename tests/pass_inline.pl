@@ -0,0 +1,45 @@
+# Inlining: a call to a small function becomes a copy of its body, with
+# its variables renamed and its return turned into an assignment
+
+func scale(x, k) {
+    let y = x * k;
+    return y;
+}
+
+func first_above(limit, step) {
+    let v = 0;
+    repeat i in 1..limit {
+        if v > 10 goto found;
+        let v = v + step;
+    }
+    found:
+    return v;
+}
+
+# Signed zeros pass through arguments and results unchanged
+let m = 0 - 1;
+print scale(0, m);
+print scale(0, 1);
+let nz = scale(0, m);
+print scale(nz, m);
+
+# A NaN argument
+let big = 1;
+repeat k in 1..400 {
+    let big = big * 10;
+}
+let undef = big - big;
+print scale(undef, 2);
+print scale(2, big);
+
+# The callee's loop and early exit, in a copy per call site
+print first_above(100, 3);
+print first_above(0, 3);
+print first_above(undef, 3);
+
+# A call inside a loop
+repeat i in 1..3 {
+    print scale(i, i);
+}
+
+end;
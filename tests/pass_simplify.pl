@@ -0,0 +1,56 @@
+# Control-flow simplification: branches on constants fold, jumps go
+# straight to their final target, a branch over a goto becomes one
+# branch on the opposite test, and loops test at the bottom
+
+let big = 1;
+repeat k in 1..400 {
+    let big = big * 10;
+}
+let undef = big - big;
+let m = 0 - 1;
+let nz = 0 * m;
+
+# A test on a NaN: 'x < 5' and 'x >= 5' are both false, so the branch
+# must keep its sense
+repeat i in 1..3 {
+    let x = undef * i;
+    if x < 5 goto small;
+    print 1;
+    if 1 goto next;
+    small:
+    print 2;
+    next:
+}
+
+# -0.0 == 0.0 holds, and -0.0 < 0.0 does not
+repeat i in 1..2 {
+    let w = nz * i;
+    if w == 0 goto zero;
+    print 3;
+    zero:
+    if w < 0 goto negative;
+    print w;
+    negative:
+}
+
+# Chained jumps, threaded to their end
+let t = 1;
+if t goto a;
+print 4;
+a:
+if t goto b;
+print 5;
+b:
+print 6;
+
+# Loops that never run, rotated or not
+repeat i in 3..1 {
+    print i;
+}
+let low = 10;
+repeat i in low..5 {
+    print i;
+}
+print 7;
+
+end;
@@ -0,0 +1,45 @@
+# Tail calls: a function that ends by returning a call to itself jumps
+# back to its start instead, so deep recursion needs no stack
+
+func count(n, acc) {
+    if n > 0 goto more;
+    return acc;
+    more:
+    let next = n - 1;
+    let sum = acc + n;
+    let r = count(next, sum);
+    return r;
+}
+
+# 5000 levels deep: as a loop, the call stack stays flat
+print count(5000, 0);
+
+# No recursion at all: the first return is taken
+print count(0, 7);
+
+# A signed zero accumulator comes back unchanged
+let m = 0 - 1;
+let nz = 0 * m;
+print count(0, nz);
+
+# A NaN count: 'n > 0' is false, so it returns at once
+let big = 1;
+repeat k in 1..400 {
+    let big = big * 10;
+}
+let undef = big - big;
+print count(undef, 1);
+print count(3, undef);
+
+# The accumulated sum with a + on the way back is left alone (it would
+# regroup float additions)
+func total(n) {
+    if n > 0 goto deeper;
+    return 0;
+    deeper:
+    let rest = total(n - 1);
+    return n + rest;
+}
+print total(100);
+
+end;
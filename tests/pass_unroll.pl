@@ -0,0 +1,49 @@
+# Loop unrolling: a loop with a known, small trip count becomes copies
+# of its body; a longer one runs several copies per test, then the rest
+
+# Fully unrolled: z flips the sign of a zero on every trip
+let m = 0 - 1;
+let z = 0 * m;
+repeat i in 1..3 {
+    let z = z * m;
+    print z;
+}
+
+# Partially unrolled: 10 trips, 4 copies per test and 2 left over
+let s = 0;
+repeat i in 1..10 {
+    let s = s + i * i;
+    print s;
+}
+
+# A NaN bound: 'i <= undef' never holds, so the loop never runs
+let big = 1;
+repeat k in 1..400 {
+    let big = big * 10;
+}
+let undef = big - big;
+repeat i in 1..undef {
+    print i;
+}
+
+# A bound below the start: no trips, no copies
+repeat i in 4..2 {
+    print i;
+}
+
+# A trip count only known at run time
+func count(n) {
+    let c = 0;
+    repeat i in 1..n {
+        let c = c + i;
+        print c;
+    }
+    if n < 1 goto done;
+    let rest = count(n - 6);
+    done:
+    return c;
+}
+let r = count(7);
+print r;
+
+end;
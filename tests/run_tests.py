@@ -3,9 +3,16 @@
 Test runner for PatternLang compiler.
 Runs all sample programs and reports results.
 Interactive menu allows selecting which tests to run.
+
+With --differential it instead runs every program unoptimized (-O0) and
+at each higher optimization level, without --fast-math, and fails if the
+output or the error of any run differs from the unoptimized one. The
+programs in DIFF_FLAGS are also compared under each of their extra
+command lines.
 """
 
 import sys
+import subprocess
 from pathlib import Path
 
 # Add parent directory to path
@@ -14,6 +21,20 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from patternlang.main import compile_and_run
 from patternlang.utils.errors import CompilerError
 
+# The compiler's command line, run once per program and level
+MAIN = Path(__file__).parent.parent / "main.py"
+
+# Levels the differential mode compares with -O0
+DIFF_LEVELS = (1, 2, 3)
+
+# Seconds a differential run may take
+DIFF_TIMEOUT = 30
+
+# Extra command lines a program is also run under (it always runs without)
+DIFF_FLAGS = {
+    "exact_division.pl": (("--exact",), ("--exact", "--division", "float")),
+}
+
 
 def run_test(test_file, show_source=True, verbose=False):
     """Run a single test file."""
@@ -48,6 +69,59 @@ def run_test(test_file, show_source=True, verbose=False):
         return False
 
 
+def run_program(test_file, level, flags=()):
+    """Run a program at an optimization level; return its stdout and error lines."""
+    try:
+        result = subprocess.run(
+            [sys.executable, str(MAIN), str(test_file), f"-O{level}", *flags],
+            capture_output=True,
+            text=True,
+            timeout=DIFF_TIMEOUT,
+        )
+    except subprocess.TimeoutExpired:
+        return None, ["Timeout"]
+    errors = [
+        line
+        for line in result.stderr.splitlines()
+        if line.startswith(("Compiler Error:", "Unexpected Error:"))
+    ]
+    return result.stdout, errors
+
+
+def run_differential(test_files):
+    """
+    Run each program at -O0 and at every level in DIFF_LEVELS, once per
+    command line; return (file name and flags, level, what differs) for
+    each run that behaves differently.
+    """
+    differences = []
+    for test_file in test_files:
+        for flags in ((),) + DIFF_FLAGS.get(test_file.name, ()):
+            name = " ".join((test_file.name,) + flags)
+            expected = run_program(test_file, 0, flags)
+            for level in DIFF_LEVELS:
+                output, errors = run_program(test_file, level, flags)
+                if output != expected[0]:
+                    differences.append((name, level, "output"))
+                elif errors != expected[1]:
+                    differences.append((name, level, "error"))
+    return differences
+
+
+def differential_main(test_files):
+    """Report every program whose optimized runs differ from -O0, then exit."""
+    levels = ", ".join(f"-O{level}" for level in DIFF_LEVELS)
+    print(f"Comparing {len(test_files)} program(s) at -O0 and {levels}")
+    differences = run_differential(test_files)
+    for name, level, what in differences:
+        print(f"[FAIL] {name}: -O{level} {what} differs from -O0")
+    if differences:
+        print(f"[FAILED] {len(differences)} run(s) differ")
+        sys.exit(1)
+    print("[SUCCESS] Every optimization level matches -O0")
+    sys.exit(0)
+
+
 def display_menu(test_files):
     """Display interactive menu for test selection."""
     print("\n" + "=" * 70)
@@ -59,6 +133,8 @@ def display_menu(test_files):
     sample_tests = [f for f in test_files if f.name.startswith("sample_")]
     conditional_tests = [f for f in test_files if f.name.startswith("conditional_")]
     float_tests = [f for f in test_files if f.name.startswith("float_")]
+    exact_tests = [f for f in test_files if f.name.startswith("exact_")]
+    pass_tests = [f for f in test_files if f.name.startswith("pass_")]
     error_tests = [f for f in test_files if f.name.startswith("error_")]
 
     print("Available Tests:")
@@ -88,6 +164,20 @@ def display_menu(test_files):
             test_map[str(idx)] = test_file
             idx += 1
 
+    if exact_tests:
+        print("\nExact Numeric Tests:")
+        for test_file in exact_tests:
+            print(f"  [{idx}] {test_file.name}")
+            test_map[str(idx)] = test_file
+            idx += 1
+
+    if pass_tests:
+        print("\nOptimizer Pass Tests:")
+        for test_file in pass_tests:
+            print(f"  [{idx}] {test_file.name}")
+            test_map[str(idx)] = test_file
+            idx += 1
+
     if error_tests:
         print("\nError Handling Tests:")
         for test_file in error_tests:
@@ -155,6 +245,9 @@ def main():
         print("No test files found (*.pl)")
         sys.exit(1)
 
+    if "--differential" in sys.argv[1:]:
+        differential_main(test_files)
+
     # Display menu and get user selection
     test_map = display_menu(test_files)
     selected_tests = get_user_selection(test_map)
@@ -0,0 +1,55 @@
+# Closed forms: loops that only update accumulators
+# The optimizer replaces each loop by the accumulators' final values
+
+# Arithmetic sums: 1 + 2 + ... + 100 and 1^2 + ... + 50^2
+let s = 0;
+repeat i in 1..100 {
+    let s = s + i;
+}
+print s;
+
+let q = 0;
+repeat i in 1..50 {
+    let q = q + i * i;
+}
+print q;
+
+# A polynomial increment, subtracted
+let d = 1000;
+repeat i in 1..20 {
+    let d = d - (2 * i + 3);
+}
+print d;
+
+# Geometric products: powers of two, and of three from an integer start
+let p = 1;
+repeat i in 1..30 {
+    let p = p * 2;
+}
+print p;
+
+let t = 5;
+repeat i in 1..10 {
+    let t = t * 3;
+}
+print t;
+
+# A bound only known at run time (the recursion keeps squares from being
+# inlined): the closed form runs behind a guard on the trip count
+func squares(n) {
+    let total = 0;
+    repeat k in 1..n {
+        let total = total + k * k;
+    }
+    if n > 5 goto more;
+    return total;
+    more:
+    let rest = squares(n - 5);
+    return total + rest;
+}
+
+print squares(10);
+print squares(1000);
+print squares(0);
+
+end;
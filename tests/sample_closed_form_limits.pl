@@ -0,0 +1,52 @@
+# Closed forms: loops the optimizer must leave as loops
+# Each one would compute something else in one step
+
+# A loop that prints runs every iteration
+let s = 0;
+repeat i in 1..5 {
+    let s = s + i;
+    print s;
+}
+
+# Zero trip counts: the bounds are crossed, so the body never runs
+let z = 7;
+repeat i in 10..1 {
+    let z = z + i;
+}
+print z;
+
+let w = 2;
+repeat i in 0 - 3..0 - 8 {
+    let w = w * 2;
+}
+print w;
+
+# Past 2**53 the loop's float sums round differently than a closed form
+let c = 0;
+repeat i in 1..100000 {
+    let c = c + i * i * i;
+}
+print c;
+
+# 3**40 is past 2**53, so every product rounds
+let p = 1;
+repeat i in 1..40 {
+    let p = p * 3;
+}
+print p;
+
+# 2**1100 overflows a float to inf
+let big = 1;
+repeat i in 1..1100 {
+    let big = big * 2;
+}
+print big;
+
+# A fractional ratio is never exact
+let h = 1000;
+repeat i in 1..10 {
+    let h = h * 0.5;
+}
+print h;
+
+end;
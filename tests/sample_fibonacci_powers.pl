@@ -0,0 +1,67 @@
+# Linear recurrences run by matrix powers
+# The optimizer replaces a Fibonacci-style loop by a power of its matrix
+
+# Small: 10 steps of the pair (a, b) -> (b, a + b)
+let a = 0;
+let b = 1;
+repeat i in 1..10 {
+    let t = a + b;
+    let a = b;
+    let b = t;
+}
+print a;
+
+# Large: fib(1476) is the last one below the float limit, the next
+# steps overflow to inf
+let x = 0;
+let y = 1;
+repeat i in 1..1476 {
+    let t = x + y;
+    let x = y;
+    let y = t;
+}
+print x;
+
+let u = 0;
+let v = 1;
+repeat i in 1..1500 {
+    let t = u + v;
+    let u = v;
+    let v = t;
+}
+print u;
+
+# Three terms with coefficients: T(n) = T(n-1) + 2 T(n-2) + 3 T(n-3)
+let p = 1;
+let q = 1;
+let r = 1;
+repeat i in 1..25 {
+    let s = r + 2 * q + 3 * p;
+    let p = q;
+    let q = r;
+    let r = s;
+}
+print r;
+
+# Variable trip counts: the power runs behind a guard on the count
+func fib(n) {
+    let f = 0;
+    let g = 1;
+    repeat k in 1..n {
+        let h = f + g;
+        let f = g;
+        let g = h;
+    }
+    return f;
+}
+
+let total = 0;
+repeat j in 1..90 {
+    let total = total + fib(j);
+}
+print total;
+print fib(0);
+print fib(1);
+print fib(78);
+
+end;
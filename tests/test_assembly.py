@@ -26,6 +26,11 @@ def test_assembly_generation():
         print(f"\nCompiling: {test_file.name}")
         print("-" * 60)
 
+        # Exact programs are interpreted only
+        if "#pragma exact" in test_file.read_text(encoding="utf-8"):
+            print("[SKIP] Exact numeric mode")
+            continue
+
         try:
             # Run compiler with --compile flag
             result = subprocess.run(
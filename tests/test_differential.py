@@ -0,0 +1,18 @@
+"""
+Differential test for the PatternLang optimizer.
+Every test program must print the same output and fail with the same
+error at every optimization level as it does unoptimized.
+"""
+
+from pathlib import Path
+
+from run_tests import run_differential
+
+
+def test_optimization_levels_agree():
+    """Run all test programs at -O0 and each optimized level and compare."""
+    test_files = sorted(Path(__file__).parent.glob("*.pl"))
+    differences = run_differential(test_files)
+    assert not differences, "\n".join(
+        f"{name}: -O{level} {what} differs from -O0" for name, level, what in differences
+    )
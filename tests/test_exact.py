@@ -0,0 +1,103 @@
+"""
+Exact numeric mode tests for PatternLang.
+The exact programs must print every digit of integers past 2^53 and
+divide by the policy chosen with '#pragma exact' or on the command line.
+"""
+
+from pathlib import Path
+
+from run_tests import run_program
+
+TESTS_DIR = Path(__file__).parent
+
+# (program, command-line flags, expected output lines)
+EXPECTED = [
+    (
+        "exact_pragma.pl",
+        (),
+        [
+            "15511210043330985984000000",
+            "15511210043330985984000001",
+            "7",
+            "22/7",
+            "1",
+            "2",
+            "-2",
+            "-1",
+            "-7/2",
+            "1",
+            "3.5",
+            "1.5511210043330986e+25",
+        ],
+    ),
+    (
+        "exact_pragma_float.pl",
+        (),
+        ["1124000727777607680000", "7.0", "3.142857142857143", "2", "-2", "-3.5"],
+    ),
+    (
+        "exact_division.pl",
+        (),
+        [
+            "5.109094217170944e+19",
+            "5.109094217170944e+19",
+            "7.0",
+            "3.142857142857143",
+            "5.109094217170944e+16",
+            "2.0",
+            "-2.0",
+            "-3.5",
+        ],
+    ),
+    (
+        "exact_division.pl",
+        ("--exact",),
+        [
+            "51090942171709440000",
+            "51090942171709439999",
+            "7",
+            "22/7",
+            "51090942171709440",
+            "2",
+            "-2",
+            "-7/2",
+        ],
+    ),
+    (
+        "exact_division.pl",
+        ("--exact", "--division", "float"),
+        [
+            "51090942171709440000",
+            "51090942171709439999",
+            "7.0",
+            "3.142857142857143",
+            "5.109094217170944e+16",
+            "2",
+            "-2",
+            "-3.5",
+        ],
+    ),
+]
+
+
+def test_exact_outputs():
+    """Run each exact program at -O2 and compare its output line by line."""
+    for name, flags, expected in EXPECTED:
+        output, _ = run_program(TESTS_DIR / name, 2, flags)
+        assert output is not None, f"{name} timed out"
+        assert output.splitlines() == expected, f"{name} {' '.join(flags)}"
+
+
+def test_exact_division_by_zero():
+    """Dividing an exact integer by zero fails like a float division."""
+    _, errors = run_program(TESTS_DIR / "exact_pragma_float.pl", 2)
+    assert errors == ["Unexpected Error: Division by zero"]
+
+
+def test_pragma_arguments():
+    """A known pragma with a bad argument fails; an unknown one is a comment (see exact_pragma.pl)."""
+    _, errors = run_program(TESTS_DIR / "error_pragma_argument.pl", 2)
+    assert errors == [
+        "Compiler Error: Expected '#pragma exact' with one of rational, float, "
+        "got '#pragma exact bogus'"
+    ]